@@ -11,7 +11,7 @@ if errorlevel 1 (
     exit /b 1
 )
 
-REM Mostra logs do backend + mqtt + db (o trio que interessa pra diagnostico)
-docker compose logs -f backend mqtt db
+REM Mostra logs do backend + ingest + mqtt + db (o que interessa pra diagnostico)
+docker compose logs -f backend ingest mqtt db
 
 endlocal
\ No newline at end of file
@@ -0,0 +1,50 @@
+# back-end/app/api/routes/analytics.py
+
+import logging
+from datetime import datetime, timedelta, timezone
+from fastapi import APIRouter, HTTPException, Query
+
+from app.core.config import settings
+from app.db.session import run_in_db
+from app.services.analytics import build_report
+from app.schemas.analytics import AnalyticsResponse
+
+router = APIRouter()
+logger = logging.getLogger(__name__)
+
+_DEFAULT_DAYS = 7
+
+def _as_utc(value: datetime) -> datetime:
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+@router.get("/analytics", response_model=AnalyticsResponse)
+async def get_analytics(
+    start: datetime | None = Query(None, alias="from"),
+    end: datetime | None = Query(None, alias="to"),
+    sensor_id: str | None = Query(None, max_length=64),
+    stoppage_s: float = Query(settings.ANALYTICS_STOPPAGE_S, gt=0, le=86400),
+    window_s: int = Query(settings.ANALYTICS_ROLLING_WINDOW_S, ge=60, le=86400),
+    max_points: int = Query(500, ge=10, le=5000),
+    stoppage_limit: int = Query(20, ge=0, le=1000)
+):
+    """
+    Production analytics from the raw counts in [from, to) (default: the
+    last 7 days): cycle-time distribution, rolling throughput (counts per
+    hour over `window_s`), stoppages of at least `stoppage_s` inside a
+    shift, and per-shift summaries (shifts as set in ANALYTICS_SHIFTS).
+    Closed days and shifts are cached, so repeated reports are cheap.
+    """
+    end = _as_utc(end) if end else datetime.now(timezone.utc)
+    start = _as_utc(start) if start else end - timedelta(days=_DEFAULT_DAYS)
+    if start >= end:
+        raise HTTPException(status_code=400, detail="'from' must be before 'to'.")
+    if end - start > timedelta(days=settings.ANALYTICS_MAX_DAYS):
+        raise HTTPException(status_code=400, detail=f"Range longer than {settings.ANALYTICS_MAX_DAYS} days.")
+
+    try:
+        return await run_in_db(
+            build_report, start, end, sensor_id, stoppage_s, window_s, max_points, stoppage_limit
+        )
+    except Exception as e:
+        logger.error(f"Error computing analytics: {e}")
+        raise HTTPException(status_code=500, detail="Failed to compute analytics.")
@@ -1,66 +1,329 @@
 # back-end/app/api/routes/counts.py
 
+import asyncio
+import base64
+import binascii
+import csv
+import io
+import itertools
+import json
 import logging
-from fastapi import APIRouter, Depends, HTTPException, Query
+import math
+import threading
+import time
+from datetime import date, datetime, timedelta, timezone, tzinfo
+from typing import NamedTuple
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import StreamingResponse
 from psycopg2.extensions import connection
 from psycopg2.extras import RealDictCursor
+from starlette.concurrency import run_in_threadpool
 
-from app.db.session import db_dependency
-from app.schemas.count import CountResponse, StatisticsResponse, GrafanaTimeSeriesResponse
+from app.core.config import settings
+from app.db.session import get_db_connection, run_in_db
+from app.services.mqtt_client import live_counters, recent_counts
+from app.services.query_cache import grafana_cache
+from app.schemas.count import (
+    CountResponse, CountPageResponse, StatisticsResponse, GrafanaTimeSeriesResponse, QueryCacheStatsResponse
+)
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
+# =====================================================================
+# Database Queries (run on the DB executor via run_in_db)
+# =====================================================================
+
+def _query_counts(db: connection, limit: int, offset: int, sensor_id: str | None):
+    with db.cursor(cursor_factory=RealDictCursor) as cur:
+        sql_query = "SELECT id, sensor_id, timestamp FROM pizza_counts"
+        params = []
+        if sensor_id:
+            sql_query += " WHERE sensor_id = %s"
+            params.append(sensor_id)
+
+        sql_query += " ORDER BY timestamp DESC LIMIT %s OFFSET %s"
+        params.extend([limit, offset])
+
+        cur.execute(sql_query, tuple(params))
+        return cur.fetchall()
+
+def _counts_filter(sensor_id: str | None, start: datetime | None, end: datetime | None) -> tuple[list[str], list]:
+    """Builds the WHERE clauses shared by keyset pagination and export."""
+    clauses, params = [], []
+    if sensor_id:
+        clauses.append("sensor_id = %s")
+        params.append(sensor_id)
+    if start:
+        clauses.append('"timestamp" >= %s')
+        params.append(start)
+    if end:
+        clauses.append('"timestamp" < %s')
+        params.append(end)
+    return clauses, params
+
+def _query_counts_page(db: connection, limit: int, after: tuple[datetime, int] | None,
+                       sensor_id: str | None, start: datetime | None, end: datetime | None):
+    """
+    Returns up to `limit + 1` counts older than the `after` (timestamp, id)
+    position; the extra row only tells the caller whether another page exists.
+    """
+    clauses, params = _counts_filter(sensor_id, start, end)
+    if after:
+        # Row comparison lets Postgres seek straight to the position via the index
+        clauses.append('("timestamp", id) < (%s, %s)')
+        params.extend(after)
+
+    sql_query = 'SELECT id, sensor_id, "timestamp" FROM pizza_counts'
+    if clauses:
+        sql_query += " WHERE " + " AND ".join(clauses)
+    sql_query += ' ORDER BY "timestamp" DESC, id DESC LIMIT %s'
+    params.append(limit + 1)
+
+    with db.cursor(cursor_factory=RealDictCursor) as cur:
+        cur.execute(sql_query, tuple(params))
+        return cur.fetchall()
+
+def _query_statistics(db: connection, sensor_id: str | None) -> StatisticsResponse:
+    with db.cursor() as cur:
+        sensor_filter = ""
+        params: tuple = ()
+        if sensor_id:
+            sensor_filter = " AND sensor_id = %s"
+            params = (sensor_id,)
+
+        # Total counts
+        cur.execute(f"SELECT COUNT(*) FROM pizza_counts WHERE TRUE{sensor_filter}", params)
+        total_counts = cur.fetchone()[0]
+
+        # Counts since local midnight (a plain range on timestamp lets partitions be pruned)
+        cur.execute(
+            "SELECT COUNT(*) FROM pizza_counts"
+            " WHERE timestamp >= DATE_TRUNC('day', NOW() AT TIME ZONE system_timezone()) AT TIME ZONE system_timezone()"
+            f"{sensor_filter}",
+            params
+        )
+        counts_today = cur.fetchone()[0]
+
+        # Last count timestamp
+        cur.execute(
+            f"SELECT timestamp FROM pizza_counts WHERE TRUE{sensor_filter} ORDER BY timestamp DESC LIMIT 1",
+            params
+        )
+        last_count_row = cur.fetchone()
+        last_count_timestamp = last_count_row[0] if last_count_row else None
+
+        return StatisticsResponse(
+            total_counts=total_counts,
+            counts_today=counts_today,
+            last_count_timestamp=last_count_timestamp,
+            sensor_id=sensor_id
+        )
+
+# Bucketed time-series queries per data source. %(step)s is the bucket width
+# in seconds (whole days for the daily rollup); ranges are [start, end), by
+# local day for the daily rollup (start and end are local midnights there).
+_TIMESERIES_SQL = {
+    "hourly": """
+        SELECT SUM(total_counts) * %(scale)s AS value,
+               FLOOR(EXTRACT(EPOCH FROM bucket) / %(step)s) * %(step)s * 1000 AS ts_ms
+        FROM pizza_counts_hourly
+        WHERE bucket >= %(start)s AND bucket < %(end)s
+        GROUP BY ts_ms
+        ORDER BY ts_ms
+    """,
+    "daily": """
+        SELECT SUM(total_counts) * %(scale)s AS value,
+               EXTRACT(EPOCH FROM (
+                   (DATE '1970-01-01' + ((day - DATE '1970-01-01') / %(step_days)s) * %(step_days)s)::TIMESTAMP
+                   AT TIME ZONE system_timezone()
+               )) * 1000 AS ts_ms
+        FROM pizza_counts_daily
+        WHERE day >= (%(start)s AT TIME ZONE system_timezone())::DATE
+          AND day < (%(end)s AT TIME ZONE system_timezone())::DATE
+        GROUP BY ts_ms
+        ORDER BY ts_ms
+    """,
+    "raw": """
+        SELECT COUNT(*) * %(scale)s AS value,
+               FLOOR(EXTRACT(EPOCH FROM "timestamp") / %(step)s) * %(step)s * 1000 AS ts_ms
+        FROM pizza_counts
+        WHERE "timestamp" >= %(start)s AND "timestamp" < %(end)s
+        GROUP BY ts_ms
+        ORDER BY ts_ms
+    """,
+}
+
+def _query_timeseries(db: connection, source: str, start: datetime, end: datetime, step_s: int, per_hour: bool):
+    params = {
+        "start": start,
+        "end": end,
+        "step": step_s,
+        "step_days": max(1, step_s // 86400),
+        # Rates are normalized to "per hour" regardless of bucket width
+        "scale": 3600.0 / step_s if per_hour else 1,
+    }
+    with db.cursor() as cur:
+        cur.execute(_TIMESERIES_SQL[source], params)
+        return [[row[0], int(row[1])] for row in cur.fetchall()]
+
+def _query_timezone(db: connection) -> ZoneInfo:
+    with db.cursor() as cur:
+        cur.execute("SELECT system_timezone()")
+        name = cur.fetchone()[0]
+    try:
+        return ZoneInfo(name or "UTC")
+    except (ZoneInfoNotFoundError, ValueError):
+        return ZoneInfo("UTC")
+
+def _query_today_stats(db: connection) -> dict:
+    with db.cursor(cursor_factory=RealDictCursor) as cur:
+        cur.execute("SELECT * FROM today_stats LIMIT 1")
+        return cur.fetchone() or {}
+
 # =====================================================================
 # Standard API Endpoints
 # =====================================================================
 
 @router.get("/counts", response_model=list[CountResponse])
 async def get_counts(
-    db: connection = Depends(db_dependency),
     limit: int = Query(100, le=1000),
-    offset: int = Query(0)
+    offset: int = Query(0),
+    sensor_id: str | None = Query(None, max_length=64)
 ):
-    """Retrieves a paginated list of all pizza counts."""
+    """
+    Retrieves a paginated list of pizza counts, optionally for a single sensor.
+    Deep OFFSETs get slower with every page; prefer /counts/page or /counts/export.
+    """
     try:
-        with db.cursor(cursor_factory=RealDictCursor) as cur:
-            cur.execute(
-                "SELECT id, timestamp FROM pizza_counts ORDER BY timestamp DESC LIMIT %s OFFSET %s",
-                (limit, offset)
-            )
-            results = cur.fetchall()
-        return results
+        return await run_in_db(_query_counts, limit, offset, sensor_id)
     except Exception as e:
         logger.error(f"Error fetching counts: {e}")
         raise HTTPException(status_code=500, detail="Failed to fetch counts.")
 
+def _encode_cursor(timestamp: datetime, count_id: int) -> str:
+    raw = f"{timestamp.isoformat()}|{count_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def _decode_cursor(cursor: str) -> tuple[datetime, int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        timestamp, count_id = raw.rsplit("|", 1)
+        return datetime.fromisoformat(timestamp), int(count_id)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise HTTPException(status_code=400, detail="Invalid cursor.")
+
+@router.get("/counts/page", response_model=CountPageResponse)
+async def get_counts_page(
+    limit: int = Query(1000, ge=1, le=10000),
+    cursor: str | None = Query(None, max_length=128),
+    sensor_id: str | None = Query(None, max_length=64),
+    start: datetime | None = Query(None, alias="from"),
+    end: datetime | None = Query(None, alias="to")
+):
+    """
+    Retrieves counts newest first using keyset pagination on (timestamp, id).
+    Pass the returned `next_cursor` back as `cursor` to get the following page;
+    it is null on the last page. Every page costs the same, however deep.
+    """
+    after = _decode_cursor(cursor) if cursor else None
+    try:
+        rows = await run_in_db(_query_counts_page, limit, after, sensor_id, start, end)
+    except Exception as e:
+        logger.error(f"Error fetching counts page: {e}")
+        raise HTTPException(status_code=500, detail="Failed to fetch counts.")
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = _encode_cursor(last["timestamp"], last["id"])
+    return CountPageResponse(items=rows, next_cursor=next_cursor)
+
+# Each running export holds a pooled connection for its whole duration
+_export_slots = threading.BoundedSemaphore(settings.EXPORT_MAX_CONCURRENT)
+
+_EXPORT_MEDIA_TYPES = {"csv": "text/csv", "ndjson": "application/x-ndjson"}
+
+def _format_export_chunk(fmt: str, rows: list[tuple]) -> str:
+    if fmt == "ndjson":
+        return "".join(
+            json.dumps({"id": row[0], "sensor_id": row[1], "timestamp": row[2].isoformat()}) + "\n"
+            for row in rows
+        )
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    writer.writerows((row[0], row[1], row[2].isoformat()) for row in rows)
+    return buffer.getvalue()
+
+def _export_counts(fmt: str, sensor_id: str | None, start: datetime | None, end: datetime | None):
+    """
+    Yields the export body in chunks, read through a server-side (named)
+    cursor so that memory stays flat regardless of how many rows match.
+    Releases its export slot when finished, failed or closed early.
+    """
+    try:
+        clauses, params = _counts_filter(sensor_id, start, end)
+        sql_query = 'SELECT id, sensor_id, "timestamp" FROM pizza_counts'
+        if clauses:
+            sql_query += " WHERE " + " AND ".join(clauses)
+        sql_query += ' ORDER BY "timestamp", id'
+
+        with get_db_connection() as db:
+            with db.cursor(name="counts_export") as cur:
+                cur.itersize = settings.EXPORT_CHUNK_ROWS
+                cur.execute(sql_query, tuple(params))
+                yield "id,sensor_id,timestamp\n" if fmt == "csv" else ""
+                while True:
+                    rows = cur.fetchmany(settings.EXPORT_CHUNK_ROWS)
+                    if not rows:
+                        break
+                    yield _format_export_chunk(fmt, rows)
+    finally:
+        _export_slots.release()
+
+@router.get("/counts/export")
+async def export_counts(
+    format: str = Query("csv", pattern="^(csv|ndjson)$"),
+    sensor_id: str | None = Query(None, max_length=64),
+    start: datetime | None = Query(None, alias="from"),
+    end: datetime | None = Query(None, alias="to")
+):
+    """
+    Streams all matching counts, oldest first, as CSV or NDJSON.
+    Use `from`/`to` (ISO 8601) to bound the export.
+    """
+    if not _export_slots.acquire(blocking=False):
+        raise HTTPException(status_code=429, detail="Too many exports in progress.")
+
+    body = _export_counts(format, sensor_id, start, end)
+    try:
+        # Open the cursor before answering so that database errors still get a
+        # proper status code instead of a truncated 200 response
+        first_chunk = await run_in_threadpool(next, body)
+    except Exception as e:
+        logger.error(f"Error starting counts export: {e}")
+        raise HTTPException(status_code=500, detail="Failed to export counts.")
+
+    return StreamingResponse(
+        itertools.chain((first_chunk,), body),
+        media_type=_EXPORT_MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="pizza_counts.{format}"'}
+    )
+
 @router.get("/counts/statistics", response_model=StatisticsResponse)
-async def get_statistics(db: connection = Depends(db_dependency)):
-    """Retrieves aggregated statistics about the counts."""
+async def get_statistics(sensor_id: str | None = Query(None, max_length=64)):
+    """
+    Retrieves aggregated statistics about the counts, optionally for a single sensor.
+    Served from the in-memory live counters; falls back to the database until they are seeded.
+    """
+    live = live_counters.get(sensor_id)
+    if live is not None:
+        return StatisticsResponse(sensor_id=sensor_id, **live)
+
     try:
-        with db.cursor() as cur:
-            # Total counts
-            cur.execute("SELECT COUNT(*) FROM pizza_counts")
-            total_counts = cur.fetchone()[0]
-
-            # Counts today
-            cur.execute(
-                "SELECT COUNT(*) FROM pizza_counts WHERE DATE(timestamp) = CURRENT_DATE"
-            )
-            counts_today = cur.fetchone()[0]
-
-            # Last count timestamp
-            cur.execute(
-                "SELECT timestamp FROM pizza_counts ORDER BY timestamp DESC LIMIT 1"
-            )
-            last_count_row = cur.fetchone()
-            last_count_timestamp = last_count_row[0] if last_count_row else None
-
-            return StatisticsResponse(
-                total_counts=total_counts,
-                counts_today=counts_today,
-                last_count_timestamp=last_count_timestamp
-            )
+        return await run_in_db(_query_statistics, sensor_id)
     except Exception as e:
         logger.error(f"Error fetching statistics: {e}")
         raise HTTPException(status_code=500, detail="Failed to fetch statistics.")
@@ -70,38 +333,215 @@ async def get_statistics(db: connection = Depends(db_dependency)):
 # =====================================================================
 # Note: Grafana expects datapoints as [value, timestamp_in_milliseconds]
 
-async def _fetch_grafana_timeseries(db: connection, view_name: str, target_name: str, value_column: str, days_limit: int = 30):
-    """Generic helper to fetch time series data from a database view."""
+class _GrafanaSeries(NamedTuple):
+    """How a Grafana time-series target maps onto a data source."""
+    title: str
+    source: str          # Key of _TIMESERIES_SQL
+    min_step_s: int      # Native resolution of the source
+    default_days: int    # Window used when the request carries no range
+    per_hour: bool = False
+
+_GRAFANA_SERIES = {
+    "hourly_counts": _GrafanaSeries("Pizzas per Hour", "hourly", 3600, 7),
+    "daily_counts": _GrafanaSeries("Pizzas per Day", "daily", 86400, 365),
+    "production_speed": _GrafanaSeries("Production Speed (pizzas/h)", "hourly", 3600, 2, per_hour=True),
+    "recent_counts": _GrafanaSeries("Real-time Counts", "raw", 1, 1),
+}
+
+_EPOCH_DAY = date(1970, 1, 1)
+_MICROSECOND = timedelta(microseconds=1)
+
+def _parse_grafana_time(value) -> datetime | None:
+    if not value:
+        return None
+    try:
+        if isinstance(value, (int, float)):
+            return datetime.fromtimestamp(value / 1000, tz=timezone.utc)
+        parsed = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+        return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+    except (TypeError, ValueError):
+        return None
+
+def _grafana_number(request: dict, key: str) -> float | None:
+    """A numeric request option (`intervalMs`, `maxDataPoints`), or None if absent; 400 if invalid."""
+    value = request.get(key)
+    if value is None or value == "":
+        return None
     try:
-        with db.cursor() as cur:
-            # Ensure column names are safe before embedding in the query
-            if not (view_name.isalnum() and value_column.isalnum()):
-                raise ValueError("Invalid view or column name")
-
-            query = f"""
-                SELECT 
-                    {value_column} AS value,
-                    timestamp_unix * 1000 AS ts_ms 
-                FROM {view_name}
-                WHERE timestamp_unix >= EXTRACT(EPOCH FROM (CURRENT_DATE - INTERVAL '%s days'))
-                ORDER BY ts_ms
-            """
-            cur.execute(query, (days_limit,))
-            results = cur.fetchall()
-            
-            datapoints = [[row[0], int(row[1])] for row in results]
-            
-            return [GrafanaTimeSeriesResponse(target=target_name, datapoints=datapoints)]
-            
+        number = float(value)
+    except (TypeError, ValueError):
+        raise HTTPException(status_code=400, detail=f"Invalid {key}: {value!r}")
+    if not math.isfinite(number) or number < 0:
+        raise HTTPException(status_code=400, detail=f"Invalid {key}: {value!r}")
+    return number
+
+def _resolve_window(series: _GrafanaSeries, request: dict, tz: tzinfo) -> tuple[datetime, datetime, int]:
+    """
+    Returns the (start, end, step_s) to query: the requested range (or the
+    target's default window), bucketed to `intervalMs` and widened so that
+    at most `maxDataPoints` buckets are returned. Daily buckets start at
+    local midnight in `tz`, the others on UTC multiples of the step.
+    """
+    time_range = request.get("range")
+    if not isinstance(time_range, dict):
+        time_range = {}
+    end = _parse_grafana_time(time_range.get("to")) or datetime.now(timezone.utc)
+    start = _parse_grafana_time(time_range.get("from")) or end - timedelta(days=series.default_days)
+    span_s = max(1.0, (end - start).total_seconds())
+
+    step_s = max(float(series.min_step_s), (request.get("intervalMs") or 0) / 1000)
+    max_points = request.get("maxDataPoints")
+    if max_points and max_points >= 1:
+        step_s = max(step_s, span_s / max_points)
+    # Round up to a whole multiple of the source resolution
+    step_s = int(math.ceil(step_s / series.min_step_s) * series.min_step_s)
+
+    if series.source == "daily":
+        # Whole local days, grouped like the SQL: from 1970-01-01 in steps of step_days
+        step_days = step_s // 86400
+        first_day = (start.astimezone(tz).date() - _EPOCH_DAY).days
+        last_day = ((end - _MICROSECOND).astimezone(tz).date() - _EPOCH_DAY).days
+        start_day = first_day // step_days * step_days
+        end_day = -(-(last_day + 1) // step_days) * step_days
+        return (
+            datetime.combine(_EPOCH_DAY + timedelta(days=start_day), datetime.min.time(), tzinfo=tz).astimezone(timezone.utc),
+            datetime.combine(_EPOCH_DAY + timedelta(days=end_day), datetime.min.time(), tzinfo=tz).astimezone(timezone.utc),
+            step_s,
+        )
+
+    # Align both ends to bucket boundaries: the first bucket is complete and
+    # "now"-relative requests map onto the same (cacheable) window
+    start_epoch = math.floor(start.timestamp() / step_s) * step_s
+    end_epoch = math.ceil(end.timestamp() / step_s) * step_s
+    return (
+        datetime.fromtimestamp(start_epoch, tz=timezone.utc),
+        datetime.fromtimestamp(end_epoch, tz=timezone.utc),
+        step_s,
+    )
+
+async def _system_timezone() -> ZoneInfo:
+    """The `timezone` system setting: as last read by the live counters, else from the database."""
+    if live_counters.is_seeded():
+        return live_counters.tz
+    return await run_in_db(_query_timezone)
+
+def _cache_ttl(end: datetime) -> float:
+    """Short TTL while the window still covers the current bucket, long once closed."""
+    if end.timestamp() > time.time():
+        return settings.GRAFANA_CACHE_LIVE_TTL_S
+    return settings.GRAFANA_CACHE_CLOSED_TTL_S
+
+# Sources whose buckets the recent count index can compute (any multiple of 1 s / 1 h)
+_INDEXED_SOURCES = ("hourly", "raw")
+
+def _index_timeseries(start: datetime, end: datetime, step_s: int, per_hour: bool) -> list:
+    scale = 3600.0 / step_s if per_hour else 1
+    return [[n * scale, ts_ms] for ts_ms, n in recent_counts.histogram(start, end, step_s)]
+
+async def _fetch_grafana_timeseries(target: str, series: _GrafanaSeries, request: dict):
+    """
+    Fetches one bucketed time series for the requested range: from the
+    recent count index when it covers the range, otherwise from the
+    database through the cache.
+    """
+    try:
+        tz = await _system_timezone() if series.source == "daily" else timezone.utc
+    except Exception as e:
+        logger.error(f"Error fetching Grafana data for target '{target}': {e}")
+        raise HTTPException(status_code=500, detail=f"Failed to fetch data for {series.title}")
+    start, end, step_s = _resolve_window(series, request, tz)
+    if series.source in _INDEXED_SOURCES and recent_counts.covers(start):
+        datapoints = _index_timeseries(start, end, step_s, series.per_hour)
+        return [GrafanaTimeSeriesResponse(target=series.title, datapoints=datapoints)]
+
+    key = (target, start.timestamp(), end.timestamp(), step_s)
+    cached = grafana_cache.get(key)
+    if cached is not None:
+        return cached
+
+    generation = grafana_cache.generation
+    try:
+        datapoints = await run_in_db(_query_timeseries, series.source, start, end, step_s, series.per_hour)
     except Exception as e:
-        logger.error(f"Error fetching Grafana data from view '{view_name}': {e}")
-        raise HTTPException(status_code=500, detail=f"Failed to fetch data for {target_name}")
+        logger.error(f"Error fetching Grafana data for target '{target}': {e}")
+        raise HTTPException(status_code=500, detail=f"Failed to fetch data for {series.title}")
+
+    result = [GrafanaTimeSeriesResponse(target=series.title, datapoints=datapoints)]
+    grafana_cache.put(
+        key, result, _cache_ttl(end),
+        size=128 + 48 * len(datapoints),
+        start=start.timestamp(), end=end.timestamp(),
+        generation=generation
+    )
+    return result
+
+def _today_table(total_counts, first_count_time, last_count_time) -> list:
+    return [{
+        "type": "table",
+        "columns": [
+            {"text": "Total Counts Today", "type": "number"},
+            {"text": "First Count Time", "type": "string"},
+            {"text": "Last Count Time", "type": "string"},
+        ],
+        "rows": [[total_counts, str(first_count_time), str(last_count_time)]]
+    }]
+
+def _index_today_table(start: datetime, end: datetime) -> list:
+    bounds = recent_counts.first_last(start, end)
+    if bounds is None:
+        return _today_table(0, "N/A", "N/A")
+    first, last = (datetime.fromtimestamp(ms / 1000, tz=recent_counts.tz).time() for ms in bounds)
+    return _today_table(recent_counts.count_range(start, end), first, last)
+
+async def _fetch_grafana_today_table():
+    # Today in the system timezone, answered from the recent count index when it is loaded
+    midnight = datetime.now(recent_counts.tz).replace(hour=0, minute=0, second=0, microsecond=0)
+    if recent_counts.covers(midnight):
+        return _index_today_table(midnight, midnight + timedelta(days=1))
+
+    key = ("today_stats_table",)
+    cached = grafana_cache.get(key)
+    if cached is not None:
+        return cached
+
+    generation = grafana_cache.generation
+    try:
+        stats = await run_in_db(_query_today_stats)
+    except Exception as e:
+        logger.error(f"Error fetching Grafana table data for 'today_stats': {e}")
+        raise HTTPException(status_code=500, detail="Failed to fetch table data")
+
+    result = _today_table(
+        stats.get("total_counts", 0),
+        stats.get("first_count_time", "N/A"),
+        stats.get("last_count_time", "N/A"),
+    )
+    # Today's table always covers "now": any new count invalidates it
+    now = time.time()
+    grafana_cache.put(
+        key, result, settings.GRAFANA_CACHE_LIVE_TTL_S, size=512,
+        start=now - 86400, end=float("inf"), generation=generation
+    )
+    return result
+
+async def _fetch_grafana_target(target: str, request: dict) -> list:
+    if target in _GRAFANA_SERIES:
+        return await _fetch_grafana_timeseries(target, _GRAFANA_SERIES[target], request)
+    if target == "today_stats_table":
+        return await _fetch_grafana_today_table()
+    logger.warning(f"Unknown Grafana target requested: {target}")
+    return []
 
 @router.get("/grafana", response_model=dict)
 async def grafana_root():
     """Root endpoint for Grafana datasource to confirm connectivity."""
     return {"status": "ok"}
 
+@router.get("/grafana/cache", response_model=QueryCacheStatsResponse)
+async def grafana_cache_stats():
+    """Returns hit/miss and size counters of the Grafana result cache."""
+    return grafana_cache.get_stats()
+
 @router.get("/grafana/search", response_model=list[str])
 async def grafana_search():
     """Provides a list of available metrics for Grafana variables."""
@@ -114,51 +554,26 @@ async def grafana_search():
     ]
 
 @router.post("/grafana/query", response_model=list)
-async def grafana_query(request: dict, db: connection = Depends(db_dependency)):
+async def grafana_query(request: dict):
     """
     Main query endpoint for Grafana.
-    It receives targets from a dashboard and returns the corresponding data.
+    All (non-hidden) targets of a panel are fetched concurrently, honouring
+    the request's `range`, `intervalMs` and `maxDataPoints`.
     """
-    target = request.get("targets", [{}])[0].get("target")
-    logger.info(f"Grafana query received for target: {target}")
+    targets = [
+        t["target"] for t in request.get("targets") or []
+        if isinstance(t, dict) and t.get("target") and not t.get("hide")
+    ]
+    logger.info(f"Grafana query received for targets: {targets}")
 
-    if not target:
+    if not targets:
         return []
 
-    if target == "hourly_counts":
-        return await _fetch_grafana_timeseries(db, "hourly_counts", "Pizzas per Hour", "total_counts", days_limit=7)
-    
-    if target == "daily_counts":
-        return await _fetch_grafana_timeseries(db, "daily_counts", "Pizzas per Day", "total_counts", days_limit=365)
-
-    if target == "production_speed":
-        return await _fetch_grafana_timeseries(db, "production_speed", "Production Speed (pizzas/h)", "pizzas_per_hour", days_limit=2)
-
-    if target == "recent_counts":
-        return await _fetch_grafana_timeseries(db, "recent_counts_24h", "Real-time Counts", "id", days_limit=1) # Value is not used here, just the timestamp matters
-
-    if target == "today_stats_table":
-        try:
-            with db.cursor(cursor_factory=RealDictCursor) as cur:
-                cur.execute("SELECT * FROM today_stats LIMIT 1")
-                stats = cur.fetchone() or {}
-                return [{
-                    "type": "table",
-                    "columns": [
-                        {"text": "Total Counts Today", "type": "number"},
-                        {"text": "First Count Time", "type": "string"},
-                        {"text": "Last Count Time", "type": "string"},
-                    ],
-                    "rows": [
-                        [
-                            stats.get("total_counts", 0),
-                            str(stats.get("first_count_time", "N/A")),
-                            str(stats.get("last_count_time", "N/A")),
-                        ]
-                    ]
-                }]
-        except Exception as e:
-            logger.error(f"Error fetching Grafana table data for 'today_stats': {e}")
-            raise HTTPException(status_code=500, detail="Failed to fetch table data")
-    
-    return []
\ No newline at end of file
+    # Validated once here, so a bad value is a 400 rather than a failed target
+    request = {
+        **request,
+        "intervalMs": _grafana_number(request, "intervalMs"),
+        "maxDataPoints": _grafana_number(request, "maxDataPoints"),
+    }
+    results = await asyncio.gather(*(_fetch_grafana_target(t, request) for t in targets))
+    return [item for result in results for item in result]
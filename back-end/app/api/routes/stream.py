@@ -0,0 +1,109 @@
+# back-end/app/api/routes/stream.py
+
+import asyncio
+import json
+import logging
+from fastapi import APIRouter, HTTPException, Query, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
+
+from app.core.config import settings
+from app.schemas.stream import StreamStatsResponse
+from app.services.event_bus import POLICIES, POLICY_COALESCE, Subscription
+from app.services.mqtt_client import event_bus
+
+router = APIRouter()
+logger = logging.getLogger(__name__)
+
+_POLICY_PATTERN = f"^({'|'.join(POLICIES)})$"
+
+def _subscribe(sensor_id: list[str] | None, policy: str, queue_size: int | None) -> Subscription:
+    try:
+        return event_bus.subscribe(set(sensor_id) if sensor_id else None, policy, queue_size)
+    except RuntimeError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+
+@router.get("/stream/events")
+async def stream_events_sse(
+    request: Request,
+    sensor_id: list[str] | None = Query(None),
+    policy: str = Query(POLICY_COALESCE, pattern=_POLICY_PATTERN),
+    queue_size: int | None = Query(None, ge=1, le=10000)
+):
+    """
+    Server-Sent Events stream of live counts and sensor state changes.
+    Repeat `sensor_id` to follow only some sensors.
+    """
+    subscription = _subscribe(sensor_id, policy, queue_size)
+
+    async def event_source():
+        try:
+            while not await request.is_disconnected():
+                try:
+                    event = await asyncio.wait_for(subscription.get(), timeout=settings.STREAM_HEARTBEAT_S)
+                except asyncio.TimeoutError:
+                    # Comment line keeps proxies from closing an idle stream
+                    yield ": keep-alive\n\n"
+                    continue
+                yield f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
+        finally:
+            event_bus.unsubscribe(subscription)
+
+    return StreamingResponse(
+        event_source(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+async def _until_disconnected(websocket: WebSocket):
+    """Reads (and ignores) client messages until the client goes away."""
+    while (await websocket.receive())["type"] != "websocket.disconnect":
+        pass
+
+async def _send_events(websocket: WebSocket, subscription: Subscription):
+    while True:
+        try:
+            event = await asyncio.wait_for(subscription.get(), timeout=settings.STREAM_HEARTBEAT_S)
+        except asyncio.TimeoutError:
+            # Sending reveals a dead connection while the sensor filter is quiet
+            event = {"type": "heartbeat"}
+        await websocket.send_json(event)
+
+@router.websocket("/stream/ws")
+async def stream_events_ws(
+    websocket: WebSocket,
+    sensor_id: list[str] | None = Query(None),
+    policy: str = Query(POLICY_COALESCE, pattern=_POLICY_PATTERN),
+    queue_size: int | None = Query(None, ge=1, le=10000)
+):
+    """
+    WebSocket stream of live counts and sensor state changes (JSON
+    messages), with a `{"type": "heartbeat"}` message after
+    STREAM_HEARTBEAT_S without events. Ends as soon as either side does.
+    """
+    try:
+        subscription = event_bus.subscribe(set(sensor_id) if sensor_id else None, policy, queue_size)
+    except RuntimeError:
+        await websocket.close(code=1013)  # Try again later
+        return
+
+    await websocket.accept()
+    tasks = [
+        asyncio.create_task(_until_disconnected(websocket)),
+        asyncio.create_task(_send_events(websocket, subscription)),
+    ]
+    try:
+        done, pending = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            error = task.exception()
+            if error is not None and not isinstance(error, WebSocketDisconnect):
+                logger.warning(f"WebSocket stream closed: {error}")
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        event_bus.unsubscribe(subscription)
+
+@router.get("/stream/stats", response_model=StreamStatsResponse)
+async def stream_stats():
+    """Returns subscriber and delivery counters for the live streams."""
+    return event_bus.get_stats()
@@ -1,19 +1,44 @@
 # back-end/app/api/routes/system.py
 
+import asyncio
 import logging
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, HTTPException, Query, Response
+from fastapi.responses import PlainTextResponse
 from psycopg2.extensions import connection
 
-from app.db.session import db_dependency
+from app.core.config import settings
+from app.core.metrics import registry
+from app.db.session import run_in_db, get_pool_stats
 from app.schemas.system import (
-    HealthResponse, MqttStatusResponse, SystemLogResponse, ApiInfoResponse
+    HealthResponse, ReadinessResponse, MqttStatusResponse, SystemLogResponse, ApiInfoResponse,
+    DbPoolStatsResponse, MaintenanceReportResponse, MaintenanceStatusResponse
 )
-from app.services.mqtt_client import get_mqtt_status
+from app.services.mqtt_client import get_mqtt_status, maintenance
+from app.services.readiness import readiness
 
 # APIRouter allows us to declare routes in different files
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
+def _ping_database(db: connection):
+    with db.cursor() as cur:
+        cur.execute("SELECT 1")
+        cur.fetchone()
+
+def _query_system_logs(db: connection, limit: int, level: str | None):
+    with db.cursor() as cur:
+        sql_query = "SELECT level, message, source, timestamp, occurrences FROM system_logs"
+        params = []
+        if level:
+            sql_query += " WHERE level = %s"
+            params.append(level.upper())
+
+        sql_query += " ORDER BY timestamp DESC LIMIT %s"
+        params.append(limit)
+
+        cur.execute(sql_query, tuple(params))
+        return cur.fetchall()
+
 @router.get("/", response_model=ApiInfoResponse)
 async def read_root():
     """Provides basic information about the API."""
@@ -25,14 +50,12 @@ async def read_root():
     }
 
 @router.get("/health", response_model=HealthResponse)
-async def health_check(db: connection = Depends(db_dependency)):
+async def health_check():
     """Performs a health check on the API and its database connection."""
     db_connected = False
     message = "API is running."
     try:
-        with db.cursor() as cur:
-            cur.execute("SELECT 1")
-            cur.fetchone()
+        await run_in_db(_ping_database)
         db_connected = True
         message = "API and database connection are healthy."
         logger.debug("Health check successful.")
@@ -46,6 +69,18 @@ async def health_check(db: connection = Depends(db_dependency)):
         database_connected=db_connected
     )
 
+@router.get("/ready", response_model=ReadinessResponse, responses={503: {"model": ReadinessResponse}})
+async def readiness_check(response: Response):
+    """
+    Readiness probe: 200 once the database has been reached and the caches
+    (live counters, recent count index) are loaded, 503 while warming up or
+    shutting down. Use it to route traffic; /health for liveness.
+    """
+    status = readiness.status()
+    if not status["ready"]:
+        response.status_code = 503
+    return ReadinessResponse(**status)
+
 @router.get("/mqtt-status", response_model=MqttStatusResponse)
 async def mqtt_status():
     """Returns the current status of the MQTT client."""
@@ -57,31 +92,61 @@ async def mqtt_status():
             status_code=500, detail="Could not retrieve MQTT status"
         )
 
+@router.get("/db-pool", response_model=DbPoolStatsResponse)
+async def db_pool_status():
+    """Returns the database connection pool counters."""
+    stats = get_pool_stats()
+    if stats is None:
+        raise HTTPException(status_code=503, detail="Database connection pool not created yet.")
+    return stats
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Exposes the application metrics in the Prometheus text format."""
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
+@router.get("/maintenance", response_model=MaintenanceStatusResponse)
+async def maintenance_status():
+    """Returns the maintenance schedule and the report of the last run."""
+    return MaintenanceStatusResponse(
+        enabled=settings.MAINTENANCE_ENABLED,
+        running=maintenance.running,
+        next_run_at=maintenance.next_run_at,
+        last_report=maintenance.last_report,
+    )
+
+@router.post("/maintenance/run", response_model=MaintenanceReportResponse)
+async def run_maintenance():
+    """
+    Runs database maintenance now and returns its report. Only where this
+    process ingests (INGEST_MODE=embedded): read-only API workers refuse it.
+    """
+    if settings.INGEST_MODE == "external":
+        raise HTTPException(
+            status_code=403,
+            detail="Maintenance runs in the ingest process (INGEST_MODE=external); this API is read-only."
+        )
+    try:
+        report = await asyncio.to_thread(maintenance.run_once)
+    except Exception as e:
+        logger.error(f"Maintenance run failed: {e}")
+        raise HTTPException(status_code=500, detail="Maintenance run failed.")
+    if report is None:
+        raise HTTPException(status_code=409, detail="Maintenance is already running.")
+    return report
+
 @router.get("/logs", response_model=list[SystemLogResponse])
 async def get_system_logs(
-    db: connection = Depends(db_dependency),
     limit: int = Query(100, le=500),
     level: str | None = Query(None, pattern="^(INFO|WARNING|ERROR)$")
 ):
     """Retrieves system logs from the database."""
     try:
-        with db.cursor() as cur:
-            sql_query = "SELECT level, message, source, timestamp FROM system_logs"
-            params = []
-            if level:
-                sql_query += " WHERE level = %s"
-                params.append(level.upper())
-            
-            sql_query += " ORDER BY timestamp DESC LIMIT %s"
-            params.append(limit)
-            
-            cur.execute(sql_query, tuple(params))
-            logs = cur.fetchall()
-
-            return [
-                SystemLogResponse(level=row[0], message=row[1], source=row[2], timestamp=row[3])
-                for row in logs
-            ]
+        logs = await run_in_db(_query_system_logs, limit, level)
+        return [
+            SystemLogResponse(level=row[0], message=row[1], source=row[2], timestamp=row[3], occurrences=row[4])
+            for row in logs
+        ]
     except Exception as e:
         logger.error(f"Error fetching system logs: {e}")
         raise HTTPException(status_code=500, detail="Failed to fetch logs.")
\ No newline at end of file
@@ -2,6 +2,7 @@
 
 from pydantic_settings import BaseSettings
 from functools import lru_cache
+from typing import Literal
 
 class Settings(BaseSettings):
     """
@@ -13,14 +14,102 @@ class Settings(BaseSettings):
     DB_USER: str    
     DB_PASSWORD: str
     DB_NAME: str
+    DB_POOL_MIN_CONN: int = 1
+    DB_POOL_MAX_CONN: int = 10
+    DB_POOL_TIMEOUT_S: float = 5.0  # Max wait for a free connection
+    DB_POOL_MAX_LIFETIME_S: float = 1800.0  # Recycle connections older than this
+    DB_POOL_HEALTHCHECK_IDLE_S: float = 30.0  # Ping connections idle longer than this
+    DB_EXECUTOR_WORKERS: int | None = None  # Defaults to DB_POOL_MAX_CONN - 2
+    DB_CONNECT_TIMEOUT_S: int = 10  # Per connection attempt
+    DB_CONNECT_RETRY_INITIAL_S: float = 1.0  # First startup retry delay, doubling...
+    DB_CONNECT_RETRY_MAX_S: float = 30.0  # ...up to this
 
     # MQTT
     MQTT_BROKER_HOST: str
     MQTT_BROKER_PORT: int
     MQTT_TOPIC_STATE: str
+    MQTT_TOPIC_COUNTS: str = "sensors/barrier/counts"  # Batched deltas from edge-counting firmware
     MQTT_USERNAME: str | None = None
     MQTT_PASSWORD: str | None = None
     MQTT_CLIENT_ID: str
+    MQTT_SHARE_GROUP: str | None = None  # Split sensors across replicas via $share/<group>/<topic>
+    MQTT_INBOX_SIZE: int = 1000  # Received messages buffered before reading from the broker pauses
+
+    # Sensor state machines
+    SENSOR_DEBOUNCE_MS: int = 100  # Ignore state transitions faster than this (in ms)
+    SENSOR_IDLE_TTL_S: int = 3600  # Forget sensors silent for longer than this
+    SENSOR_REORDER_WINDOW: int = 256  # Sequence numbers remembered per sensor for dedup/reordering
+    EDGE_BATCH_MAX_COUNTS: int = 10000  # Count batches (with recovered counts) above this are dropped
+
+    # Ingestion (buffered count writer)
+    INGEST_QUEUE_SIZE: int = 10000
+    INGEST_BATCH_SIZE: int = 500
+    INGEST_FLUSH_INTERVAL_MS: int = 500
+    INGEST_ENQUEUE_TIMEOUT_MS: int = 50
+
+    # Ingestion process layout
+    INGEST_MODE: Literal["embedded", "external"] = "embedded"  # embedded: the API ingests | external: `python -m app.ingest` does
+    INGEST_NOTIFY_CHANNEL: str = "terelina_changes"  # NOTIFY channel from the ingester to the API
+    INGEST_HEARTBEAT_S: float = 5.0  # Ingester status sent to the API this often
+    INGEST_LEADER_LOCK_KEY: int = 0x7465726e  # Advisory lock electing the single active ingester
+    INGEST_LEADER_CHECK_S: float = 5.0  # Standby retry and leader lock check interval
+    INGEST_METRICS_PORT: int = 8001  # /metrics and /health of the ingest process (0 disables)
+
+    # Live statistics cache
+    LIVE_STATS_RECONCILE_S: float = 300.0  # Re-read totals from the DB this often
+
+    # Recent count index (dashboard queries served from memory)
+    RECENT_INDEX_HOURS: float = 72.0  # Count timestamps kept in memory (0 disables)
+
+    # Grafana result cache
+    GRAFANA_CACHE_MAX_BYTES: int = 16 * 1024 * 1024
+    GRAFANA_CACHE_MAX_ENTRIES: int = 1024
+    GRAFANA_CACHE_LIVE_TTL_S: float = 10.0  # Windows that include the current bucket
+    GRAFANA_CACHE_CLOSED_TTL_S: float = 3600.0  # Windows entirely in the past
+
+    # Production analytics (/v1/analytics)
+    ANALYTICS_SHIFTS: str = "morning=08:00-12:00,afternoon=13:00-17:00"  # name=HH:MM-HH:MM, in the system timezone
+    ANALYTICS_STOPPAGE_S: float = 300.0  # Default gap without counts reported as a stoppage
+    ANALYTICS_ROLLING_WINDOW_S: int = 3600  # Default trailing window of the rolling throughput
+    ANALYTICS_MAX_DAYS: int = 366  # Longest range one report may cover
+    ANALYTICS_CACHE_MAX_BYTES: int = 64 * 1024 * 1024  # Closed days of timestamps and closed shift summaries
+    ANALYTICS_CACHE_MAX_ENTRIES: int = 8192
+    ANALYTICS_CACHE_TTL_S: float = 86400.0  # Late counts invalidate entries earlier
+
+    # Live event streams (WebSocket / SSE)
+    STREAM_MAX_SUBSCRIBERS: int = 200
+    STREAM_QUEUE_SIZE: int = 256  # Per-client buffered events before drop/coalesce
+    STREAM_HEARTBEAT_S: float = 15.0
+
+    # Durable spool for counts written while the database is unavailable
+    SPOOL_ENABLED: bool = True
+    SPOOL_DIR: str = "spool"
+    SPOOL_SEGMENT_MAX_BYTES: int = 4 * 1024 * 1024
+    SPOOL_FSYNC: bool = True  # One fsync per spooled batch
+    SPOOL_REPLAY_INTERVAL_S: float = 5.0  # Also how long the writer skips a failed database
+
+    # Raw sensor event capture (for offline recounts with `python -m app.recount`)
+    EVENT_CAPTURE_ENABLED: bool = False
+    EVENT_CAPTURE_DIR: str = "event_capture"
+    EVENT_CAPTURE_SEGMENT_MAX_BYTES: int = 64 * 1024 * 1024
+    EVENT_CAPTURE_MAX_BYTES: int = 1024 * 1024 * 1024  # Oldest segments are deleted beyond this
+    EVENT_CAPTURE_FLUSH_INTERVAL_S: float = 1.0
+
+    # Bulk export (/v1/counts/export)
+    EXPORT_CHUNK_ROWS: int = 5000  # Rows fetched per server-side cursor round trip
+    EXPORT_MAX_CONCURRENT: int = 2  # Each running export holds a pooled connection
+
+    # System event log (system_logs table)
+    SYSTEM_LOG_FLUSH_INTERVAL_S: float = 5.0  # Identical events within this window share one row
+    SYSTEM_LOG_INFO_PER_MIN: int = 60  # New rows allowed per level and minute
+    SYSTEM_LOG_WARNING_PER_MIN: int = 120
+    SYSTEM_LOG_ERROR_PER_MIN: int = 120
+    SYSTEM_LOG_INFO_SAMPLE_RATE: float = 1.0  # Fraction of distinct INFO events kept
+
+    # Database maintenance (retention settings live in system_settings)
+    MAINTENANCE_ENABLED: bool = True
+    MAINTENANCE_DELETE_BATCH: int = 5000  # Rows per retention DELETE transaction
+    MAINTENANCE_STARTUP_DELAY_S: float = 300.0  # Keeps maintenance off the startup path
 
     # Application
     LOG_LEVEL: str = "INFO"
@@ -36,5 +125,18 @@ class Settings(BaseSettings):
 def get_settings() -> Settings:
     return Settings()
 
-# Instantiate it once to be easily imported elsewhere
-settings = get_settings()
\ No newline at end of file
+class _LazySettings:
+    """
+    Resolves get_settings() on first attribute access instead of at import.
+    Modules that only read settings inside functions (app.db.session,
+    app.recount) can then be imported without DB_*/MQTT_* set. Modules that
+    build singletons from settings at import (app.services.mqtt_client,
+    app.services.query_cache, the API routes, app.main, app.ingest) still
+    need the environment when they are imported.
+    """
+
+    def __getattr__(self, name: str):
+        return getattr(get_settings(), name)
+
+# Importable everywhere as `from app.core.config import settings`
+settings = _LazySettings()
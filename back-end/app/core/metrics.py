@@ -0,0 +1,277 @@
+# back-end/app/core/metrics.py
+
+import bisect
+import logging
+import math
+import threading
+import time
+from typing import Callable, Iterable, NamedTuple
+
+logger = logging.getLogger(__name__)
+
+# Default latency buckets (upper bounds, in seconds)
+LATENCY_BUCKETS_S = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class MetricFamily(NamedTuple):
+    """One metric as exposed: its samples are (name suffix, labels, value)."""
+    name: str
+    kind: str  # counter | gauge | histogram
+    documentation: str
+    samples: list
+
+
+# =====================================================================
+# Metric Types
+# =====================================================================
+
+class _ShardedMetric:
+    """
+    Base of the hot-path metrics. Each thread updates its own shard of
+    values, so recording never takes a lock; a scrape adds the shards up.
+    """
+
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._local = threading.local()
+        self._shards: list[dict] = []
+        self._shards_lock = threading.Lock()
+
+    def _shard(self) -> dict:
+        try:
+            return self._local.values
+        except AttributeError:
+            values = {}
+            with self._shards_lock:
+                self._shards.append(values)
+            self._local.values = values
+            return values
+
+    def _snapshots(self) -> list[dict]:
+        with self._shards_lock:
+            shards = list(self._shards)
+        # dict() copies in one step under the GIL, even while the owner writes
+        return [dict(shard) for shard in shards]
+
+    def _labels(self, values: tuple) -> dict:
+        return dict(zip(self.labelnames, values))
+
+
+class Counter(_ShardedMetric):
+    """A monotonically increasing count, optionally split by labels."""
+
+    kind = "counter"
+
+    def inc(self, *labelvalues, amount: float = 1):
+        values = self._shard()
+        values[labelvalues] = values.get(labelvalues, 0) + amount
+
+    def collect(self) -> MetricFamily:
+        totals: dict[tuple, float] = {}
+        for shard in self._snapshots():
+            for key, value in shard.items():
+                totals[key] = totals.get(key, 0) + value
+        samples = [("", self._labels(key), value) for key, value in sorted(totals.items())]
+        return MetricFamily(self.name, self.kind, self.documentation, samples)
+
+
+class Histogram(_ShardedMetric):
+    """A distribution of observed values over fixed buckets, plus their sum."""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = (),
+                 buckets: Iterable[float] = LATENCY_BUCKETS_S):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, *labelvalues):
+        values = self._shard()
+        cell = values.get(labelvalues)
+        if cell is None:
+            # One slot per bucket, one for +Inf, then the sum
+            cell = values[labelvalues] = [0] * (len(self.buckets) + 2)
+        cell[bisect.bisect_left(self.buckets, value)] += 1
+        cell[-1] += value
+
+    def collect(self) -> MetricFamily:
+        totals: dict[tuple, list] = {}
+        for shard in self._snapshots():
+            for key, cell in shard.items():
+                cell = list(cell)
+                total = totals.get(key)
+                if total is None:
+                    totals[key] = cell
+                else:
+                    for i, value in enumerate(cell):
+                        total[i] += value
+        samples = []
+        for key, cell in sorted(totals.items()):
+            samples.extend(histogram_samples(self._labels(key), self.buckets, cell[:-1], cell[-1]))
+        return MetricFamily(self.name, self.kind, self.documentation, samples)
+
+
+def histogram_samples(labels: dict, bounds: Iterable[float], bucket_counts: list, total: float) -> list:
+    """
+    Builds the cumulative `_bucket`, `_sum` and `_count` samples of a
+    histogram from per-bucket counts (the last one being +Inf).
+    """
+    samples = []
+    cumulative = 0
+    for bound, count in zip(list(bounds) + [math.inf], bucket_counts):
+        cumulative += count
+        samples.append(("_bucket", {**labels, "le": _format_value(float(bound))}, cumulative))
+    samples.append(("_sum", labels, total))
+    samples.append(("_count", labels, cumulative))
+    return samples
+
+
+# =====================================================================
+# Registry and Exposition
+# =====================================================================
+
+class MetricsRegistry:
+    """
+    In-process metrics exposed in the Prometheus text format.
+
+    Hot paths record into counters and histograms; figures the services
+    already keep (pool, ingestion and cache stats) are read by collectors
+    only when the registry is scraped.
+    """
+
+    def __init__(self):
+        self._metrics: dict[str, _ShardedMetric] = {}
+        self._collectors: list[Callable[[], Iterable[MetricFamily]]] = []
+        self._lock = threading.Lock()
+
+    def counter(self, name: str, documentation: str, labelnames: Iterable[str] = ()) -> Counter:
+        return self._register(Counter, name, documentation, labelnames)
+
+    def histogram(self, name: str, documentation: str, labelnames: Iterable[str] = (),
+                  buckets: Iterable[float] = LATENCY_BUCKETS_S) -> Histogram:
+        return self._register(Histogram, name, documentation, labelnames, buckets=buckets)
+
+    def _register(self, cls, name: str, documentation: str, labelnames, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, documentation, labelnames, **kwargs)
+            elif not isinstance(metric, cls):
+                raise ValueError(f"Metric {name} is already registered as a {metric.kind}")
+            return metric
+
+    def register_collector(self, collector: Callable[[], Iterable[MetricFamily]]):
+        """Adds a callable that returns metric families at scrape time."""
+        with self._lock:
+            self._collectors.append(collector)
+
+    def collect(self) -> list[MetricFamily]:
+        with self._lock:
+            metrics = list(self._metrics.values())
+            collectors = list(self._collectors)
+        families = [metric.collect() for metric in metrics]
+        for collector in collectors:
+            try:
+                families.extend(collector())
+            except Exception as e:
+                logger.error(f"Metrics collector {collector!r} failed: {e}")
+        return families
+
+    def render(self) -> str:
+        """Returns every metric in the Prometheus text exposition format."""
+        lines = []
+        for family in self.collect():
+            lines.append(f"# HELP {family.name} {_escape(family.documentation, help_text=True)}")
+            lines.append(f"# TYPE {family.name} {family.kind}")
+            for suffix, labels, value in family.samples:
+                lines.append(f"{family.name}{suffix}{_format_labels(labels)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value: str, help_text: bool = False) -> str:
+    value = str(value).replace("\\", "\\\\").replace("\n", "\\n")
+    return value if help_text else value.replace('"', '\\"')
+
+
+def _format_labels(labels: dict) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels.items()) + "}"
+
+
+def _format_value(value) -> str:
+    if value is None:
+        return "NaN"
+    if isinstance(value, bool):
+        return "1" if value else "0"
+    if isinstance(value, int):
+        return str(value)
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value))
+
+
+def gauge_family(name: str, documentation: str, value, labels: dict | None = None) -> MetricFamily:
+    """A single-sample gauge family, for collectors."""
+    return MetricFamily(name, "gauge", documentation, [("", labels or {}, value)])
+
+
+def counter_family(name: str, documentation: str, samples: Iterable[tuple[dict, float]]) -> MetricFamily:
+    """A counter family of (labels, value) samples, for collectors."""
+    return MetricFamily(name, "counter", documentation, [("", labels, value) for labels, value in samples])
+
+
+# Shared registry exposed at /metrics
+registry = MetricsRegistry()
+
+
+# =====================================================================
+# HTTP Request Instrumentation
+# =====================================================================
+
+_REQUEST_SECONDS = registry.histogram(
+    "terelina_http_request_duration_seconds",
+    "HTTP request latency until the response has been sent, by route.",
+    ("method", "route", "status"),
+)
+
+
+class RequestMetricsMiddleware:
+    """
+    ASGI middleware that records the latency of every HTTP request. Routes
+    are labelled by their template (e.g. /v1/counts/page), so path
+    parameters don't create new series; unknown paths share one label.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            # The router stores the matched route in the shared scope
+            route = scope.get("route")
+            _REQUEST_SECONDS.observe(
+                time.perf_counter() - started,
+                scope["method"],
+                getattr(route, "path", "unmatched"),
+                str(status),
+            )
@@ -0,0 +1,236 @@
+# back-end/app/db/pool.py
+
+import bisect
+import logging
+import threading
+import time
+from collections import deque
+
+import psycopg2
+import psycopg2.pool
+from psycopg2 import extensions
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds (ms) of the checkout wait-time histogram buckets
+WAIT_BUCKETS_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+
+class PoolTimeout(psycopg2.pool.PoolError):
+    """Raised when no connection becomes available within the timeout."""
+
+
+class BoundedConnectionPool:
+    """
+    Thread-safe psycopg2 connection pool with blocking acquisition.
+
+    Callers wait (up to a timeout) for a free connection instead of failing
+    immediately when the pool is exhausted. Idle connections are validated
+    before reuse and recycled once they exceed their maximum lifetime, so
+    the pool recovers on its own after a Postgres restart.
+    """
+
+    def __init__(self, minconn: int, maxconn: int, timeout_s: float = 5.0,
+                 max_lifetime_s: float = 1800.0, health_check_idle_s: float = 30.0,
+                 **connect_kwargs):
+        if maxconn < 1 or minconn > maxconn:
+            raise ValueError("Invalid pool bounds: require 1 <= maxconn and minconn <= maxconn")
+
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.timeout_s = timeout_s
+        self.max_lifetime_s = max_lifetime_s
+        self.health_check_idle_s = health_check_idle_s
+        self._connect_kwargs = connect_kwargs
+
+        self._cond = threading.Condition(threading.Lock())
+        self._idle: deque = deque()   # (conn, returned_at), most recent on the right
+        self._born: dict[int, float] = {}  # id(conn) -> creation time
+        self._total = 0
+        self._in_use = 0
+        self._closed = False
+
+        self._stats = {
+            "checkouts": 0,
+            "timeouts": 0,
+            "connections_created": 0,
+            "connections_closed": 0,
+            "recycled": 0,
+            "health_check_failures": 0,
+            "wait_ms_sum": 0.0,
+            "wait_ms_max": 0.0,
+        }
+        self._wait_buckets = [0] * (len(WAIT_BUCKETS_MS) + 1)
+
+        try:
+            for _ in range(minconn):
+                conn = self._connect()
+                with self._cond:
+                    self._total += 1
+                    self._idle.append((conn, time.monotonic()))
+        except Exception:
+            # Don't leak the connections opened before the failure
+            self.closeall()
+            raise
+
+    # -----------------------------------------------------------------
+    # Public API (compatible with psycopg2.pool)
+    # -----------------------------------------------------------------
+
+    def getconn(self, timeout: float | None = None):
+        """
+        Returns a healthy connection, waiting up to `timeout` seconds
+        (default: the pool timeout) for one to be released.
+        """
+        timeout = self.timeout_s if timeout is None else timeout
+        started = time.monotonic()
+        deadline = started + timeout
+
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise psycopg2.pool.PoolError("connection pool is closed")
+                if self._idle:
+                    conn, returned_at = self._idle.pop()
+                    create = False
+                    break
+                if self._total < self.maxconn:
+                    self._total += 1
+                    conn, returned_at = None, None
+                    create = True
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._stats["timeouts"] += 1
+                    raise PoolTimeout(
+                        f"No database connection available within {timeout:.1f}s "
+                        f"({self.maxconn} in use)"
+                    )
+                self._cond.wait(remaining)
+            self._in_use += 1
+
+        try:
+            if create:
+                conn = self._connect()
+            else:
+                conn = self._validate(conn, returned_at)
+        except Exception:
+            with self._cond:
+                self._total -= 1
+                self._in_use -= 1
+                self._cond.notify()
+            raise
+
+        waited_ms = (time.monotonic() - started) * 1000
+        with self._cond:
+            self._stats["checkouts"] += 1
+            self._stats["wait_ms_sum"] += waited_ms
+            if waited_ms > self._stats["wait_ms_max"]:
+                self._stats["wait_ms_max"] = waited_ms
+            self._wait_buckets[bisect.bisect_left(WAIT_BUCKETS_MS, waited_ms)] += 1
+        return conn
+
+    def putconn(self, conn, close: bool = False):
+        """Returns a connection to the pool, discarding it if it is unusable."""
+        if not close and not conn.closed:
+            try:
+                # Never keep a connection that is mid-transaction
+                if conn.get_transaction_status() != extensions.TRANSACTION_STATUS_IDLE:
+                    conn.rollback()
+            except Exception:
+                close = True
+
+        expired = self._is_expired(conn)
+        if close or conn.closed or expired or self._closed:
+            if expired and not conn.closed:
+                with self._cond:
+                    self._stats["recycled"] += 1
+            self._discard(conn)
+            with self._cond:
+                self._total -= 1
+                self._in_use -= 1
+                self._cond.notify()
+            return
+
+        with self._cond:
+            self._in_use -= 1
+            self._idle.append((conn, time.monotonic()))
+            self._cond.notify()
+
+    def closeall(self):
+        """Closes every idle connection and refuses further checkouts."""
+        with self._cond:
+            self._closed = True
+            idle = list(self._idle)
+            self._idle.clear()
+            self._total -= len(idle)
+            self._cond.notify_all()
+        for conn, _ in idle:
+            self._discard(conn)
+
+    def get_stats(self) -> dict:
+        """Returns a snapshot of the pool counters and gauges."""
+        with self._cond:
+            stats = dict(self._stats)
+            buckets = list(self._wait_buckets)
+            stats.update({
+                "in_use": self._in_use,
+                "idle": len(self._idle),
+                "total": self._total,
+                "max": self.maxconn,
+            })
+        stats["wait_ms_sum"] = round(stats["wait_ms_sum"], 3)
+        stats["wait_ms_max"] = round(stats["wait_ms_max"], 3)
+        labels = [str(b) for b in WAIT_BUCKETS_MS] + ["+Inf"]
+        stats["wait_histogram_ms"] = dict(zip(labels, buckets))
+        return stats
+
+    # -----------------------------------------------------------------
+    # Internals
+    # -----------------------------------------------------------------
+
+    def _connect(self):
+        conn = psycopg2.connect(**self._connect_kwargs)
+        with self._cond:
+            self._born[id(conn)] = time.monotonic()
+            self._stats["connections_created"] += 1
+        return conn
+
+    def _discard(self, conn):
+        with self._cond:
+            self._born.pop(id(conn), None)
+            self._stats["connections_closed"] += 1
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def _is_expired(self, conn) -> bool:
+        born = self._born.get(id(conn))
+        return born is not None and time.monotonic() - born > self.max_lifetime_s
+
+    def _validate(self, conn, returned_at: float):
+        """Replaces closed, expired or (after long idle) unresponsive connections."""
+        if conn.closed:
+            self._discard(conn)
+            return self._connect()
+
+        if self._is_expired(conn):
+            with self._cond:
+                self._stats["recycled"] += 1
+            self._discard(conn)
+            return self._connect()
+
+        if time.monotonic() - returned_at >= self.health_check_idle_s:
+            try:
+                with conn.cursor() as cur:
+                    cur.execute("SELECT 1")
+                conn.rollback()
+            except Exception as e:
+                logger.warning(f"Discarding stale database connection: {e}")
+                with self._cond:
+                    self._stats["health_check_failures"] += 1
+                self._discard(conn)
+                return self._connect()
+
+        return conn
@@ -1,42 +1,129 @@
 # back-end/app/db/session.py
 
-import psycopg2.pool
+import asyncio
+import functools
 import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from contextlib import contextmanager
+import psycopg2
+from psycopg2 import InterfaceError, OperationalError
 from app.core.config import settings
+from app.core.metrics import counter_family, gauge_family, histogram_samples, MetricFamily, registry
+from app.db.pool import BoundedConnectionPool, WAIT_BUCKETS_MS
 
 logger = logging.getLogger(__name__)
 
-# Create a connection pool. It's thread-safe and will be created only once.
-db_pool = psycopg2.pool.SimpleConnectionPool(
-    minconn=1,
-    maxconn=10, # Adjust maxconn based on expected load
-    host=settings.DB_HOST,
-    port=settings.DB_PORT,
-    dbname=settings.DB_NAME,
-    user=settings.DB_USER,
-    password=settings.DB_PASSWORD
-)
+# The connection pool is created on first use rather than at import, so
+# importing the app (or a CLI tool) never needs the database to be up.
+# It is shared by the ingestion writer thread and the API executor.
+_db_pool: BoundedConnectionPool | None = None
+_db_pool_lock = threading.Lock()
+
+def get_db_pool() -> BoundedConnectionPool:
+    """
+    Returns the shared connection pool, creating it (and its
+    DB_POOL_MIN_CONN connections) on first use. Raises if the database is
+    unreachable; the next call tries again.
+    """
+    global _db_pool
+    if _db_pool is None:
+        with _db_pool_lock:
+            if _db_pool is None:
+                _db_pool = BoundedConnectionPool(
+                    minconn=settings.DB_POOL_MIN_CONN,
+                    maxconn=settings.DB_POOL_MAX_CONN,
+                    timeout_s=settings.DB_POOL_TIMEOUT_S,
+                    max_lifetime_s=settings.DB_POOL_MAX_LIFETIME_S,
+                    health_check_idle_s=settings.DB_POOL_HEALTHCHECK_IDLE_S,
+                    host=settings.DB_HOST,
+                    port=settings.DB_PORT,
+                    dbname=settings.DB_NAME,
+                    user=settings.DB_USER,
+                    password=settings.DB_PASSWORD,
+                    connect_timeout=settings.DB_CONNECT_TIMEOUT_S
+                )
+    return _db_pool
+
+def wait_for_database(stop: threading.Event) -> bool:
+    """
+    Blocks until the pool exists and the database answers a query, retrying
+    with exponential backoff (DB_CONNECT_RETRY_INITIAL_S doubling up to
+    DB_CONNECT_RETRY_MAX_S). Returns False if `stop` is set first.
+    """
+    backoff = settings.DB_CONNECT_RETRY_INITIAL_S
+    attempt = 1
+    while not stop.is_set():
+        try:
+            with get_db_connection() as conn:
+                with conn.cursor() as cur:
+                    cur.execute("SELECT 1")
+            if attempt > 1:
+                logger.info(f"Database reachable after {attempt} attempt(s).")
+            return True
+        except Exception as e:
+            logger.warning(f"Database not reachable (attempt {attempt}), retrying in {backoff:.0f}s: {e}")
+        stop.wait(backoff)
+        backoff = min(backoff * 2, settings.DB_CONNECT_RETRY_MAX_S)
+        attempt += 1
+    return False
+
+# Dedicated executor for blocking database work issued from async routes.
+# It is sized below the pool so background writers always find a connection,
+# and created on first use like the pool.
+_db_executor: ThreadPoolExecutor | None = None
+_db_executor_lock = threading.Lock()
+
+def _get_db_executor() -> ThreadPoolExecutor:
+    global _db_executor
+    if _db_executor is None:
+        with _db_executor_lock:
+            if _db_executor is None:
+                _db_executor = ThreadPoolExecutor(
+                    max_workers=settings.DB_EXECUTOR_WORKERS or max(1, settings.DB_POOL_MAX_CONN - 2),
+                    thread_name_prefix="db-worker"
+                )
+    return _db_executor
 
 @contextmanager
 def get_db_connection():
     """
     Provides a database connection from the pool.
-    
+
     This is a context manager that automatically handles getting a
     connection and returning it to the pool.
     """
     conn = None
+    broken = False
     try:
-        conn = db_pool.getconn()
+        conn = get_db_pool().getconn()
         yield conn
+    except (OperationalError, InterfaceError) as e:
+        # The server went away (e.g. Postgres restart): don't reuse this connection
+        broken = True
+        logger.error(f"Database connection error: {e}")
+        raise
     except Exception as e:
         logger.error(f"Database connection error: {e}")
         # Reraise the exception to be handled by FastAPI's error handlers
         raise
     finally:
         if conn:
-            db_pool.putconn(conn)
+            _db_pool.putconn(conn, close=broken)
+
+def open_dedicated_connection():
+    """
+    Opens a connection outside the pool, for sessions that must outlive a
+    pooled checkout (LISTEN, advisory locks). The caller closes it.
+    """
+    return psycopg2.connect(
+        host=settings.DB_HOST,
+        port=settings.DB_PORT,
+        dbname=settings.DB_NAME,
+        user=settings.DB_USER,
+        password=settings.DB_PASSWORD,
+        connect_timeout=settings.DB_CONNECT_TIMEOUT_S,
+    )
 
 def db_dependency():
     """
@@ -44,4 +131,62 @@ def db_dependency():
     This manages the connection lifecycle for each API request.
     """
     with get_db_connection() as conn:
-        yield conn
\ No newline at end of file
+        yield conn
+
+def _call_with_connection(func, *args, **kwargs):
+    # The pool rolls back any transaction left open when the connection is returned
+    with get_db_connection() as conn:
+        return func(conn, *args, **kwargs)
+
+async def run_in_db(func, *args, **kwargs):
+    """
+    Runs `func(conn, *args, **kwargs)` on the database executor with a
+    pooled connection, keeping blocking psycopg2 calls off the event loop.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        _get_db_executor(),
+        functools.partial(_call_with_connection, func, *args, **kwargs)
+    )
+
+def is_db_pool_ready() -> bool:
+    """Whether the connection pool has been created (the database was reached)."""
+    return _db_pool is not None
+
+def get_pool_stats() -> dict | None:
+    """Returns the connection pool counters (checkouts, waits, in-use/idle), or None before the pool exists."""
+    return _db_pool.get_stats() if _db_pool is not None else None
+
+def _collect_pool_metrics():
+    if _db_pool is None:
+        return []  # Not connected yet
+    stats = _db_pool.get_stats()
+    wait_samples = histogram_samples(
+        {}, [b / 1000 for b in WAIT_BUCKETS_MS],
+        list(stats["wait_histogram_ms"].values()), stats["wait_ms_sum"] / 1000,
+    )
+    return [
+        MetricFamily("terelina_db_pool_wait_seconds", "histogram",
+                     "Time spent waiting for a pooled database connection.", wait_samples),
+        gauge_family("terelina_db_pool_connections_in_use", "Pooled connections checked out.", stats["in_use"]),
+        gauge_family("terelina_db_pool_connections_idle", "Pooled connections waiting to be reused.", stats["idle"]),
+        gauge_family("terelina_db_pool_connections_max", "Maximum size of the connection pool.", stats["max"]),
+        counter_family("terelina_db_pool_timeouts_total", "Checkouts that gave up waiting for a connection.",
+                       [({}, stats["timeouts"])]),
+        counter_family("terelina_db_pool_connections_total", "Connections opened and closed by the pool.", [
+            ({"event": "created"}, stats["connections_created"]),
+            ({"event": "closed"}, stats["connections_closed"]),
+            ({"event": "recycled"}, stats["recycled"]),
+            ({"event": "health_check_failed"}, stats["health_check_failures"]),
+        ]),
+    ]
+
+registry.register_collector(_collect_pool_metrics)
+
+def shutdown_db_executor():
+    """Stops the database executor, waiting for in-flight queries."""
+    global _db_executor
+    with _db_executor_lock:
+        executor, _db_executor = _db_executor, None
+    if executor is not None:
+        executor.shutdown(wait=True)
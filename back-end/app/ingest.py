@@ -0,0 +1,144 @@
+# back-end/app/ingest.py
+"""
+Standalone ingestion process: subscribes to MQTT and writes counts, so the
+API (INGEST_MODE=external) can run any number of read-only workers.
+
+    python -m app.ingest
+
+Only one instance ingests at a time: the one holding the leader advisory
+lock. Others stand by and take over when it goes away. Committed counts,
+live events and a status heartbeat reach the API through Postgres NOTIFY.
+"""
+
+import asyncio
+import json
+import logging
+import signal
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from app.core.config import settings
+from app.core.metrics import registry
+from app.db.session import shutdown_db_executor
+from app.services.leader import LeaderLock
+from app.services.mqtt_client import (
+    start_mqtt_client, stop_mqtt_client, get_mqtt_status, change_notifier, maintenance, fence_writes
+)
+
+logger = logging.getLogger(__name__)
+
+# Created by main(), so importing this module reads no settings
+_leader: LeaderLock | None = None
+
+
+def _configure_logging():
+    logging.basicConfig(
+        level=settings.LOG_LEVEL.upper(),
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+        handlers=[
+            logging.FileHandler('terelina_ingest.log'),
+            logging.StreamHandler()
+        ]
+    )
+
+# =====================================================================
+# Metrics and Health Endpoint
+# =====================================================================
+
+class _StatusHandler(BaseHTTPRequestHandler):
+    """Serves /metrics and /health, the ingest process having no API."""
+
+    def do_GET(self):
+        if self.path == "/metrics":
+            self._reply(200, registry.render(), "text/plain; version=0.0.4")
+        elif self.path == "/health":
+            mqtt = get_mqtt_status()
+            body = {
+                "role": "leader" if _leader.held else "standby",
+                "mqtt_status": mqtt["status"],
+                "mqtt_connected": mqtt["connected"],
+            }
+            self._reply(200, json.dumps(body), "application/json")
+        else:
+            self._reply(404, "Not Found", "text/plain")
+
+    def _reply(self, status: int, body: str, content_type: str):
+        data = body.encode()
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass  # Scrapes would flood the log
+
+
+def _start_status_server(port: int) -> ThreadingHTTPServer:
+    server = ThreadingHTTPServer(("0.0.0.0", port), _StatusHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="ingest-status-server", daemon=True).start()
+    logger.info(f"Ingest metrics and health on port {port}.")
+    return server
+
+# =====================================================================
+# Main Loop
+# =====================================================================
+
+async def run() -> int:
+    """
+    Waits for leadership, then ingests until SIGINT/SIGTERM. Returns 1 if
+    another instance took over the lock, so a supervisor restarts this one
+    as a standby.
+    """
+    loop = asyncio.get_running_loop()
+    shutdown = threading.Event()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, shutdown.set)
+
+    server = _start_status_server(settings.INGEST_METRICS_PORT) if settings.INGEST_METRICS_PORT else None
+    exit_code = 0
+    try:
+        if not await asyncio.to_thread(_leader.acquire, shutdown):
+            return exit_code
+
+        # Counts are only committed while this instance holds the lock
+        fence_writes(_leader.fence)
+        change_notifier.start()
+        try:
+            await start_mqtt_client()
+        except Exception as e:
+            logger.error(f"Failed to start MQTT client: {e}")
+        if settings.MAINTENANCE_ENABLED:
+            maintenance.start()
+        logger.info("Ingest process running.")
+
+        while not await asyncio.to_thread(shutdown.wait, settings.INGEST_LEADER_CHECK_S):
+            # An unreachable database is not a reason to stop: counts are spooled meanwhile
+            if not await asyncio.to_thread(_leader.check):
+                exit_code = 1
+                break
+
+        logger.info("Ingest process shutting down...")
+        maintenance.stop()
+        # Flushes buffered counts while the notifier still announces them
+        await stop_mqtt_client()
+        change_notifier.stop()
+    finally:
+        _leader.release()
+        shutdown_db_executor()
+        if server is not None:
+            server.shutdown()
+    return exit_code
+
+
+def main():
+    global _leader
+    _configure_logging()
+    _leader = LeaderLock(settings.INGEST_LEADER_LOCK_KEY, retry_interval_s=settings.INGEST_LEADER_CHECK_S)
+    sys.exit(asyncio.run(run()))
+
+
+if __name__ == "__main__":
+    main()
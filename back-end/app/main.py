@@ -1,30 +1,104 @@
 # back-end/app/main.py
 
+import asyncio
 import logging
+import threading
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
 from app.core.config import settings
-from app.api.routes import system, counts
-from app.services.mqtt_client import start_mqtt_client, stop_mqtt_client
-
-# --- Logging Configuration ---
-# Configure logging at the application's entry point
-logging.basicConfig(
-    level=settings.LOG_LEVEL.upper(),
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('terelina_backend.log'),
-        logging.StreamHandler()
-    ]
+from app.core.metrics import RequestMetricsMiddleware
+from app.api.routes import system, counts, stream, analytics
+from app.db.session import is_db_pool_ready, shutdown_db_executor, wait_for_database
+from app.services.mqtt_client import (
+    start_mqtt_client, stop_mqtt_client, live_counters, recent_counts, event_bus, maintenance, change_listener
 )
+from app.services.readiness import readiness
+
 logger = logging.getLogger(__name__)
 
+# --- Logging Configuration ---
+# Configured when the application starts (lifespan), not at import, so
+# importing the app creates no log file
+def _configure_logging():
+    logging.basicConfig(
+        level=settings.LOG_LEVEL.upper(),
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+        handlers=[
+            logging.FileHandler('terelina_backend.log'),
+            logging.StreamHandler()
+        ]
+    )
+
+# --- Startup and Shutdown ---
+async def _warm_up(stop: threading.Event):
+    """
+    Connects to the database, retrying with backoff, then starts the
+    services that load the caches /ready waits for. Runs in the background
+    so the app starts (and /health answers) while the database is down.
+    """
+    if not await asyncio.to_thread(wait_for_database, stop):
+        return
+    # Seeds synchronously (once); keeps retrying in its thread if that fails
+    await asyncio.to_thread(live_counters.start)
+    if settings.RECENT_INDEX_HOURS > 0:
+        recent_counts.start()
+    if settings.INGEST_MODE == "external":
+        change_listener.start()
+    while not stop.is_set() and not readiness.is_ready():
+        await asyncio.sleep(0.5)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Binds the event bus and, in the background, connects to the database
+    and warms the caches (live counters, recent count index); /ready
+    reports ready once they are loaded. With INGEST_MODE=embedded, also
+    runs the MQTT consumer on the application's event loop (counts are
+    spooled until the database is reachable) and starts database
+    maintenance; with INGEST_MODE=external the app only reads and follows
+    the ingest process (app.ingest) through the change feed.
+    On shutdown, reports not ready, then flushes in-flight messages and
+    buffered counts before stopping the database executor.
+    """
+    _configure_logging()
+    logger.info(f"FastAPI application starting up (ingest mode: {settings.INGEST_MODE})...")
+    readiness.begin()
+    readiness.add_check("database", is_db_pool_ready)
+    readiness.add_check("live_counters", live_counters.is_seeded)
+    if settings.RECENT_INDEX_HOURS > 0:
+        readiness.add_check("recent_counts", recent_counts.is_loaded)
+    event_bus.bind_loop(asyncio.get_running_loop())
+    stop = threading.Event()
+    warm_up = asyncio.create_task(_warm_up(stop), name="warm-up")
+    if settings.INGEST_MODE != "external":
+        try:
+            await start_mqtt_client()
+        except Exception as e:
+            logger.error(f"Failed to start MQTT client on startup: {e}")
+        if settings.MAINTENANCE_ENABLED:
+            maintenance.start()
+
+    yield
+
+    logger.info("FastAPI application shutting down...")
+    readiness.set_draining()
+    stop.set()
+    await warm_up
+    change_listener.stop()
+    maintenance.stop()
+    await stop_mqtt_client()
+    live_counters.stop()
+    recent_counts.stop()
+    shutdown_db_executor()
+
 # --- FastAPI App Initialization ---
 app = FastAPI(
     title="Terelina Pizza Counter API",
     description="API for automatic pizza counting, optimized for Grafana.",
-    version="2.0.0" # Bumping version for the refactored app
+    version="2.0.0", # Bumping version for the refactored app
+    lifespan=lifespan
 )
 
 # --- Middleware ---
@@ -36,25 +110,12 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# Request latency per route, exposed at /metrics
+app.add_middleware(RequestMetricsMiddleware)
 
 # --- API Routers ---
 # Include the modularized routers with prefixes for versioning and organization
 app.include_router(system.router, tags=["System & Health"])
 app.include_router(counts.router, prefix="/v1", tags=["Counts & Statistics"])
-
-# --- Startup and Shutdown Events ---
-@app.on_event("startup")
-async def startup_event():
-    """Starts the MQTT client when the application starts."""
-    logger.info("FastAPI application starting up...")
-    try:
-        start_mqtt_client()
-        logger.info("MQTT client started successfully.")
-    except Exception as e:
-        logger.error(f"Failed to start MQTT client on startup: {e}")
-
-@app.on_event("shutdown")
-async def shutdown_event():
-    """Stops the MQTT client when the application shuts down."""
-    logger.info("FastAPI application shutting down...")
-    stop_mqtt_client()
\ No newline at end of file
+app.include_router(stream.router, prefix="/v1", tags=["Live Streams"])
+app.include_router(analytics.router, prefix="/v1", tags=["Production Analytics"])
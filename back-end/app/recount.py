@@ -0,0 +1,107 @@
+# back-end/app/recount.py
+"""
+Offline recount of captured raw sensor events (EVENT_CAPTURE_ENABLED=true)
+with other debounce settings, to see what SENSOR_DEBOUNCE_MS changes
+before touching the live setting. Needs no database, broker or .env.
+
+    python -m app.recount --dir event_capture --debounce 0,50,100,200
+
+Prints the total counts per debounce value and the hours in which they
+differ from the baseline; `--csv` writes every hour.
+"""
+
+import argparse
+import csv
+import sys
+import time
+from datetime import datetime, timezone
+from zoneinfo import ZoneInfo
+
+import numpy as np
+
+from app.services.event_capture import read_events
+from app.services.recount import counts_per_hour, recount
+
+
+def _parse_time(value: str) -> int:
+    parsed = datetime.fromisoformat(value)
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return int(parsed.timestamp() * 1000)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("--dir", default="event_capture", help="EVENT_CAPTURE_DIR of the ingest process")
+    parser.add_argument("--debounce", default="0,25,50,100,150,200,300",
+                        help="Comma-separated debounce values to compare, in ms")
+    parser.add_argument("--baseline", type=int, default=100, help="Value the deltas refer to (the live SENSOR_DEBOUNCE_MS)")
+    parser.add_argument("--idle-ttl-s", type=int, default=3600, help="SENSOR_IDLE_TTL_S")
+    parser.add_argument("--sensor", action="append", help="Only these sensor ids (repeatable)")
+    parser.add_argument("--from", dest="start", help="Only messages received from this time (ISO 8601)")
+    parser.add_argument("--to", dest="end", help="Only messages received before this time (ISO 8601)")
+    parser.add_argument("--tz", default="UTC", help="Timezone for the hours shown")
+    parser.add_argument("--csv", help="Write counts per hour and value to this file")
+    args = parser.parse_args()
+
+    values = sorted({int(v) for v in args.debounce.split(",") if v.strip()} | {args.baseline})
+    tz = ZoneInfo(args.tz)
+
+    started = time.perf_counter()
+    events, strings = read_events(args.dir)
+    if args.start:
+        events = events[events["arrival_ms"] >= _parse_time(args.start)]
+    if args.end:
+        events = events[events["arrival_ms"] < _parse_time(args.end)]
+    if args.sensor:
+        sensor_ids = set(args.sensor)
+        wanted = [i for i, s in enumerate(strings) if i and s in sensor_ids]
+        events = events[np.isin(events["sensor"], wanted)]
+    if not len(events):
+        print(f"No captured events in {args.dir} match.")
+        return 1
+    loaded = time.perf_counter()
+
+    results = recount(events, values, idle_ttl_ms=args.idle_ttl_s * 1000)
+    hours, per_value = counts_per_hour(results)
+    done = time.perf_counter()
+
+    sensors = np.unique(events["sensor"])
+    print(
+        f"{len(events):,} message(s) of {len(sensors)} sensor(s), "
+        f"loaded in {(loaded - started) * 1000:.0f} ms, {len(values)} value(s) replayed in {(done - loaded) * 1000:.0f} ms"
+    )
+    baseline = per_value[args.baseline]
+    print(f"\n{'debounce_ms':>12}{'counts':>10}{'delta':>10}{'debounced':>11}{'hours changed':>15}")
+    for value in values:
+        counts = per_value[value]
+        marker = "  (baseline)" if value == args.baseline else ""
+        print(
+            f"{value:>12}{int(counts.sum()):>10}{int(counts.sum() - baseline.sum()):>+10}"
+            f"{results[value]['debounced']:>11}{int((counts != baseline).sum()):>15}{marker}"
+        )
+
+    changed = np.flatnonzero(np.any([per_value[v] != baseline for v in values], axis=0))
+    others = [v for v in values if v != args.baseline]
+    if len(changed):
+        print(f"\nHours that differ from {args.baseline} ms (delta in counts):")
+        print(f"{'hour':<18}{'baseline':>10}" + "".join(f"{f'{v} ms':>10}" for v in others))
+        for i in changed.tolist():
+            hour = datetime.fromtimestamp(hours[i] / 1000, tz=tz).strftime("%Y-%m-%d %H:%M")
+            print(f"{hour:<18}{int(baseline[i]):>10}" + "".join(f"{int(per_value[v][i] - baseline[i]):>+10}" for v in others))
+    else:
+        print(f"\nEvery value counts the same as {args.baseline} ms in every hour.")
+
+    if args.csv:
+        with open(args.csv, "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(["hour"] + [f"debounce_{v}ms" for v in values])
+            for i, hour_ms in enumerate(hours.tolist()):
+                hour = datetime.fromtimestamp(hour_ms / 1000, tz=tz).isoformat()
+                writer.writerow([hour] + [int(per_value[v][i]) for v in values])
+        print(f"\nCounts per hour written to {args.csv}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
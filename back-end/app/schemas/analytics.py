@@ -0,0 +1,77 @@
+# back-end/app/schemas/analytics.py
+
+from pydantic import BaseModel
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+class CycleTimeBin(BaseModel):
+    """Cycle times up to `le_s` seconds (above the previous bin)."""
+    le_s: float
+    count: int
+
+class CycleTimeStats(BaseModel):
+    """Distribution of the time between consecutive counts of a sensor, stoppages excluded."""
+    samples: int
+    mean_s: Optional[float] = None
+    std_s: Optional[float] = None
+    min_s: Optional[float] = None
+    max_s: Optional[float] = None
+    percentiles_s: Dict[str, float] = {}
+    histogram: List[CycleTimeBin] = []
+
+class ThroughputStats(BaseModel):
+    """Rolling counts per hour; percentiles only cover time inside shifts."""
+    window_s: int
+    step_s: int
+    p10_per_hour: Optional[float] = None
+    p50_per_hour: Optional[float] = None
+    p90_per_hour: Optional[float] = None
+    max_per_hour: Optional[float] = None
+    datapoints: List[List[Any]]  # List of [counts_per_hour, timestamp_ms]
+
+class Stoppage(BaseModel):
+    """A run without counts inside a shift."""
+    shift: str
+    sensor_id: str
+    start: datetime
+    end: datetime
+    duration_s: float
+    ongoing: bool
+
+class StoppageSummary(BaseModel):
+    """All stoppages in the range, with the longest listed."""
+    count: int
+    total_s: float
+    longest: List[Stoppage]
+
+class ShiftSummary(BaseModel):
+    """Production of one shift; `partial` if cut by the range or still running."""
+    name: str
+    start: datetime
+    end: datetime
+    partial: bool
+    counts: int
+    counts_per_hour: Optional[float] = None
+    cycle_p50_s: Optional[float] = None
+    cycle_p90_s: Optional[float] = None
+    active_sensors: int
+    stoppages: int
+    downtime_s: float
+    availability: Optional[float] = None
+
+class AnalyticsResponse(BaseModel):
+    """Schema for the production analytics report."""
+    start: datetime
+    end: datetime
+    sensor_id: Optional[str] = None
+    timezone: str
+    stoppage_threshold_s: float
+    sensors: List[str]
+    total_counts: int
+    cycle_time: CycleTimeStats
+    throughput: ThroughputStats
+    stoppages: StoppageSummary
+    shifts: List[ShiftSummary]
+    days_from_cache: int
+    shifts_from_cache: int
+    computed_ms: float
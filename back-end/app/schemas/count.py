@@ -7,13 +7,20 @@ from datetime import datetime
 class CountResponse(BaseModel):
     """Schema for a single count record."""
     id: int
+    sensor_id: str
     timestamp: datetime
 
+class CountPageResponse(BaseModel):
+    """Schema for a keyset-paginated page of counts."""
+    items: List[CountResponse]
+    next_cursor: Optional[str] = None
+
 class StatisticsResponse(BaseModel):
     """Schema for aggregated count statistics."""
     total_counts: int
     counts_today: int
     last_count_timestamp: Optional[datetime] = None
+    sensor_id: Optional[str] = None
     query_timestamp: datetime = Field(default_factory=datetime.now)
 
 class GrafanaTimeSeriesDatapoint(BaseModel):
@@ -30,4 +37,15 @@ class GrafanaTimeSeriesDatapoint(BaseModel):
 class GrafanaTimeSeriesResponse(BaseModel):
     """Schema for Grafana time series queries."""
     target: str
-    datapoints: List[List[Any]] # List of [value, timestamp_ms]
\ No newline at end of file
+    datapoints: List[List[Any]] # List of [value, timestamp_ms]
+
+class QueryCacheStatsResponse(BaseModel):
+    """Schema for the Grafana result cache counters."""
+    entries: int
+    bytes: int
+    max_bytes: int
+    hits: int
+    misses: int
+    hit_ratio: float
+    evictions: int
+    invalidations: int
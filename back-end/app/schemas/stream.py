@@ -0,0 +1,11 @@
+# back-end/app/schemas/stream.py
+
+from pydantic import BaseModel
+
+class StreamStatsResponse(BaseModel):
+    """Schema for the live stream fan-out counters."""
+    subscribers: int
+    max_subscribers: int
+    events_published: int
+    events_dropped: int
+    events_coalesced: int
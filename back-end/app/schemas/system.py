@@ -2,6 +2,7 @@
 
 from pydantic import BaseModel, Field
 from datetime import datetime
+from typing import Dict, List, Optional
 
 class HealthResponse(BaseModel):
     """Schema for the application health check."""
@@ -10,20 +11,137 @@ class HealthResponse(BaseModel):
     database_connected: bool
     timestamp: datetime = Field(default_factory=datetime.now)
 
+class ReadinessResponse(BaseModel):
+    """Schema for the readiness probe: ready once the database is reached and the caches are loaded."""
+    status: str  # ready, warming_up or draining
+    ready: bool
+    checks: Dict[str, bool]
+    warm_up_s: Optional[float] = None
+    timestamp: datetime = Field(default_factory=datetime.now)
+
+class SpoolStatsResponse(BaseModel):
+    """Schema for the on-disk count spool."""
+    directory: str
+    pending_counts: int
+    segments: int
+    bytes: int
+    counts_spilled: int
+    counts_replayed: int
+    counts_dead_lettered: int = 0
+
+class IngestionStatsResponse(BaseModel):
+    """Schema for the buffered count writer counters."""
+    running: bool
+    queue_depth: int
+    queue_capacity: int
+    queue_high_watermark: int
+    counts_enqueued: int
+    events_enqueued: int
+    counts_written: int
+    events_written: int
+    counts_rejected: int
+    events_rejected: int
+    counts_lost: int
+    events_lost: int
+    counts_spooled: int
+    counts_replayed: int
+    replay_duplicates: int
+    replay_failures: int
+    replay_dead_letters: int = 0
+    batches_flushed: int
+    batches_failed: int
+    last_batch_size: int
+    last_flush_ms: float
+    last_flush_at: Optional[datetime] = None
+    spool: Optional[SpoolStatsResponse] = None
+
+class SensorStatusResponse(BaseModel):
+    """Schema for the state machine of a single sensor."""
+    sensor_id: str
+    last_state: str
+    last_transition_ms: int
+    last_seen_ms: int
+    initialized: bool
+    messages: int
+    debounced: int
+    counts: int
+    boot: Optional[str] = None
+    last_seq: int = 0
+    duplicates: int = 0
+    out_of_order: int = 0
+    gaps: int = 0
+
+class EdgeSensorStatusResponse(BaseModel):
+    """Schema for a device that counts on the edge and sends batches."""
+    sensor_id: str
+    boot: Optional[str] = None
+    last_seq: int
+    last_total: Optional[int] = None
+    last_seen_ms: int
+    batches: int
+    counts: int
+    recovered: int
+    duplicates: int
+    resets: int = 0
+    rejected: int = 0
+
 class MqttStatusResponse(BaseModel):
     """Schema for the MQTT client status."""
     status: str
     connected: bool
     broker: str
     subscribed_topic: str
+    counts_topic: Optional[str] = None
+    inbox_depth: int = 0
+    reading_paused: bool = False
     last_sensor_state: str
+    sensors: List[SensorStatusResponse] = []
+    edge_sensors: List[EdgeSensorStatusResponse] = []
+    ingestion: Optional[IngestionStatsResponse] = None
+
+class DbPoolStatsResponse(BaseModel):
+    """Schema for the database connection pool counters."""
+    in_use: int
+    idle: int
+    total: int
+    max: int
+    checkouts: int
+    timeouts: int
+    connections_created: int
+    connections_closed: int
+    recycled: int
+    health_check_failures: int
+    wait_ms_sum: float
+    wait_ms_max: float
+    wait_histogram_ms: Dict[str, int]
 
 class SystemLogResponse(BaseModel):
     """Schema for a single system log entry."""
     level: str
     message: str
     source: str
-    timestamp: datetime
+    timestamp: datetime  # First occurrence
+    occurrences: int = 1  # Identical events coalesced into this entry
+
+class MaintenanceReportResponse(BaseModel):
+    """Schema for what one database maintenance run did."""
+    started_at: datetime
+    duration_ms: float
+    logs_deleted: int
+    event_uids_deleted: int = 0  # Expired pizza_count_events (redelivery dedupe) rows
+    partitions_dropped: List[str]
+    partitions_kept: List[str]  # Past retention, but their rollups don't match
+    counts_pruned: int
+    vacuumed: List[str]
+    errors: List[str]
+    summary: str
+
+class MaintenanceStatusResponse(BaseModel):
+    """Schema for the database maintenance scheduler."""
+    enabled: bool
+    running: bool
+    next_run_at: Optional[datetime] = None
+    last_report: Optional[MaintenanceReportResponse] = None
 
 class ApiInfoResponse(BaseModel):
     """Schema for the root endpoint response."""
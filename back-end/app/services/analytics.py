@@ -0,0 +1,465 @@
+# back-end/app/services/analytics.py
+
+import logging
+import re
+import time
+from datetime import date, datetime, time as dtime, timedelta, timezone
+from typing import NamedTuple
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+import numpy as np
+
+from app.core.config import settings
+from app.services.query_cache import analytics_cache
+
+logger = logging.getLogger(__name__)
+
+_HOUR_MS = 3_600_000
+
+_SHIFT_SPEC = re.compile(r"^\s*([\w-]+)\s*=\s*(\d{1,2}):(\d{2})\s*-\s*(\d{1,2}):(\d{2})\s*$")
+
+# Cycle-time percentiles reported for the whole range
+_CYCLE_PERCENTILES = (5, 25, 50, 75, 90, 95, 99)
+
+_CYCLE_HISTOGRAM_BINS = 20
+
+
+class Shift(NamedTuple):
+    """A daily shift in the system timezone; ending at or before its start means it ends the next day."""
+    name: str
+    start: dtime
+    end: dtime
+
+
+class ShiftWindow(NamedTuple):
+    """One occurrence of a shift, in epoch ms."""
+    name: str
+    start_ms: int
+    end_ms: int
+    day_start_ms: int  # Local midnight of the day the shift starts
+
+
+def parse_shifts(spec: str) -> list[Shift]:
+    """Parses ANALYTICS_SHIFTS ("name=HH:MM-HH:MM,..."), rejecting overlapping shifts."""
+    shifts = []
+    for part in filter(None, (p.strip() for p in spec.split(","))):
+        match = _SHIFT_SPEC.match(part)
+        if not match:
+            raise ValueError(f"Invalid shift '{part}', expected name=HH:MM-HH:MM")
+        start_h, start_m, end_h, end_m = (int(g) for g in match.groups()[1:])
+        shifts.append(Shift(match[1], dtime(start_h, start_m), dtime(end_h, end_m)))
+    if not shifts:
+        raise ValueError("At least one shift is required (use 'day=00:00-00:00' for whole days)")
+
+    # Two consecutive days of minute ranges must not overlap
+    minutes = []
+    for shift in shifts:
+        start = shift.start.hour * 60 + shift.start.minute
+        end = shift.end.hour * 60 + shift.end.minute
+        if end <= start:
+            end += 1440
+        minutes.extend((day + start, day + end, shift.name) for day in (0, 1440))
+    minutes.sort()
+    for (_, prev_end, prev_name), (start, _, name) in zip(minutes, minutes[1:]):
+        if start < prev_end:
+            raise ValueError(f"Shifts '{prev_name}' and '{name}' overlap")
+    return shifts
+
+
+SHIFTS = parse_shifts(settings.ANALYTICS_SHIFTS)
+
+
+def _ms(ts: datetime) -> int:
+    return int(ts.timestamp() * 1000)
+
+
+def _to_datetime(ms: int, tz: ZoneInfo) -> datetime:
+    return datetime.fromtimestamp(ms / 1000, tz=timezone.utc).astimezone(tz)
+
+
+def _local_midnight(day: date, tz: ZoneInfo) -> datetime:
+    return datetime.combine(day, dtime(), tzinfo=tz)
+
+
+def _load_timezone(cur) -> ZoneInfo:
+    cur.execute("SELECT system_timezone()")
+    name = cur.fetchone()[0]
+    try:
+        return ZoneInfo(name or "UTC")
+    except (ZoneInfoNotFoundError, ValueError):
+        logger.warning(f"Unknown timezone '{name}' in system_settings, using UTC.")
+        return ZoneInfo("UTC")
+
+
+def shift_windows(shifts: list[Shift], start: datetime, end: datetime, tz: ZoneInfo) -> list[ShiftWindow]:
+    """Every shift occurrence overlapping [start, end), in time order."""
+    windows = []
+    day = start.astimezone(tz).date() - timedelta(days=1)  # Overnight shifts from the day before
+    last_day = end.astimezone(tz).date()
+    start_ms, end_ms = _ms(start), _ms(end)
+    while day <= last_day:
+        midnight = _local_midnight(day, tz)
+        for shift in shifts:
+            shift_start = datetime.combine(day, shift.start, tzinfo=tz)
+            end_day = day if shift.end > shift.start else day + timedelta(days=1)
+            shift_end = datetime.combine(end_day, shift.end, tzinfo=tz)
+            window = ShiftWindow(shift.name, _ms(shift_start), _ms(shift_end), _ms(midnight))
+            if window.end_ms > start_ms and window.start_ms < end_ms:
+                windows.append(window)
+        day += timedelta(days=1)
+    windows.sort(key=lambda w: w.start_ms)
+    return windows
+
+# =====================================================================
+# Count Timestamps (cached per closed local day)
+# =====================================================================
+
+_TIMESTAMPS_SQL = """
+    SELECT sensor_id, array_agg(FLOOR(EXTRACT(EPOCH FROM "timestamp") * 1000)::BIGINT ORDER BY "timestamp")
+    FROM pizza_counts
+    WHERE "timestamp" >= %s AND "timestamp" < %s {sensor_filter}
+    GROUP BY sensor_id
+"""
+
+def _query_timestamps(cur, start: datetime, end: datetime, sensor_id: str | None) -> dict[str, np.ndarray]:
+    params = [start, end]
+    sensor_filter = ""
+    if sensor_id:
+        sensor_filter = "AND sensor_id = %s"
+        params.append(sensor_id)
+    cur.execute(_TIMESTAMPS_SQL.format(sensor_filter=sensor_filter), params)
+    return {sensor: np.asarray(timestamps, dtype=np.int64) for sensor, timestamps in cur.fetchall()}
+
+
+def load_timestamps(cur, start: datetime, end: datetime, sensor_id: str | None,
+                    tz: ZoneInfo) -> tuple[dict[str, np.ndarray], int]:
+    """
+    Sorted count timestamps (epoch ms) per sensor for the local days that
+    [start, end) touches. Days already over are cached; consecutive
+    uncached days are read with one query. Also returns how many days came
+    from the cache.
+    """
+    now_ms = time.time() * 1000
+    days = []
+    day, last_day = start.astimezone(tz).date(), (end - timedelta(milliseconds=1)).astimezone(tz).date()
+    while day <= last_day:
+        days.append((day, _local_midnight(day, tz), _local_midnight(day + timedelta(days=1), tz)))
+        day += timedelta(days=1)
+
+    chunks: list[dict[str, np.ndarray] | None] = [
+        analytics_cache.get(("day", tz.key, day.isoformat(), sensor_id)) for day, _, _ in days
+    ]
+    from_cache = sum(chunk is not None for chunk in chunks)
+
+    i = 0
+    while i < len(days):
+        if chunks[i] is not None:
+            i += 1
+            continue
+        j = i
+        while j < len(days) and chunks[j] is None:
+            j += 1
+        generation = analytics_cache.generation
+        run = _query_timestamps(cur, days[i][1], days[j - 1][2], sensor_id)
+        edges = {sensor: np.searchsorted(ts, [_ms(d[2]) for d in days[i:j - 1]]) for sensor, ts in run.items()}
+        for k in range(i, j):
+            chunk = {}
+            for sensor, ts in run.items():
+                lo = edges[sensor][k - i - 1] if k > i else 0
+                hi = edges[sensor][k - i] if k < j - 1 else len(ts)
+                if hi > lo:
+                    chunk[sensor] = ts[lo:hi]
+            chunks[k] = chunk
+            day, day_start, day_end = days[k]
+            if _ms(day_end) <= now_ms:
+                analytics_cache.put(
+                    ("day", tz.key, day.isoformat(), sensor_id), chunk, settings.ANALYTICS_CACHE_TTL_S,
+                    size=256 + sum(64 + ts.nbytes for ts in chunk.values()),
+                    start=day_start.timestamp(), end=day_end.timestamp(),
+                    generation=generation,
+                )
+        i = j
+
+    per_sensor: dict[str, list[np.ndarray]] = {}
+    for chunk in chunks:
+        for sensor, ts in chunk.items():
+            per_sensor.setdefault(sensor, []).append(ts)
+    return {sensor: np.concatenate(parts) for sensor, parts in per_sensor.items()}, from_cache
+
+# =====================================================================
+# Metrics (vectorised)
+# =====================================================================
+
+def _group_rank(values: np.ndarray, groups: np.ndarray, n_groups: int, q: float) -> np.ndarray:
+    """Nearest-rank `q` quantile of `values` per group (NaN for empty groups)."""
+    result = np.full(n_groups, np.nan)
+    if not len(values):
+        return result
+    order = np.lexsort((values, groups))
+    sizes = np.bincount(groups, minlength=n_groups)
+    offsets = np.cumsum(sizes) - sizes
+    present = sizes > 0
+    ranks = np.maximum(np.ceil(q * sizes[present]).astype(np.int64) - 1, 0)
+    result[present] = values[order][offsets[present] + ranks]
+    return result
+
+
+def cycle_time_stats(cycles_ms: np.ndarray) -> dict:
+    """Distribution of the time between consecutive counts (stoppages excluded)."""
+    stats = {"samples": int(len(cycles_ms))}
+    if not len(cycles_ms):
+        return stats
+    cycles_s = cycles_ms / 1000
+    stats.update({
+        "mean_s": round(float(cycles_s.mean()), 3),
+        "std_s": round(float(cycles_s.std()), 3),
+        "min_s": round(float(cycles_s.min()), 3),
+        "max_s": round(float(cycles_s.max()), 3),
+        "percentiles_s": {
+            f"p{p}": round(float(v), 3)
+            for p, v in zip(_CYCLE_PERCENTILES, np.percentile(cycles_s, _CYCLE_PERCENTILES))
+        },
+    })
+    # Log-spaced bins: cycle times spread over orders of magnitude
+    low = max(float(cycles_s.min()), 0.1)
+    high = max(float(cycles_s.max()), low * 1.01)
+    edges = np.geomspace(low, high, _CYCLE_HISTOGRAM_BINS + 1)
+    counts, _ = np.histogram(np.clip(cycles_s, low, high), bins=edges)
+    stats["histogram"] = [{"le_s": round(float(e), 3), "count": int(c)} for e, c in zip(edges[1:], counts)]
+    return stats
+
+
+def rolling_throughput(merged: np.ndarray, start_ms: int, end_ms: int, window_ms: int,
+                       max_points: int, windows: list[ShiftWindow]) -> dict:
+    """
+    Counts per hour over a trailing `window_ms`, sampled at most `max_points`
+    times. Percentiles only use samples whose whole window lies in a shift
+    (or, with windows longer than a shift, samples taken during one).
+    """
+    step_ms = max(60_000, -(-(end_ms - start_ms) // max_points))
+    step_ms = -(-step_ms // 60_000) * 60_000
+    samples = np.arange(start_ms + step_ms, end_ms + 1, step_ms, dtype=np.int64)
+    rates = (np.searchsorted(merged, samples) - np.searchsorted(merged, samples - window_ms)) * (_HOUR_MS / window_ms)
+
+    result = {"window_s": window_ms // 1000, "step_s": step_ms // 1000}
+    if windows and len(samples):
+        shift_starts = np.array([w.start_ms for w in windows], dtype=np.int64)
+        shift_ends = np.array([w.end_ms for w in windows], dtype=np.int64)
+        idx = np.searchsorted(shift_starts, samples, side="right") - 1
+        in_shift = (idx >= 0) & (samples <= shift_ends[np.maximum(idx, 0)])
+        full = in_shift & (samples - window_ms >= shift_starts[np.maximum(idx, 0)])
+        producing = rates[full if full.any() else in_shift]
+        if len(producing):
+            for p, v in zip((10, 50, 90), np.percentile(producing, (10, 50, 90))):
+                result[f"p{p}_per_hour"] = round(float(v), 2)
+            result["max_per_hour"] = round(float(producing.max()), 2)
+    result["datapoints"] = [[round(float(r), 2), int(t)] for r, t in zip(rates, samples)]
+    return result
+
+
+def _sensor_shift_activity(ts: np.ndarray, w_start: np.ndarray, w_end: np.ndarray, threshold_ms: int) -> dict:
+    """
+    Per-shift counts, stoppages and in-shift cycle times of one sensor, for
+    shifts given as sorted, non-overlapping [w_start, w_end) arrays.
+
+    A stoppage is a run of at least `threshold_ms` inside a shift without
+    a count, including shift start -> first count and last count -> shift end.
+    """
+    n_windows = len(w_start)
+    lo = np.searchsorted(ts, w_start)
+    hi = np.searchsorted(ts, w_end)
+    counts = hi - lo
+    shift_of = np.repeat(np.arange(n_windows), counts)
+    # Positions of every in-shift count, gathered without a Python loop
+    positions = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts) + np.repeat(lo, counts)
+    inside = ts[positions]
+
+    # Each shift as [start, counts..., end], sorted by shift then time
+    points = np.concatenate((w_start, inside, w_end))
+    owner = np.concatenate((np.arange(n_windows), shift_of, np.arange(n_windows)))
+    order = np.lexsort((points, owner))
+    points, owner = points[order], owner[order]
+    gaps = np.diff(points)
+    is_stop = (owner[1:] == owner[:-1]) & (gaps >= threshold_ms)
+
+    same_shift = shift_of[1:] == shift_of[:-1]
+    cycles = np.diff(inside)[same_shift]
+    cycle_owner = shift_of[1:][same_shift]
+    keep = cycles < threshold_ms
+    return {
+        "counts": counts,
+        "stop_start": points[:-1][is_stop],
+        "stop_end": points[1:][is_stop],
+        "stop_shift": owner[:-1][is_stop],
+        "cycles": cycles[keep],
+        "cycle_shift": cycle_owner[keep],
+    }
+
+
+def shift_summaries(timelines: dict[str, np.ndarray], windows: list[ShiftWindow], now_ms: int,
+                    threshold_ms: int) -> list[tuple[dict, list]]:
+    """
+    (summary, stoppages) per shift window, computed for all of them at once.
+    Windows must be clipped to the report range and to now. A sensor only
+    counts towards a shift if it counted on that day before the shift ended.
+    """
+    n = len(windows)
+    if not n:
+        return []
+    w_start = np.array([w.start_ms for w in windows], dtype=np.int64)
+    w_end = np.array([w.end_ms for w in windows], dtype=np.int64)
+    day_start = np.array([w.day_start_ms for w in windows], dtype=np.int64)
+    covered_s = (w_end - w_start) / 1000
+
+    counts = np.zeros(n, dtype=np.int64)
+    active = np.zeros(n, dtype=np.int64)
+    downtime_s = np.zeros(n)
+    n_stops = np.zeros(n, dtype=np.int64)
+    stoppages: list[list] = [[] for _ in range(n)]
+    cycles, cycle_shift = [], []
+    for sensor_id, ts in timelines.items():
+        activity = _sensor_shift_activity(ts, w_start, w_end, threshold_ms)
+        is_active = np.searchsorted(ts, w_end) > np.searchsorted(ts, day_start)
+        counts += activity["counts"]
+        active += is_active
+        keep = is_active[activity["stop_shift"]]
+        stop_shift = activity["stop_shift"][keep]
+        stop_start, stop_end = activity["stop_start"][keep], activity["stop_end"][keep]
+        downtime_s += np.bincount(stop_shift, weights=(stop_end - stop_start) / 1000, minlength=n)
+        n_stops += np.bincount(stop_shift, minlength=n)
+        for shift, s, e in zip(stop_shift.tolist(), stop_start.tolist(), stop_end.tolist()):
+            stoppages[shift].append((sensor_id, s, e, e >= now_ms))
+        cycles.append(activity["cycles"])
+        cycle_shift.append(activity["cycle_shift"])
+
+    all_cycles = np.concatenate(cycles) / 1000 if cycles else np.empty(0)
+    all_owners = np.concatenate(cycle_shift) if cycle_shift else np.empty(0, dtype=np.int64)
+    p50 = _group_rank(all_cycles, all_owners, n, 0.5)
+    p90 = _group_rank(all_cycles, all_owners, n, 0.9)
+
+    results = []
+    for i, window in enumerate(windows):
+        summary = {
+            "name": window.name,
+            "counts": int(counts[i]),
+            "counts_per_hour": round(float(counts[i] / covered_s[i] * 3600), 2) if covered_s[i] > 0 else None,
+            "cycle_p50_s": None if np.isnan(p50[i]) else round(float(p50[i]), 3),
+            "cycle_p90_s": None if np.isnan(p90[i]) else round(float(p90[i]), 3),
+            "active_sensors": int(active[i]),
+            "stoppages": int(n_stops[i]),
+            "downtime_s": round(float(downtime_s[i]), 3),
+            "availability": (
+                round(float(1 - downtime_s[i] / (covered_s[i] * active[i])), 4)
+                if active[i] and covered_s[i] > 0 else None
+            ),
+        }
+        results.append((summary, stoppages[i]))
+    return results
+
+# =====================================================================
+# Report
+# =====================================================================
+
+def build_report(db, start: datetime, end: datetime, sensor_id: str | None, stoppage_s: float,
+                 window_s: int, max_points: int, stoppage_limit: int) -> dict:
+    """
+    Production analytics for [start, end): cycle-time distribution,
+    rolling throughput, stoppages and per-shift summaries. Count timestamps
+    are cached per closed day and summaries per closed shift, so repeating
+    a report only reads and computes what is still open.
+    """
+    started = time.perf_counter()
+    now_ms = int(time.time() * 1000)
+    threshold_ms = int(stoppage_s * 1000)
+    with db.cursor() as cur:
+        tz = _load_timezone(cur)
+        loaded, days_cached = load_timestamps(cur, start, end, sensor_id, tz)
+    db.rollback()
+
+    start_ms, end_ms = _ms(start), _ms(end)
+    in_range = {}
+    for sensor, ts in loaded.items():
+        lo, hi = np.searchsorted(ts, [start_ms, end_ms])
+        if hi > lo:
+            in_range[sensor] = ts[lo:hi]
+
+    # Cycle times over the whole range (gaps of a stoppage or longer excluded)
+    cycles = [np.diff(ts) for ts in in_range.values()]
+    cycles = np.concatenate(cycles) if cycles else np.empty(0, dtype=np.int64)
+    cycles = cycles[cycles < threshold_ms]
+
+    merged = np.sort(np.concatenate(list(in_range.values()))) if in_range else np.empty(0, dtype=np.int64)
+    windows = shift_windows(SHIFTS, start, end, tz)
+    throughput = rolling_throughput(merged, start_ms, min(end_ms, now_ms), window_s * 1000, max_points, windows)
+
+    # Shift summaries: closed shifts entirely in the range come from the cache
+    timelines = {sensor_id: loaded.get(sensor_id, np.empty(0, dtype=np.int64))} if sensor_id else loaded
+    results: list[tuple[dict, list] | None] = []
+    to_compute = []
+    for window in windows:
+        closed = window.start_ms >= start_ms and window.end_ms <= min(end_ms, now_ms)
+        key = ("shift", tz.key, window.name, window.start_ms, sensor_id, threshold_ms)
+        cached = analytics_cache.get(key) if closed else None
+        results.append(cached)
+        if cached is None:
+            clipped = window._replace(start_ms=max(window.start_ms, start_ms),
+                                      end_ms=min(window.end_ms, end_ms, now_ms))
+            if clipped.end_ms > clipped.start_ms:
+                to_compute.append((len(results) - 1, window, clipped, key if closed else None))
+    shifts_cached = sum(r is not None for r in results)
+
+    generation = analytics_cache.generation
+    computed = shift_summaries(timelines, [c[2] for c in to_compute], now_ms, threshold_ms)
+    for (i, window, clipped, key), result in zip(to_compute, computed):
+        results[i] = result
+        if key is not None:
+            analytics_cache.put(
+                key, result, settings.ANALYTICS_CACHE_TTL_S, size=512 + 96 * len(result[1]),
+                start=window.start_ms / 1000, end=window.end_ms / 1000, generation=generation,
+            )
+
+    shift_rows, stoppages = [], []
+    for window, result in zip(windows, results):
+        if result is None:
+            continue  # Not started yet
+        summary, shift_stoppages = result
+        shift_rows.append({
+            **summary,
+            "start": _to_datetime(window.start_ms, tz),
+            "end": _to_datetime(window.end_ms, tz),
+            "partial": window.start_ms < start_ms or window.end_ms > min(end_ms, now_ms),
+        })
+        stoppages.extend((window.name, *stoppage) for stoppage in shift_stoppages)
+
+    durations = np.array([e - s for _, _, s, e, _ in stoppages], dtype=np.int64)
+    longest = np.argsort(-durations, kind="stable")[:stoppage_limit] if len(durations) else []
+    return {
+        "start": start,
+        "end": end,
+        "sensor_id": sensor_id,
+        "timezone": tz.key,
+        "stoppage_threshold_s": stoppage_s,
+        "sensors": sorted(in_range),
+        "total_counts": int(len(merged)),
+        "cycle_time": cycle_time_stats(cycles),
+        "throughput": throughput,
+        "stoppages": {
+            "count": len(stoppages),
+            "total_s": round(float(durations.sum()) / 1000, 3) if len(durations) else 0.0,
+            "longest": [
+                {
+                    "shift": stoppages[i][0],
+                    "sensor_id": stoppages[i][1],
+                    "start": _to_datetime(stoppages[i][2], tz),
+                    "end": _to_datetime(stoppages[i][3], tz),
+                    "duration_s": round(float(durations[i]) / 1000, 3),
+                    "ongoing": stoppages[i][4],
+                }
+                for i in longest
+            ],
+        },
+        "shifts": shift_rows,
+        "days_from_cache": days_cached,
+        "shifts_from_cache": shifts_cached,
+        "computed_ms": round((time.perf_counter() - started) * 1000, 3),
+    }
@@ -0,0 +1,296 @@
+# back-end/app/services/change_feed.py
+
+import json
+import logging
+import queue
+import select
+import threading
+import time
+from datetime import datetime, timezone
+
+from psycopg2 import InterfaceError, OperationalError, sql
+
+from app.core.metrics import registry
+from app.db.session import get_db_connection, open_dedicated_connection
+
+logger = logging.getLogger(__name__)
+
+# NOTIFY payloads must stay below 8000 bytes
+_MAX_PAYLOAD_BYTES = 7000
+
+# Sends a batch of payloads in one round trip
+_NOTIFY_SQL = "SELECT pg_notify(%s, payload) FROM unnest(%s::text[]) AS payload"
+
+_NOTIFICATIONS = registry.counter(
+    "terelina_change_feed_notifications_total",
+    "Change feed notifications, by direction (sent or received).",
+    ("direction",),
+)
+_FEED_EVENTS_DROPPED = registry.counter(
+    "terelina_change_feed_events_dropped_total",
+    "Live events not forwarded because the change feed queue was full.",
+)
+_LISTENER_RECONNECTS = registry.counter(
+    "terelina_change_feed_reconnects_total",
+    "Times the change feed listener reconnected to the database.",
+)
+
+
+def _pack(items: list, item_sizes: list[int], overhead: int) -> list[list]:
+    """Splits `items` into chunks whose encoded size fits one payload."""
+    chunks, chunk, size = [], [], overhead
+    for item, item_size in zip(items, item_sizes):
+        if chunk and size + item_size > _MAX_PAYLOAD_BYTES:
+            chunks.append(chunk)
+            chunk, size = [], overhead
+        chunk.append(item)
+        size += item_size
+    if chunk:
+        chunks.append(chunk)
+    return chunks
+
+
+def encode_counts(counts: list) -> list[str]:
+    """Encodes (sensor_id, timestamp) counts as one or more payloads per sensor."""
+    per_sensor: dict[str, list[int]] = {}
+    for sensor_id, ts in counts:
+        per_sensor.setdefault(sensor_id, []).append(int(ts.timestamp() * 1000))
+    payloads = []
+    for sensor_id, timestamps in per_sensor.items():
+        overhead = len(json.dumps(sensor_id)) + 40
+        for chunk in _pack(timestamps, [len(str(ms)) + 2 for ms in timestamps], overhead):
+            payloads.append(json.dumps({"type": "counts", "sensor_id": sensor_id, "ts": chunk}))
+    return payloads
+
+
+def decode_counts(message: dict) -> list:
+    sensor_id = message["sensor_id"]
+    return [(sensor_id, datetime.fromtimestamp(ms / 1000, tz=timezone.utc)) for ms in message["ts"]]
+
+
+def encode_events(events: list[dict]) -> list[str]:
+    encoded = [json.dumps(event) for event in events]
+    return [
+        '{"type": "events", "events": [' + ", ".join(chunk) + "]}"
+        for chunk in _pack(encoded, [len(e) + 2 for e in encoded], 40)
+    ]
+
+
+# =====================================================================
+# Ingester Side
+# =====================================================================
+
+class ChangeNotifier:
+    """
+    Publishes what the ingest process does to the API processes through
+    Postgres NOTIFY on `channel`.
+
+    Committed counts are notified inside the batch's own transaction (see
+    `notify_counts`), so listeners only ever hear about counts that are
+    stored. Live events (sensor state changes) and a periodic status
+    heartbeat are sent by a background thread. Until `start()` is called
+    everything here is a no-op, so it costs nothing in embedded mode.
+    """
+
+    def __init__(self, channel: str, status_provider=None, heartbeat_s: float = 5.0,
+                 flush_interval_s: float = 0.05, max_queued_events: int = 10000):
+        self.channel = channel
+        self._status_provider = status_provider
+        self._heartbeat_s = heartbeat_s
+        self._flush_interval_s = flush_interval_s
+        self._events: queue.Queue = queue.Queue(maxsize=max_queued_events)
+        self._enabled = False
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def start(self):
+        """Enables notifications and starts the event sender thread."""
+        if self._thread and self._thread.is_alive():
+            return
+        self._enabled = True
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="change-notifier", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Sends what is still queued, then stops."""
+        self._enabled = False
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def notify_counts(self, cur, counts: list):
+        """Ingestion commit hook: queues NOTIFYs for `counts` in the batch's transaction."""
+        if not self._enabled:
+            return
+        payloads = encode_counts(counts)
+        cur.execute(_NOTIFY_SQL, (self.channel, payloads))
+        _NOTIFICATIONS.inc("sent", amount=len(payloads))
+
+    def publish(self, event: dict):
+        """Queues a live event for the API processes. Safe from any thread."""
+        if not self._enabled:
+            return
+        try:
+            self._events.put_nowait(event)
+        except queue.Full:
+            _FEED_EVENTS_DROPPED.inc()
+
+    def _run(self):
+        next_heartbeat = 0.0
+        while True:
+            stopping = self._stop.wait(self._flush_interval_s)
+            events = []
+            while True:
+                try:
+                    events.append(self._events.get_nowait())
+                except queue.Empty:
+                    break
+            payloads = encode_events(events) if events else []
+            if self._status_provider is not None and (stopping or time.monotonic() >= next_heartbeat):
+                next_heartbeat = time.monotonic() + self._heartbeat_s
+                try:
+                    status = self._status_provider()
+                    payloads.append(json.dumps({"type": "status", "status": status}, default=str))
+                except Exception as e:
+                    logger.error(f"Failed to build the ingester status: {e}")
+            if payloads:
+                self._send(payloads)
+            if stopping:
+                return
+
+    def _send(self, payloads: list[str]):
+        try:
+            with get_db_connection() as conn:
+                with conn.cursor() as cur:
+                    cur.execute(_NOTIFY_SQL, (self.channel, payloads))
+                conn.commit()
+            _NOTIFICATIONS.inc("sent", amount=len(payloads))
+        except Exception as e:
+            # Live events are best effort; the database is the source of truth
+            logger.warning(f"Failed to send {len(payloads)} change notification(s): {e}")
+
+
+# =====================================================================
+# API Side
+# =====================================================================
+
+class ChangeListener:
+    """
+    Follows the ingest process from an API process: LISTENs on `channel`
+    over a dedicated connection and hands what arrives to the same
+    callbacks the ingestion writer would call in-process.
+
+    - committed counts go to every `add_listener` callback, as a list of
+      (sensor_id, timestamp);
+    - live events go to `on_event`;
+    - the ingester's status heartbeat is kept in `ingester_status`.
+
+    Notifications sent while not listening are lost, so `on_resync` is
+    called after every (re)connect to re-read state from the database.
+    Unlike the in-process writer there is no lock shared with the ingester:
+    a batch committed during a resync may be counted twice until the next
+    periodic reconciliation.
+    """
+
+    def __init__(self, channel: str, on_event=None, on_resync=None, max_backoff_s: float = 30.0):
+        self.channel = channel
+        self._on_event = on_event
+        self._on_resync = on_resync
+        self._max_backoff_s = max_backoff_s
+        self._listeners: list = []
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+        self.connected = False
+        self.ingester_status: dict | None = None
+        self.ingester_seen_at: float | None = None  # Monotonic time of the last heartbeat
+
+    def add_listener(self, callback):
+        """Registers `callback(counts)` for every notified batch of counts."""
+        self._listeners.append(callback)
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="change-listener", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def ingester_age_s(self) -> float | None:
+        """Seconds since the last ingester heartbeat, or None if none was received."""
+        if self.ingester_seen_at is None:
+            return None
+        return time.monotonic() - self.ingester_seen_at
+
+    def _run(self):
+        backoff = 1.0
+        listened_before = False
+        while not self._stop.is_set():
+            conn = None
+            try:
+                conn = open_dedicated_connection()
+                conn.autocommit = True
+                with conn.cursor() as cur:
+                    cur.execute(sql.SQL("LISTEN {}").format(sql.Identifier(self.channel)))
+                self.connected = True
+                backoff = 1.0
+                logger.info(f"Listening for ingester changes on '{self.channel}'.")
+                if listened_before:
+                    _LISTENER_RECONNECTS.inc()
+                listened_before = True
+                self._resync()
+                self._listen(conn)
+            except (OperationalError, InterfaceError) as e:
+                logger.warning(f"Change listener disconnected from the database, retrying in {backoff:.0f}s: {e}")
+            finally:
+                self.connected = False
+                if conn is not None:
+                    conn.close()
+            if self._stop.wait(backoff):
+                return
+            backoff = min(backoff * 2, self._max_backoff_s)
+
+    def _listen(self, conn):
+        while not self._stop.is_set():
+            if not select.select([conn], [], [], 1.0)[0]:
+                continue
+            conn.poll()
+            while conn.notifies:
+                notification = conn.notifies.pop(0)
+                _NOTIFICATIONS.inc("received")
+                try:
+                    self._dispatch(json.loads(notification.payload))
+                except Exception as e:
+                    logger.error(f"Failed to apply change notification: {e}")
+
+    def _dispatch(self, message: dict):
+        kind = message.get("type")
+        if kind == "counts":
+            counts = decode_counts(message)
+            for callback in self._listeners:
+                try:
+                    callback(counts)
+                except Exception as e:
+                    logger.error(f"Change feed listener {callback!r} failed: {e}")
+        elif kind == "events":
+            if self._on_event is not None:
+                for event in message["events"]:
+                    self._on_event(event)
+        elif kind == "status":
+            self.ingester_status = message["status"]
+            self.ingester_seen_at = time.monotonic()
+
+    def _resync(self):
+        if self._on_resync is None:
+            return
+        try:
+            self._on_resync()
+        except Exception as e:
+            logger.error(f"Change feed resync failed: {e}")
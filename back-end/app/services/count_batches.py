@@ -0,0 +1,208 @@
+# back-end/app/services/count_batches.py
+
+import logging
+import threading
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+# Device wall-clock timestamps further ahead of the server than this are
+# ignored in favour of the uptime-based estimate
+_MAX_FUTURE_SKEW_MS = 60_000
+
+
+class EdgeSensorState:
+    """Per-device state for sensors that count on the edge and send batches."""
+
+    __slots__ = (
+        "sensor_id",
+        "boot",
+        "last_seq",
+        "last_total",
+        "last_event_ms",
+        "last_seen_ms",
+        "clock_offset_ms",
+        "batches",
+        "counts",
+        "recovered",
+        "duplicates",
+        "resets",
+        "rejected",
+        "epoch",
+    )
+
+    def __init__(self, sensor_id: str, now_ms: int):
+        self.sensor_id = sensor_id
+        self.boot = None
+        self.last_seq = 0
+        self.last_total = None
+        self.last_event_ms = None
+        self.last_seen_ms = now_ms
+        self.clock_offset_ms = None  # Server time minus device uptime
+        self.batches = 0
+        self.counts = 0
+        self.recovered = 0
+        self.duplicates = 0
+        self.resets = 0
+        self.rejected = 0
+        # Server time (ms) of the last counter reset seen; cumulative indices
+        # repeat after a reset, so count keys are prefixed with it
+        self.epoch = None
+
+    def to_dict(self) -> dict:
+        return {
+            "sensor_id": self.sensor_id,
+            "boot": self.boot,
+            "last_seq": self.last_seq,
+            "last_total": self.last_total,
+            "last_seen_ms": self.last_seen_ms,
+            "batches": self.batches,
+            "counts": self.counts,
+            "recovered": self.recovered,
+            "duplicates": self.duplicates,
+            "resets": self.resets,
+            "rejected": self.rejected,
+        }
+
+
+class CountBatchTracker:
+    """
+    Turns batched count deltas from edge-counting devices into individual
+    counts.
+
+    Every batch carries the device's persistent cumulative total, which is
+    the source of truth: a redelivered batch adds nothing, and counts from
+    batches that never arrived are recovered from the jump in the total and
+    spread evenly over the time between the two batches.
+    """
+
+    def __init__(self, idle_ttl_s: int = 3600, recover_gaps: bool = True, max_batch_counts: int = 10_000):
+        self._idle_ttl_ms = idle_ttl_s * 1000
+        # Batches (including recovered counts) above this are dropped, not expanded
+        self.max_batch_counts = max_batch_counts
+        # Off when other consumers may have received the batches in between
+        self.recover_gaps = recover_gaps
+        self._sensors: "OrderedDict[str, EdgeSensorState]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def process(self, sensor_id: str, now_ms: int, count: int, total: int, seq: int | None = None,
+                boot: str | None = None, first_t_ms: int | None = None, last_t_ms: int | None = None,
+                first_ts_ms: int | None = None, last_ts_ms: int | None = None) -> list[tuple[str, int]]:
+        """
+        Applies one batch and returns the new counts as (count key, event
+        time in epoch ms), oldest first. The key is the count's cumulative
+        index, stable across redeliveries and backend restarts; after a
+        counter reset it is prefixed with the reset's epoch ("<epoch>/<index>"),
+        as the indices start over and would repeat already stored ones.
+        """
+        with self._lock:
+            sensor = self._sensors.get(sensor_id)
+            if sensor is None:
+                sensor = EdgeSensorState(sensor_id, now_ms)
+                self._sensors[sensor_id] = sensor
+            else:
+                self._sensors.move_to_end(sensor_id)
+            sensor.last_seen_ms = now_ms
+            self._evict_idle(now_ms)
+
+            if boot != sensor.boot:
+                # The uptime clock (and batch sequence) restart with the device
+                sensor.boot = boot
+                sensor.last_seq = 0
+                sensor.clock_offset_ms = None
+
+            if seq is not None and seq <= sensor.last_seq:
+                sensor.duplicates += 1
+                return []
+
+            first_ms, last_ms = self._event_window(sensor, now_ms, first_t_ms, last_t_ms, first_ts_ms, last_ts_ms)
+
+            if sensor.last_total is not None and total < sensor.last_total:
+                sensor.resets += 1
+                sensor.epoch = now_ms
+            if sensor.last_total is None or total < sensor.last_total or not self.recover_gaps:
+                # First batch seen, the device's counter was reset, or gaps are not ours to fill
+                new = min(count, total) if total >= 0 else count
+                recovered = 0
+            else:
+                new = total - sensor.last_total
+                recovered = max(0, new - count)
+                if new <= 0:
+                    sensor.duplicates += 1
+                    if seq is not None:
+                        sensor.last_seq = seq
+                    return []
+
+            if count > self.max_batch_counts or new > self.max_batch_counts:
+                # Expanding it would build millions of timestamps; take the
+                # total as the new baseline instead
+                logger.warning(
+                    "Count batch of %s dropped: %d count(s) (total %d, %d new) exceed the limit of %d.",
+                    sensor_id, count, total, new, self.max_batch_counts,
+                )
+                sensor.rejected += 1
+                sensor.last_total = total
+                if seq is not None:
+                    sensor.last_seq = seq
+                return []
+
+            # Counts of this batch span [first_ms, last_ms]; recovered ones the
+            # gap since the previous batch
+            times = []
+            if recovered:
+                gap_start = sensor.last_event_ms if sensor.last_event_ms is not None else first_ms
+                times.extend(_spread(gap_start, first_ms, recovered, include_ends=False))
+            times.extend(_spread(first_ms, last_ms, new - recovered, include_ends=True))
+
+            first_index = total - new + 1
+            sensor.last_total = total
+            sensor.last_event_ms = last_ms
+            if seq is not None:
+                sensor.last_seq = seq
+            sensor.batches += 1
+            sensor.counts += new
+            sensor.recovered += recovered
+            prefix = "" if sensor.epoch is None else f"{sensor.epoch}/"
+            return [(f"{prefix}{first_index + i}", ts) for i, ts in enumerate(times)]
+
+    def _event_window(self, sensor: EdgeSensorState, now_ms: int, first_t_ms, last_t_ms,
+                      first_ts_ms, last_ts_ms) -> tuple[int, int]:
+        """Returns the batch's (first, last) count times in epoch ms."""
+        if last_ts_ms is not None and last_ts_ms <= now_ms + _MAX_FUTURE_SKEW_MS:
+            return (first_ts_ms if first_ts_ms is not None else last_ts_ms), last_ts_ms
+        if last_t_ms is not None:
+            # The smallest offset seen comes from the least delayed message
+            offset = now_ms - last_t_ms
+            if sensor.clock_offset_ms is None or offset < sensor.clock_offset_ms:
+                sensor.clock_offset_ms = offset
+            first = first_t_ms if first_t_ms is not None else last_t_ms
+            return first + sensor.clock_offset_ms, last_t_ms + sensor.clock_offset_ms
+        return now_ms, now_ms
+
+    def _evict_idle(self, now_ms: int):
+        sensors = self._sensors
+        while sensors:
+            oldest = next(iter(sensors.values()))
+            if now_ms - oldest.last_seen_ms < self._idle_ttl_ms:
+                return
+            sensors.popitem(last=False)
+
+    def snapshot(self) -> list[dict]:
+        """Returns the per-device state, most recently seen first."""
+        with self._lock:
+            return [s.to_dict() for s in reversed(self._sensors.values())]
+
+
+def _spread(start_ms: int, end_ms: int, n: int, include_ends: bool) -> list[int]:
+    """Returns `n` evenly spaced times between start and end."""
+    if n <= 0:
+        return []
+    if end_ms < start_ms:
+        end_ms = start_ms
+    if include_ends:
+        if n == 1:
+            return [end_ms]
+        step = (end_ms - start_ms) / (n - 1)
+        return [int(start_ms + step * i) for i in range(n)]
+    step = (end_ms - start_ms) / (n + 1)
+    return [int(start_ms + step * (i + 1)) for i in range(n)]
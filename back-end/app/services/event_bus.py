@@ -0,0 +1,126 @@
+# back-end/app/services/event_bus.py
+
+import asyncio
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+# What to do when a subscriber's queue is full
+POLICY_DROP_OLDEST = "drop_oldest"
+POLICY_COALESCE = "coalesce"
+POLICIES = (POLICY_DROP_OLDEST, POLICY_COALESCE)
+
+
+class Subscription:
+    """
+    A single client's bounded event queue.
+
+    With the "coalesce" policy, events that do not fit are folded into one
+    pending event per (type, sensor): count deltas are summed and the latest
+    state wins. With "drop_oldest", the oldest queued event is discarded.
+    """
+
+    def __init__(self, queue_size: int, policy: str, sensor_ids: set[str] | None):
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.policy = policy
+        self.sensor_ids = sensor_ids
+        self.dropped = 0
+        self.coalesced = 0
+        self._pending: dict[tuple[str, str], dict] = {}
+
+    def wants(self, event: dict) -> bool:
+        return self.sensor_ids is None or event.get("sensor_id") in self.sensor_ids
+
+    def offer(self, event: dict):
+        """Enqueues an event, applying the overflow policy. Loop thread only."""
+        if not self._pending:
+            try:
+                self.queue.put_nowait(event)
+                return
+            except asyncio.QueueFull:
+                pass
+
+        if self.policy == POLICY_COALESCE:
+            key = (event["type"], event.get("sensor_id"))
+            pending = self._pending.get(key)
+            if pending is not None and event["type"] == "count":
+                merged = dict(event)
+                merged["count"] = pending["count"] + event["count"]
+                self._pending[key] = merged
+            else:
+                self._pending[key] = event
+            self.coalesced += 1
+        else:
+            self.queue.get_nowait()
+            self.queue.put_nowait(event)
+            self.dropped += 1
+
+    async def get(self) -> dict:
+        """Returns the next event, including any coalesced ones once the queue drains."""
+        if self.queue.empty() and self._pending:
+            key = next(iter(self._pending))
+            return self._pending.pop(key)
+        return await self.queue.get()
+
+
+class EventBroadcaster:
+    """
+    Fans out live count and sensor-state events to streaming clients.
+
+    `publish` is safe to call from any thread (the MQTT network thread or
+    the ingestion writer); delivery happens on the bound event loop.
+    """
+
+    def __init__(self, max_subscribers: int = 200, queue_size: int = 256):
+        self.max_subscribers = max_subscribers
+        self.queue_size = queue_size
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._subscribers: set[Subscription] = set()
+        self._lock = threading.Lock()
+        self.published = 0
+
+    def bind_loop(self, loop: asyncio.AbstractEventLoop):
+        """Binds the broadcaster to the application's event loop."""
+        self._loop = loop
+
+    def publish(self, event: dict):
+        """Schedules `event` for delivery to all matching subscribers."""
+        loop = self._loop
+        if loop is None or not self._subscribers:
+            return
+        try:
+            loop.call_soon_threadsafe(self._fan_out, event)
+        except RuntimeError:
+            # Loop already closed during shutdown
+            pass
+
+    def _fan_out(self, event: dict):
+        self.published += 1
+        for subscription in list(self._subscribers):
+            if subscription.wants(event):
+                subscription.offer(event)
+
+    def subscribe(self, sensor_ids: set[str] | None = None, policy: str = POLICY_COALESCE,
+                  queue_size: int | None = None) -> Subscription:
+        """Registers a new client. Raises RuntimeError when the server is full."""
+        with self._lock:
+            if len(self._subscribers) >= self.max_subscribers:
+                raise RuntimeError("Too many stream subscribers")
+            subscription = Subscription(queue_size or self.queue_size, policy, sensor_ids)
+            self._subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    def get_stats(self) -> dict:
+        subscribers = list(self._subscribers)
+        return {
+            "subscribers": len(subscribers),
+            "max_subscribers": self.max_subscribers,
+            "events_published": self.published,
+            "events_dropped": sum(s.dropped for s in subscribers),
+            "events_coalesced": sum(s.coalesced for s in subscribers),
+        }
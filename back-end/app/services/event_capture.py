@@ -0,0 +1,260 @@
+# back-end/app/services/event_capture.py
+
+import json
+import logging
+import os
+import struct
+import threading
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import numpy
+
+logger = logging.getLogger(__name__)
+
+_SEGMENT_PREFIX = "events-"
+_SEGMENT_SUFFIX = ".bin"
+_STRINGS_FILE = "strings.jsonl"
+
+# Marks a missing integer field (seq, device_ms, device_ts_ms)
+NONE = -(2 ** 63)
+
+STATE_CLEAR = 0
+STATE_INTERRUPTED = 1
+
+# One fixed-size little-endian record per state message; sensor and boot
+# are ids into the strings file (0 = no boot)
+_RECORD = struct.Struct("<qqqqIIB")
+
+# The same layout as a NumPy structured dtype, as (name, format) fields.
+# NumPy is only imported to read a capture (record_dtype), so capturing,
+# or having it disabled, does not need it.
+RECORD_FIELDS = [
+    ("arrival_ms", "<i8"),
+    ("device_ms", "<i8"),
+    ("device_ts_ms", "<i8"),
+    ("seq", "<i8"),
+    ("sensor", "<u4"),
+    ("boot", "<u4"),
+    ("state", "u1"),
+]
+
+
+def record_dtype():
+    """The NumPy dtype of a captured record."""
+    import numpy as np
+
+    return np.dtype(RECORD_FIELDS)
+
+
+class EventCapture:
+    """
+    Optional append-only capture of the normalized state messages fed to
+    the sensor state machines, so counting can be replayed offline with
+    other parameters (see app.recount).
+
+    Records are fixed-size binary rows (record_dtype()) in numbered segment
+    files, readable straight into a NumPy array. Sensor ids and boot ids
+    are stored once in `strings.jsonl` and referenced by number.
+
+    `record` only packs the message into a memory buffer; a background
+    thread appends it to disk every `flush_interval_s` without fsync. When
+    the buffer is full, messages are dropped and counted rather than
+    slowing down ingestion. The oldest segments are deleted once the
+    capture exceeds `max_total_bytes`.
+    """
+
+    def __init__(self, directory: str, segment_max_bytes: int = 64 * 1024 * 1024,
+                 max_total_bytes: int = 1024 * 1024 * 1024, flush_interval_s: float = 1.0,
+                 max_buffered: int = 100_000):
+        self.directory = directory
+        self.segment_max_bytes = segment_max_bytes
+        self.max_total_bytes = max_total_bytes
+        self.flush_interval_s = flush_interval_s
+        self.max_buffered = max_buffered
+        self._lock = threading.Lock()
+        self._buffer: list[bytes] = []
+        self._new_strings: list[str] = []
+        self._string_ids: dict[str, int] = {}
+        self._active = None
+        self._next_seq = 1
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+        self.captured = 0
+        self.dropped = 0
+
+    # -----------------------------------------------------------------
+    # Lifecycle
+    # -----------------------------------------------------------------
+
+    def start(self):
+        """Loads the string table and starts the writer thread."""
+        if self._thread and self._thread.is_alive():
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        strings = read_strings(self.directory, repair=True)
+        self._string_ids = {s: i for i, s in enumerate(strings) if i}
+        segments = segment_paths(self.directory)
+        if segments:
+            self._next_seq = _seq(segments[-1]) + 1
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="event-capture", daemon=True)
+        self._thread.start()
+        logger.info(f"Capturing raw sensor events to {self.directory}.")
+
+    def stop(self):
+        """Writes what is buffered, then stops."""
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=10)
+            self._thread = None
+        if self._active is not None:
+            self._active.close()
+            self._active = None
+
+    # -----------------------------------------------------------------
+    # Capture
+    # -----------------------------------------------------------------
+
+    def record(self, sensor_id: str, state: str, arrival_ms: int, seq: int | None, boot: str | None,
+               device_ms: int | None, device_ts_ms: int | None):
+        """
+        Buffers one normalized state message. Cheap enough for the consumer
+        loop, and never raises: a message that cannot be stored (e.g. a
+        seq outside int64) is counted as dropped.
+        """
+        with self._lock:
+            if len(self._buffer) >= self.max_buffered:
+                self.dropped += 1
+                return
+            try:
+                record = _RECORD.pack(
+                    arrival_ms,
+                    NONE if device_ms is None else device_ms,
+                    NONE if device_ts_ms is None else device_ts_ms,
+                    NONE if seq is None else seq,
+                    self._string_id(sensor_id),
+                    0 if boot is None else self._string_id(boot),
+                    STATE_INTERRUPTED if state == "interrupted" else STATE_CLEAR,
+                )
+            except (struct.error, TypeError):
+                self.dropped += 1
+                return
+            self._buffer.append(record)
+
+    def _string_id(self, value: str) -> int:
+        """Caller holds the lock."""
+        string_id = self._string_ids.get(value)
+        if string_id is None:
+            string_id = self._string_ids[value] = len(self._string_ids) + 1
+            self._new_strings.append(value)
+        return string_id
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            return {
+                "directory": self.directory,
+                "events_captured": self.captured,
+                "events_dropped": self.dropped,
+                "buffered": len(self._buffer),
+            }
+
+    # -----------------------------------------------------------------
+    # Writer thread
+    # -----------------------------------------------------------------
+
+    def _run(self):
+        while True:
+            stopping = self._stop.wait(self.flush_interval_s)
+            try:
+                self._flush()
+            except OSError as e:
+                logger.error(f"Failed to write captured events: {e}")
+            if stopping:
+                return
+
+    def _flush(self):
+        with self._lock:
+            records, self._buffer = self._buffer, []
+            strings, self._new_strings = self._new_strings, []
+        # Strings go first: a record never refers to an id missing on disk
+        if strings:
+            with open(os.path.join(self.directory, _STRINGS_FILE), "a", encoding="utf-8") as f:
+                f.write("".join(json.dumps(s) + "\n" for s in strings))
+        if not records:
+            return
+        if self._active is None:
+            path = os.path.join(self.directory, f"{_SEGMENT_PREFIX}{self._next_seq:012d}{_SEGMENT_SUFFIX}")
+            self._next_seq += 1
+            self._active = open(path, "ab")
+        self._active.write(b"".join(records))
+        self._active.flush()
+        with self._lock:
+            self.captured += len(records)
+        if self._active.tell() >= self.segment_max_bytes:
+            self._active.close()
+            self._active = None
+            self._enforce_retention()
+
+    def _enforce_retention(self):
+        segments = segment_paths(self.directory)
+        sizes = [os.path.getsize(path) for path in segments]
+        total = sum(sizes)
+        for path, size in zip(segments, sizes):
+            if total <= self.max_total_bytes:
+                return
+            os.remove(path)
+            total -= size
+            logger.info(f"Deleted captured event segment {os.path.basename(path)} (capture over its size limit).")
+
+# =====================================================================
+# Reading
+# =====================================================================
+
+def segment_paths(directory: str) -> list[str]:
+    names = sorted(
+        n for n in os.listdir(directory)
+        if n.startswith(_SEGMENT_PREFIX) and n.endswith(_SEGMENT_SUFFIX)
+    )
+    return [os.path.join(directory, n) for n in names]
+
+
+def _seq(path: str) -> int:
+    return int(os.path.basename(path)[len(_SEGMENT_PREFIX):-len(_SEGMENT_SUFFIX)])
+
+
+def read_strings(directory: str, repair: bool = False) -> list[str]:
+    """
+    The string table, indexed by id (id 0 is None). With `repair`, a torn
+    last line left by a crash is cut off so new strings keep their ids.
+    """
+    path = os.path.join(directory, _STRINGS_FILE)
+    if not os.path.exists(path):
+        return [None]
+    with open(path, "rb") as f:
+        data = f.read()
+    complete = data[:data.rfind(b"\n") + 1]
+    if repair and len(complete) < len(data):
+        logger.warning(f"Cutting a torn line off {path}.")
+        with open(path, "r+b") as f:
+            f.truncate(len(complete))
+    return [None] + [json.loads(line) for line in complete.decode("utf-8").splitlines()]
+
+
+def read_events(directory: str) -> tuple["numpy.ndarray", list[str]]:
+    """
+    Every captured record, oldest first, as a record_dtype() array, plus
+    the string table. A torn record at the end of a segment is skipped.
+    """
+    import numpy as np
+
+    dtype = record_dtype()
+    strings = read_strings(directory)
+    parts = []
+    for path in segment_paths(directory):
+        data = np.fromfile(path, dtype=np.uint8)
+        whole = len(data) // dtype.itemsize * dtype.itemsize
+        parts.append(data[:whole].view(dtype))
+    events = np.concatenate(parts) if parts else np.empty(0, dtype=dtype)
+    # Ids written after the string table was last flushed (crash) are unusable
+    return events[events["sensor"] < len(strings)], strings
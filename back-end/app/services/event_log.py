@@ -0,0 +1,143 @@
+# back-end/app/services/event_log.py
+
+import logging
+import random
+import threading
+import time
+from datetime import datetime, timezone
+
+logger = logging.getLogger(__name__)
+
+LEVELS = ("INFO", "WARNING", "ERROR")
+
+
+class _RateLimit:
+    """Token bucket allowing `per_minute` new rows, refilled continuously."""
+
+    __slots__ = ("capacity", "tokens", "refill_per_s", "updated")
+
+    def __init__(self, per_minute: int):
+        self.capacity = float(per_minute)
+        self.tokens = float(per_minute)
+        self.refill_per_s = per_minute / 60.0
+        self.updated = time.monotonic()
+
+    def take(self, now: float) -> bool:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.refill_per_s)
+        self.updated = now
+        if self.tokens >= 1.0:
+            self.tokens -= 1.0
+            return True
+        return False
+
+
+class SystemEventLog:
+    """
+    Buffers system events for the `system_logs` table and hands them to
+    `sink(level, message, source, occurrences, timestamp)` in the
+    background, so logging an event never touches the database.
+
+    Identical events (same level, source and message) within one flush
+    interval become a single row with an `occurrences` count. New rows are
+    rate-limited per level, and distinct INFO events can be sampled; what
+    the limits hold back is summarised in one row per level and flush.
+    """
+
+    def __init__(self, sink, flush_interval_s: float = 5.0, per_minute: dict[str, int] | None = None,
+                 info_sample_rate: float = 1.0):
+        self._sink = sink
+        self._flush_interval_s = flush_interval_s
+        per_minute = per_minute or {}
+        self._limits = {level: _RateLimit(per_minute.get(level, 60)) for level in LEVELS}
+        self._info_sample_rate = info_sample_rate
+        self._lock = threading.Lock()
+        # (level, source, message) -> [first timestamp, occurrences]
+        self._pending: dict[tuple, list] = {}
+        self._suppressed = dict.fromkeys(LEVELS, 0)
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._stats = {
+            "events_logged": 0,
+            "events_coalesced": 0,
+            "events_sampled_out": 0,
+            "events_rate_limited": 0,
+            "rows_flushed": 0,
+            "rows_dropped": 0,
+        }
+
+    def log(self, level: str, message: str, source: str = "mqtt"):
+        """Records an event; cheap enough for any thread, including the event loop."""
+        level = level.upper()
+        key = (level, source, message)
+        with self._lock:
+            self._stats["events_logged"] += 1
+            pending = self._pending.get(key)
+            if pending is not None:
+                pending[1] += 1
+                self._stats["events_coalesced"] += 1
+                return
+            if level == "INFO" and self._info_sample_rate < 1.0 and random.random() >= self._info_sample_rate:
+                self._stats["events_sampled_out"] += 1
+                return
+            limit = self._limits.get(level)
+            if limit is not None and not limit.take(time.monotonic()):
+                self._suppressed[level] += 1
+                self._stats["events_rate_limited"] += 1
+                return
+            self._pending[key] = [datetime.now(timezone.utc), 1]
+
+    # -----------------------------------------------------------------
+    # Lifecycle
+    # -----------------------------------------------------------------
+
+    def start(self):
+        """Starts the background flusher thread."""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="system-log-flusher", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stops the flusher and hands over whatever is still buffered."""
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+            self._thread = None
+        self.flush()
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["pending_rows"] = len(self._pending)
+        return stats
+
+    def _run(self):
+        while not self._stop.wait(self._flush_interval_s):
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"Failed to flush system events: {e}")
+
+    def flush(self):
+        """Hands every buffered row (and rate-limit summaries) to the sink."""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            suppressed, self._suppressed = self._suppressed, dict.fromkeys(LEVELS, 0)
+
+        now = datetime.now(timezone.utc)
+        rows = [(level, message, source, occurrences, ts)
+                for (level, source, message), (ts, occurrences) in pending.items()]
+        for level, n in suppressed.items():
+            if n:
+                rows.append((level, f"{n} {level} event(s) suppressed by rate limit", "system", n, now))
+
+        dropped = 0
+        for row in rows:
+            if not self._sink(*row):
+                dropped += 1
+        if dropped:
+            logger.warning(f"Ingestion queue full, {dropped} system event row(s) dropped.")
+        with self._lock:
+            self._stats["rows_flushed"] += len(rows) - dropped
+            self._stats["rows_dropped"] += dropped
@@ -0,0 +1,517 @@
+# back-end/app/services/ingestion.py
+
+import asyncio
+import logging
+import queue
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+
+import psycopg2
+from psycopg2.extras import execute_values
+
+from app.core.metrics import registry
+from app.db.session import get_db_connection
+from app.services.spool import CountSpool
+
+logger = logging.getLogger(__name__)
+
+# Item kinds carried through the ingestion queue
+_KIND_COUNT = 0
+_KIND_EVENT = 1
+
+# Sentinel used to wake the writer thread on shutdown
+_STOP = object()
+
+# Errors caused by the batch's data rather than the database being down
+# (e.g. a value too long for its column, a NUL byte in a string)
+_DATA_ERRORS = (psycopg2.DataError, ValueError)
+
+# Replay attempts a segment gets when it fails on its data before it is
+# moved to a dead-letter file
+_DEAD_LETTER_AFTER = 3
+
+_WRITE_SECONDS = registry.histogram(
+    "terelina_db_write_seconds",
+    "Duration of the transaction that inserts one ingestion batch.",
+)
+_BATCH_SIZE = registry.histogram(
+    "terelina_ingest_batch_size",
+    "Counts and events per written ingestion batch.",
+    buckets=(1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500),
+)
+
+# Inserts raw counts and folds them into the hourly/daily rollups in one
+# statement, so the rollups never drift from pizza_counts. Counts whose
+# event_uid was already saved (a replayed or retried batch, or a device
+# event redelivered with a re-estimated timestamp) are skipped through
+# pizza_count_events and not rolled up again; rows stored before that
+# table existed are still caught by the (event_uid, timestamp) index. The
+# statement returns the counts actually inserted.
+_INSERT_COUNTS_SQL = """
+    WITH batch (event_uid, sensor_id, "timestamp") AS (
+        VALUES %s
+    ), new_events AS (
+        INSERT INTO pizza_count_events (event_uid)
+        SELECT DISTINCT event_uid FROM batch
+        ON CONFLICT (event_uid) DO NOTHING
+        RETURNING event_uid
+    ), inserted AS (
+        INSERT INTO pizza_counts (event_uid, sensor_id, "timestamp")
+        SELECT DISTINCT ON (event_uid) event_uid, sensor_id, "timestamp"
+        FROM batch
+        WHERE event_uid IN (SELECT event_uid FROM new_events)
+        ON CONFLICT (event_uid, "timestamp") DO NOTHING
+        RETURNING sensor_id, "timestamp"
+    ), hourly AS (
+        INSERT INTO pizza_counts_hourly (bucket, sensor_id, total_counts)
+        SELECT DATE_TRUNC('hour', "timestamp"), sensor_id, COUNT(*)
+        FROM inserted
+        GROUP BY 1, 2
+        ON CONFLICT (bucket, sensor_id)
+        DO UPDATE SET total_counts = pizza_counts_hourly.total_counts + EXCLUDED.total_counts
+    ), daily AS (
+        INSERT INTO pizza_counts_daily (day, sensor_id, total_counts)
+        SELECT ("timestamp" AT TIME ZONE system_timezone())::DATE, sensor_id, COUNT(*)
+        FROM inserted
+        GROUP BY 1, 2
+        ON CONFLICT (day, sensor_id)
+        DO UPDATE SET total_counts = pizza_counts_daily.total_counts + EXCLUDED.total_counts
+    )
+    SELECT sensor_id, "timestamp" FROM inserted
+"""
+_INSERT_COUNTS_TEMPLATE = "(%s::uuid, %s, %s)"
+
+
+class IngestionPipeline:
+    """
+    Bounded, buffered writer for detected counts and system events.
+
+    Producers (the MQTT callback thread) only enqueue; a dedicated writer
+    thread drains the queue and flushes multi-row INSERTs in a single
+    transaction whenever the batch is full or the flush interval elapses.
+
+    With a spool, counts from a batch that cannot be committed are written
+    to disk instead of being lost, and a replayer thread loads them into
+    the database once it is reachable again. While the database is known
+    to be down, the writer spools directly instead of waiting on it.
+    """
+
+    def __init__(self, max_queue_size: int = 10000, batch_size: int = 500,
+                 flush_interval_ms: int = 500, enqueue_timeout_ms: int = 50,
+                 spool: CountSpool | None = None, replay_interval_s: float = 5.0):
+        self._queue: queue.Queue = queue.Queue(maxsize=max_queue_size)
+        self._batch_size = batch_size
+        self._flush_interval_s = flush_interval_ms / 1000.0
+        self._enqueue_timeout_s = enqueue_timeout_ms / 1000.0
+        self._thread: threading.Thread | None = None
+        self._spool = spool
+        self._replay_interval_s = replay_interval_s
+        self._replay_thread: threading.Thread | None = None
+        self._replay_stop = threading.Event()
+        # Monotonic time before which the writer spools instead of trying the database
+        self._db_retry_at = 0.0
+        # Spool segment path -> replays that failed on its data
+        self._replay_rejections: dict[str, int] = {}
+        # (year, month) pairs whose pizza_counts partition is known to exist
+        self._partition_months: set[tuple[int, int]] = set()
+        # Held around commit + listener notification so readers that
+        # reseed from the database can take a consistent snapshot
+        self.commit_lock = threading.Lock()
+        self._listeners: list = []
+        self._commit_hooks: list = []
+        self._fence = None
+        self._stats_lock = threading.Lock()
+        self._stats = {
+            "counts_enqueued": 0,
+            "events_enqueued": 0,
+            "counts_written": 0,
+            "events_written": 0,
+            "counts_rejected": 0,
+            "events_rejected": 0,
+            "batches_flushed": 0,
+            "batches_failed": 0,
+            "counts_lost": 0,
+            "events_lost": 0,
+            "counts_spooled": 0,
+            "counts_replayed": 0,
+            "replay_duplicates": 0,
+            "replay_failures": 0,
+            "replay_dead_letters": 0,
+            "queue_high_watermark": 0,
+            "last_batch_size": 0,
+            "last_flush_ms": 0.0,
+            "last_flush_at": None,
+        }
+
+    # -----------------------------------------------------------------
+    # Producer API (called from the MQTT network thread)
+    # -----------------------------------------------------------------
+
+    def submit_count(self, sensor_id: str, detected_at: float | None = None,
+                     event_uid: str | None = None) -> bool:
+        """
+        Enqueues a detected count. Blocks for at most `enqueue_timeout_ms`
+        when the queue is full, applying backpressure to the caller.
+        `event_uid` identifies the count so that rewriting it is a no-op.
+        """
+        item = self._count_item(sensor_id, detected_at, event_uid)
+        try:
+            self._queue.put(item, timeout=self._enqueue_timeout_s)
+        except queue.Full:
+            return self._reject_count(sensor_id)
+        self._bump("counts_enqueued")
+        return True
+
+    async def submit_count_async(self, sensor_id: str, detected_at: float | None = None,
+                                 event_uid: str | None = None) -> bool:
+        """
+        Event-loop variant of `submit_count`: waits for queue space without
+        blocking the loop, so a slow writer slows the caller down instead.
+        """
+        item = self._count_item(sensor_id, detected_at, event_uid)
+        deadline = time.monotonic() + self._enqueue_timeout_s
+        while True:
+            try:
+                self._queue.put_nowait(item)
+                break
+            except queue.Full:
+                if time.monotonic() >= deadline:
+                    return self._reject_count(sensor_id)
+                await asyncio.sleep(0.005)
+        self._bump("counts_enqueued")
+        return True
+
+    @staticmethod
+    def _count_item(sensor_id: str, detected_at: float | None, event_uid: str | None) -> tuple:
+        ts = datetime.fromtimestamp(detected_at or time.time(), tz=timezone.utc)
+        return (_KIND_COUNT, (event_uid or str(uuid.uuid4()), sensor_id, ts))
+
+    def _reject_count(self, sensor_id: str) -> bool:
+        self._bump("counts_rejected")
+        logger.error(f"Ingestion queue full, count from sensor {sensor_id} rejected.")
+        return False
+
+    def submit_event(self, level: str, message: str, source: str = "mqtt", occurrences: int = 1,
+                     timestamp: datetime | None = None) -> bool:
+        """
+        Enqueues a system log row (`occurrences` identical events since
+        `timestamp`). Events are dropped, never blocked on.
+        """
+        ts = timestamp or datetime.now(timezone.utc)
+        try:
+            self._queue.put_nowait((_KIND_EVENT, (level.upper(), message, source, ts, occurrences)))
+        except queue.Full:
+            self._bump("events_rejected")
+            return False
+        self._bump("events_enqueued")
+        return True
+
+    def add_listener(self, callback):
+        """
+        Registers `callback(counts)` to run after each committed batch, with
+        the list of (sensor_id, timestamp) counts it newly inserted.
+        """
+        self._listeners.append(callback)
+
+    def add_commit_hook(self, callback):
+        """
+        Registers `callback(cur, counts)` to run inside each batch's
+        transaction just before it commits, with the counts it inserted.
+        If it raises, the batch fails (and is spooled) like any write error.
+        """
+        self._commit_hooks.append(callback)
+
+    def set_fence(self, fence):
+        """
+        Sets `fence(cur)`, called inside every transaction that writes
+        counts just before it commits. It raises to refuse the write (e.g.
+        this process no longer holds the leader lock); the batch is then
+        spooled like any failed write.
+        """
+        self._fence = fence
+
+    # -----------------------------------------------------------------
+    # Lifecycle
+    # -----------------------------------------------------------------
+
+    def start(self):
+        """Starts the background writer thread (and the spool replayer)."""
+        if self._thread and self._thread.is_alive():
+            return
+        if self._spool is not None:
+            try:
+                self._spool.open()
+            except OSError as e:
+                logger.error(f"Cannot open count spool at {self._spool.directory}, running without it: {e}")
+                self._spool = None
+
+        self._thread = threading.Thread(target=self._run, name="ingestion-writer", daemon=True)
+        self._thread.start()
+        logger.info("Ingestion writer started.")
+
+        if self._spool is not None:
+            self._replay_stop.clear()
+            self._replay_thread = threading.Thread(target=self._replay_loop, name="spool-replayer", daemon=True)
+            self._replay_thread.start()
+
+    def stop(self, timeout: float = 10.0):
+        """Stops the writer thread after flushing (or spooling) everything still queued."""
+        if self._replay_thread:
+            self._replay_stop.set()
+            self._replay_thread.join(timeout)
+            self._replay_thread = None
+        if not self._thread:
+            return
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+        if self._thread.is_alive():
+            logger.error("Ingestion writer did not stop in time; pending items may be lost.")
+        else:
+            logger.info("Ingestion writer stopped and flushed.")
+        self._thread = None
+        if self._spool is not None:
+            self._spool.close()
+
+    def is_running(self) -> bool:
+        return bool(self._thread and self._thread.is_alive())
+
+    def get_stats(self) -> dict:
+        """Returns a snapshot of the pipeline counters."""
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats["queue_depth"] = self._queue.qsize()
+        stats["queue_capacity"] = self._queue.maxsize
+        stats["running"] = self.is_running()
+        stats["spool"] = self._spool.get_stats() if self._spool is not None else None
+        return stats
+
+    # -----------------------------------------------------------------
+    # Writer thread
+    # -----------------------------------------------------------------
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            counts, events = [], []
+            deadline = None
+
+            while len(counts) + len(events) < self._batch_size:
+                timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+                try:
+                    item = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    break  # Flush interval elapsed
+
+                if item is _STOP:
+                    stopping = True
+                    break
+
+                if deadline is None:
+                    # The flush window starts with the first item of the batch
+                    deadline = time.monotonic() + self._flush_interval_s
+
+                if item[0] == _KIND_COUNT:
+                    counts.append(item[1])
+                else:
+                    events.append(item[1])
+
+            if stopping:
+                # Drain whatever producers managed to enqueue before shutdown
+                self._drain_into(counts, events)
+
+            if counts or events:
+                self._flush(counts, events)
+
+    def _drain_into(self, counts: list, events: list):
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                return
+            if item is _STOP:
+                continue
+            if item[0] == _KIND_COUNT:
+                counts.append(item[1])
+            else:
+                events.append(item[1])
+
+    def _flush(self, counts: list, events: list):
+        """Writes one batch of counts and events in a single transaction."""
+        if self._spool is not None and time.monotonic() < self._db_retry_at:
+            # The database just failed; don't make every batch wait on it again
+            self._spill(counts, events)
+            return
+
+        started = time.perf_counter()
+        try:
+            self._write(counts, events)
+        except Exception as e:
+            logger.error(f"Failed to flush ingestion batch ({len(counts)} counts, {len(events)} events): {e}")
+            if not isinstance(e, _DATA_ERRORS):
+                # Only an unreachable database makes later batches skip it
+                self._db_retry_at = time.monotonic() + self._replay_interval_s
+            with self._stats_lock:
+                self._stats["batches_failed"] += 1
+            self._spill(counts, events)
+            return
+
+        elapsed_s = time.perf_counter() - started
+        elapsed_ms = elapsed_s * 1000
+        _WRITE_SECONDS.observe(elapsed_s)
+        _BATCH_SIZE.observe(len(counts) + len(events))
+        with self._stats_lock:
+            self._stats["counts_written"] += len(counts)
+            self._stats["events_written"] += len(events)
+            self._stats["batches_flushed"] += 1
+            self._stats["last_batch_size"] = len(counts) + len(events)
+            self._stats["last_flush_ms"] = round(elapsed_ms, 3)
+            self._stats["last_flush_at"] = datetime.now(timezone.utc)
+        if counts:
+            logger.info(f"Flushed {len(counts)} count(s) and {len(events)} event(s) in {elapsed_ms:.1f} ms.")
+
+    def _write(self, counts: list, events: list) -> list:
+        """
+        Inserts counts and events in one transaction and notifies listeners.
+        Returns the (sensor_id, timestamp) counts that were not already stored.
+        """
+        inserted = []
+        months = set()
+        with get_db_connection() as conn:
+            try:
+                with conn.cursor() as cur:
+                    if counts:
+                        months = self._ensure_partitions(cur, counts)
+                        inserted = execute_values(
+                            cur,
+                            _INSERT_COUNTS_SQL,
+                            counts,
+                            template=_INSERT_COUNTS_TEMPLATE,
+                            page_size=self._batch_size,
+                            fetch=True,
+                        )
+                    if events:
+                        execute_values(
+                            cur,
+                            'INSERT INTO system_logs (level, message, source, "timestamp", occurrences) VALUES %s',
+                            events,
+                            page_size=self._batch_size,
+                        )
+                    if counts and self._fence is not None:
+                        self._fence(cur)
+                    if inserted:
+                        for hook in self._commit_hooks:
+                            hook(cur, inserted)
+                with self.commit_lock:
+                    conn.commit()
+                    self._notify(inserted)
+            except Exception:
+                conn.rollback()
+                raise
+        # Only trust partitions created by a committed transaction
+        self._partition_months.update(months)
+        return inserted
+
+    def _spill(self, counts: list, events: list):
+        """Saves counts from an unwritable batch to the spool. Events are dropped."""
+        spooled = False
+        if counts and self._spool is not None:
+            try:
+                self._spool.append(counts)
+                spooled = True
+            except OSError as e:
+                logger.error(f"Failed to spool {len(counts)} count(s): {e}")
+        with self._stats_lock:
+            self._stats["events_lost"] += len(events)
+            if spooled:
+                self._stats["counts_spooled"] += len(counts)
+            else:
+                self._stats["counts_lost"] += len(counts)
+
+    # -----------------------------------------------------------------
+    # Spool replayer thread
+    # -----------------------------------------------------------------
+
+    def _replay_loop(self):
+        while not self._replay_stop.wait(self._replay_interval_s):
+            if self._spool.pending:
+                self._replay()
+
+    def _replay(self):
+        """Loads spooled counts into the database, oldest segment first."""
+        for path in self._spool.sealed_segments():
+            records = self._spool.read(path)
+            inserted = 0
+            try:
+                for i in range(0, len(records), self._batch_size):
+                    if self._replay_stop.is_set():
+                        return
+                    inserted += len(self._write(records[i:i + self._batch_size], []))
+            except _DATA_ERRORS as e:
+                # The database is up but rejects this segment: retrying it
+                # forever would hold back every later one
+                with self._stats_lock:
+                    self._stats["replay_failures"] += 1
+                rejections = self._replay_rejections.get(path, 0) + 1
+                if rejections < _DEAD_LETTER_AFTER:
+                    self._replay_rejections[path] = rejections
+                    logger.warning(f"Spool segment {path} rejected ({rejections}/{_DEAD_LETTER_AFTER}): {e}")
+                    continue
+                self._replay_rejections.pop(path, None)
+                try:
+                    target = self._spool.dead_letter(path, len(records))
+                except OSError as move_error:
+                    logger.error(f"Cannot move rejected spool segment {path} aside: {move_error}")
+                    return
+                with self._stats_lock:
+                    self._stats["replay_dead_letters"] += 1
+                logger.error(
+                    f"Spool segment rejected {rejections} times, moved to {target} "
+                    f"({len(records)} count(s) not replayed): {e}"
+                )
+                continue
+            except Exception as e:
+                # Committed chunks are skipped by event_uid on the next attempt
+                logger.warning(f"Spool replay failed, will retry in {self._replay_interval_s:.0f}s: {e}")
+                self._db_retry_at = time.monotonic() + self._replay_interval_s
+                with self._stats_lock:
+                    self._stats["replay_failures"] += 1
+                return
+
+            self._replay_rejections.pop(path, None)
+            self._spool.discard(path, len(records))
+            self._db_retry_at = 0.0
+            with self._stats_lock:
+                self._stats["counts_replayed"] += inserted
+                self._stats["replay_duplicates"] += len(records) - inserted
+            logger.info(f"Replayed {inserted} spooled count(s) from {path} ({len(records) - inserted} already stored).")
+
+    def _notify(self, counts: list):
+        if not counts:
+            return
+        for callback in self._listeners:
+            try:
+                callback(counts)
+            except Exception as e:
+                logger.error(f"Ingestion listener {callback!r} failed: {e}")
+
+    def _ensure_partitions(self, cur, counts: list) -> set:
+        """Creates the monthly partitions a batch needs, once per month."""
+        months = {(ts.year, ts.month) for _, _, ts in counts} - self._partition_months
+        if not months:
+            return months
+        timestamps = [ts for _, _, ts in counts]
+        cur.execute(
+            "SELECT ensure_pizza_counts_partitions(%s, %s + INTERVAL '1 month')",
+            (min(timestamps), max(timestamps))
+        )
+        return months
+
+    def _bump(self, key: str):
+        with self._stats_lock:
+            self._stats[key] += 1
+            if key.endswith("_enqueued"):
+                depth = self._queue.qsize()
+                if depth > self._stats["queue_high_watermark"]:
+                    self._stats["queue_high_watermark"] = depth
@@ -0,0 +1,134 @@
+# back-end/app/services/leader.py
+
+import logging
+import threading
+
+from psycopg2 import InterfaceError, OperationalError
+
+from app.db.session import open_dedicated_connection
+
+logger = logging.getLogger(__name__)
+
+
+class LeadershipLost(Exception):
+    """A write was refused because this process does not hold the leader lock."""
+
+
+class LeaderLock:
+    """
+    Leader election on a Postgres session-level advisory lock, held on a
+    dedicated connection for as long as the leader runs.
+
+    If that connection drops (e.g. a Postgres restart), the lock is gone
+    with it, and a standby may take it. The leader keeps consuming (an
+    unreachable database is what the count spool is for) and re-takes the
+    lock when it can; only if another instance took it in the meantime
+    must it step down. Writes are fenced on the lock (`fence`), so a
+    demoted leader cannot commit counts alongside the new one before its
+    next check notices.
+    """
+
+    def __init__(self, key: int, retry_interval_s: float = 5.0):
+        self.key = key
+        self.retry_interval_s = retry_interval_s
+        self._conn = None
+        self._pid = None  # Backend pid of the session holding the lock
+        self.held = False
+        self.taken_over = False  # Another instance holds the lock: step down
+
+    def acquire(self, stop: threading.Event) -> bool:
+        """
+        Blocks until the lock is taken (True) or `stop` is set (False),
+        retrying every `retry_interval_s` while another instance leads or
+        the database is unreachable.
+        """
+        waiting_logged = False
+        while not stop.is_set():
+            try:
+                if self._try_lock():
+                    logger.info("Acquired the ingester leader lock.")
+                    return True
+                if not waiting_logged:
+                    logger.info("Another ingester holds the leader lock; standing by.")
+                    waiting_logged = True
+            except (OperationalError, InterfaceError) as e:
+                logger.warning(f"Cannot reach the database for leader election, retrying: {e}")
+            stop.wait(self.retry_interval_s)
+        return False
+
+    def check(self) -> bool:
+        """
+        Returns False once another instance is confirmed to hold the lock
+        (and sets `taken_over`): step down. While the database cannot be
+        reached it returns True, so consuming goes on; until the lock is
+        re-taken, `fence` refuses the writes and the counts are spooled.
+        """
+        try:
+            if self._conn is not None and not self._conn.closed:
+                with self._conn.cursor() as cur:
+                    cur.execute("SELECT 1")
+                if self.held:
+                    return True
+            if self._try_lock():
+                logger.info("Re-acquired the ingester leader lock after a lost connection.")
+                return True
+            logger.error("Another ingester took the leader lock.")
+            self.taken_over = True
+            return False
+        except (OperationalError, InterfaceError) as e:
+            if self.held:
+                logger.warning(f"Lost the leader lock connection; spooling counts until it is re-acquired: {e}")
+            self._close()
+            return True
+
+    def fence(self, cur):
+        """
+        Raises LeadershipLost unless the lock is still held by this
+        instance's session. Called in the writer's transaction before it
+        commits, on the writer's own (pooled) connection.
+        """
+        pid = self._pid
+        if pid is None:
+            raise LeadershipLost("This ingester does not hold the leader lock; not writing counts.")
+        # A bigint advisory key is listed as classid (high half), objid (low half), objsubid 1
+        cur.execute(
+            """
+            SELECT EXISTS (
+                SELECT 1 FROM pg_locks
+                WHERE locktype = 'advisory' AND granted AND pid = %s
+                  AND classid::BIGINT = %s AND objid::BIGINT = %s AND objsubid = 1
+            )
+            """,
+            (pid, (self.key >> 32) & 0xFFFFFFFF, self.key & 0xFFFFFFFF),
+        )
+        if not cur.fetchone()[0]:
+            raise LeadershipLost("The leader lock was lost; not writing counts.")
+
+    def release(self):
+        """Releases the lock (closing its session)."""
+        if self.held:
+            logger.info("Released the ingester leader lock.")
+        self._close()
+
+    def _try_lock(self) -> bool:
+        if self._conn is None or self._conn.closed:
+            self._conn = open_dedicated_connection()
+            self._conn.autocommit = True
+        with self._conn.cursor() as cur:
+            cur.execute("SELECT pg_try_advisory_lock(%s), pg_backend_pid()", (self.key,))
+            self.held, pid = cur.fetchone()
+        if not self.held:
+            self._close()
+            return False
+        self._pid = pid
+        return True
+
+    def _close(self):
+        self.held = False
+        self._pid = None
+        if self._conn is not None:
+            try:
+                self._conn.close()
+            except Exception:
+                pass
+            self._conn = None
@@ -0,0 +1,225 @@
+# back-end/app/services/live_stats.py
+
+import logging
+import threading
+from contextlib import nullcontext
+from datetime import datetime, timezone
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from app.db.session import get_db_connection
+
+logger = logging.getLogger(__name__)
+
+
+class _SensorCounters:
+    __slots__ = ("total", "today", "last_ts")
+
+    def __init__(self, total: int = 0, today: int = 0, last_ts: datetime | None = None):
+        self.total = total
+        self.today = today
+        self.last_ts = last_ts
+
+
+class LiveCounterCache:
+    """
+    In-memory totals behind /v1/counts/statistics.
+
+    Seeded from the rollup tables, then advanced by the ingestion writer
+    after every committed batch. "Today" rolls over at local midnight in the
+    `timezone` system setting, and a background thread periodically
+    re-reads the database to correct any drift.
+
+    `consistency_lock` should be the lock the writer holds around
+    commit + notify. A reseed holds it only while taking its database
+    snapshot; batches committed after that are buffered and replayed onto
+    the fresh counters, so none is missed or double-counted.
+    """
+
+    def __init__(self, reconcile_interval_s: float = 300.0, consistency_lock=None):
+        self._reconcile_interval_s = reconcile_interval_s
+        self._consistency_lock = consistency_lock or nullcontext()
+        self._lock = threading.Lock()
+        self._sensors: dict[str, _SensorCounters] = {}
+        self._tz = ZoneInfo("UTC")
+        self._day = None
+        self._seeded = False
+        self._reconcile_lock = threading.Lock()
+        self._deltas: list | None = None  # Batches committed during a reconcile
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+        self.last_reconciled_at: datetime | None = None
+
+    # -----------------------------------------------------------------
+    # Lifecycle
+    # -----------------------------------------------------------------
+
+    def start(self):
+        """Seeds the cache and starts the periodic reconciliation thread."""
+        try:
+            self.reconcile()
+        except Exception as e:
+            logger.error(f"Failed to seed live counters, will retry: {e}")
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="live-stats-reconciler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def is_seeded(self) -> bool:
+        return self._seeded
+
+    @property
+    def tz(self) -> ZoneInfo:
+        """The `timezone` system setting, as read on the last reconcile."""
+        return self._tz
+
+    def _run(self):
+        # Retry quickly until the first successful seed, then settle
+        while not self._stop.wait(self._reconcile_interval_s if self._seeded else 5.0):
+            try:
+                self.reconcile()
+            except Exception as e:
+                logger.error(f"Live counter reconciliation failed: {e}")
+
+    # -----------------------------------------------------------------
+    # Updates
+    # -----------------------------------------------------------------
+
+    def record_batch(self, counts: list[tuple[str, datetime]]):
+        """Applies a committed batch of (sensor_id, timestamp) counts."""
+        with self._lock:
+            if self._deltas is not None:
+                self._deltas.append(counts)  # Replayed onto the reconciled counters
+            self._apply(counts)
+
+    def _apply(self, counts: list[tuple[str, datetime]]):
+        """Caller holds the lock."""
+        today = self._roll_over()
+        for sensor_id, ts in counts:
+            sensor = self._sensors.get(sensor_id)
+            if sensor is None:
+                sensor = self._sensors[sensor_id] = _SensorCounters()
+            sensor.total += 1
+            if ts.astimezone(self._tz).date() == today:
+                sensor.today += 1
+            if sensor.last_ts is None or ts > sensor.last_ts:
+                sensor.last_ts = ts
+
+    def reconcile(self):
+        """Replaces the in-memory counters with the values in the database."""
+        with self._reconcile_lock:
+            try:
+                with get_db_connection() as conn:
+                    with conn.cursor() as cur:
+                        cur.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ")
+                        # The first query takes the snapshot every later one reads
+                        with self._consistency_lock:
+                            cur.execute("SELECT system_timezone()")
+                            with self._lock:
+                                self._deltas = []
+                        tz = self._load_timezone(cur.fetchone()[0])
+                        today = datetime.now(tz).date()
+
+                        cur.execute("""
+                            SELECT sensor_id,
+                                   SUM(total_counts),
+                                   SUM(total_counts) FILTER (WHERE day = %s)
+                            FROM pizza_counts_daily
+                            GROUP BY sensor_id
+                        """, (today,))
+                        totals = cur.fetchall()
+
+                        # Find each sensor's newest hour in the rollup, then the
+                        # exact timestamp inside it via (sensor_id, timestamp).
+                        cur.execute("""
+                            SELECT h.sensor_id,
+                                   (SELECT MAX(c."timestamp") FROM pizza_counts c
+                                    WHERE c.sensor_id = h.sensor_id AND c."timestamp" >= h.last_bucket)
+                            FROM (
+                                SELECT sensor_id, MAX(bucket) AS last_bucket
+                                FROM pizza_counts_hourly
+                                GROUP BY sensor_id
+                            ) h
+                        """)
+                        last_seen = dict(cur.fetchall())
+                    conn.rollback()
+            except Exception:
+                with self._lock:
+                    self._deltas = None
+                raise
+
+            sensors = {
+                sensor_id: _SensorCounters(int(total or 0), int(today_count or 0), last_seen.get(sensor_id))
+                for sensor_id, total, today_count in totals
+            }
+            with self._lock:
+                deltas, self._deltas = self._deltas, None
+                previous = self._sensors
+                self._tz = tz
+                self._day = today
+                self._sensors = sensors
+                # Committed after the snapshot
+                for counts in deltas:
+                    self._apply(counts)
+                drift = self._drift(previous) if self._seeded else 0
+                self._seeded = True
+                self.last_reconciled_at = datetime.now(timezone.utc)
+
+        if drift:
+            logger.warning(f"Live counters drifted by {drift} count(s); reconciled with database.")
+
+    # -----------------------------------------------------------------
+    # Reads
+    # -----------------------------------------------------------------
+
+    def get(self, sensor_id: str | None = None) -> dict | None:
+        """
+        Returns total/today/last-timestamp counters for one sensor or all of
+        them, or None while the cache has not been seeded yet.
+        """
+        if not self._seeded:
+            return None
+        with self._lock:
+            self._roll_over()
+            if sensor_id is not None:
+                selected = [self._sensors[sensor_id]] if sensor_id in self._sensors else []
+            else:
+                selected = list(self._sensors.values())
+            last_ts = max((s.last_ts for s in selected if s.last_ts), default=None)
+            return {
+                "total_counts": sum(s.total for s in selected),
+                "counts_today": sum(s.today for s in selected),
+                "last_count_timestamp": last_ts,
+            }
+
+    # -----------------------------------------------------------------
+    # Internals
+    # -----------------------------------------------------------------
+
+    def _roll_over(self):
+        """Resets today's counters after local midnight. Caller holds the lock."""
+        today = datetime.now(self._tz).date()
+        if today != self._day:
+            for sensor in self._sensors.values():
+                sensor.today = 0
+            self._day = today
+        return today
+
+    def _drift(self, previous: dict) -> int:
+        """Counts the reconciled totals differ from `previous` by. Caller holds the lock."""
+        current = sum(s.total for s in self._sensors.values())
+        return current - sum(s.total for s in previous.values())
+
+    @staticmethod
+    def _load_timezone(name: str | None) -> ZoneInfo:
+        try:
+            return ZoneInfo(name or "UTC")
+        except (ZoneInfoNotFoundError, ValueError):
+            logger.warning(f"Unknown timezone '{name}' in system_settings, using UTC.")
+            return ZoneInfo("UTC")
@@ -0,0 +1,325 @@
+# back-end/app/services/maintenance.py
+
+import logging
+import re
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+from app.db.session import get_db_connection
+
+logger = logging.getLogger(__name__)
+
+# Only one replica runs maintenance at a time (pg_try_advisory_lock key)
+_ADVISORY_LOCK_KEY = 0x7465726d  # "term"
+
+_PARTITION_NAME = re.compile(r"^pizza_counts_(\d{4})_(\d{2})$")
+
+# Defaults for settings missing from system_settings
+_DEFAULTS = {
+    "log_retention_days": 30,
+    "cleanup_interval_hours": 24,
+    "raw_count_retention_days": 0,  # 0 keeps raw counts forever
+    "event_uid_retention_days": 7,
+}
+
+# Tables vacuumed on every run: the rollups are rewritten by every batch
+_VACUUM_TABLES = ("pizza_counts_hourly", "pizza_counts_daily")
+
+
+class MaintenanceScheduler:
+    """
+    Background database maintenance, configured through `system_settings`:
+
+    - deletes `system_logs` rows older than `log_retention_days`, in small
+      batches so the writer is never blocked for long;
+    - forgets saved event_uids (`pizza_count_events`) older than
+      `event_uid_retention_days`, the same way;
+    - drops monthly `pizza_counts` partitions entirely older than
+      `raw_count_retention_days` (0 = never). Their counts stay in the
+      hourly/daily rollups; a partition whose rollup does not match its raw
+      rows is kept and reported;
+    - vacuums/analyzes the tables it touched, plus the rollups and the
+      partitioned parent (which autovacuum never analyzes).
+
+    Runs every `cleanup_interval_hours`; the last run is recorded in
+    `system_settings`, so restarts don't cause extra runs.
+    """
+
+    def __init__(self, delete_batch_size: int = 5000, startup_delay_s: float = 300.0,
+                 poll_interval_s: float = 60.0, on_report=None):
+        self._delete_batch_size = delete_batch_size
+        self._startup_delay_s = startup_delay_s
+        self._poll_interval_s = poll_interval_s
+        self._on_report = on_report
+        self._run_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+        self.next_run_at: datetime | None = None
+        self.last_report: dict | None = None
+
+    # -----------------------------------------------------------------
+    # Lifecycle
+    # -----------------------------------------------------------------
+
+    def start(self):
+        """Starts the scheduler thread."""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="maintenance-scheduler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=10)
+            self._thread = None
+
+    @property
+    def running(self) -> bool:
+        return self._run_lock.locked()
+
+    def _run(self):
+        if self._stop.wait(self._startup_delay_s):
+            return
+        while True:
+            try:
+                if self.next_run_at is None:
+                    self.next_run_at = self._read_next_run_at()
+                if datetime.now(timezone.utc) >= self.next_run_at:
+                    self.run_once()
+            except Exception as e:
+                logger.error(f"Maintenance scheduling failed: {e}")
+            if self._stop.wait(self._poll_interval_s):
+                return
+
+    def _read_next_run_at(self) -> datetime:
+        with get_db_connection() as conn:
+            with conn.cursor() as cur:
+                settings = _read_settings(cur)
+            conn.rollback()
+        last_run = settings.get("maintenance_last_run")
+        if not last_run:
+            return datetime.now(timezone.utc)
+        return datetime.fromisoformat(last_run) + timedelta(hours=_int_setting(settings, "cleanup_interval_hours"))
+
+    # -----------------------------------------------------------------
+    # Maintenance run
+    # -----------------------------------------------------------------
+
+    def run_once(self) -> dict | None:
+        """
+        Runs every maintenance task now and returns the report, or None if
+        a run is already in progress (here or on another replica).
+        """
+        if not self._run_lock.acquire(blocking=False):
+            return None
+        try:
+            report = self._run_tasks()
+        finally:
+            self._run_lock.release()
+        if report is not None:
+            report["summary"] = _summarize(report)
+            self.last_report = report
+            logger.info(f"Maintenance finished: {report['summary']}")
+            if self._on_report is not None:
+                self._on_report(report)
+        return report
+
+    def _run_tasks(self) -> dict | None:
+        started = time.perf_counter()
+        report = {
+            "started_at": datetime.now(timezone.utc),
+            "duration_ms": 0.0,
+            "logs_deleted": 0,
+            "event_uids_deleted": 0,
+            "partitions_dropped": [],
+            "partitions_kept": [],
+            "counts_pruned": 0,
+            "vacuumed": [],
+            "errors": [],
+        }
+        with get_db_connection() as conn:
+            conn.autocommit = True  # VACUUM cannot run in a transaction block
+            try:
+                with conn.cursor() as cur:
+                    cur.execute("SELECT pg_try_advisory_lock(%s)", (_ADVISORY_LOCK_KEY,))
+                    if not cur.fetchone()[0]:
+                        logger.info("Maintenance is already running on another instance; skipping.")
+                        return None
+                    try:
+                        settings = _read_settings(cur)
+                        self._run_step(report, "log retention", self._delete_old_logs, cur,
+                                       _int_setting(settings, "log_retention_days"))
+                        self._run_step(report, "event_uid retention", self._delete_old_event_uids, cur,
+                                       _int_setting(settings, "event_uid_retention_days"))
+                        raw_days = _int_setting(settings, "raw_count_retention_days")
+                        if raw_days > 0:
+                            self._run_step(report, "raw count pruning", self._prune_raw_counts, cur, raw_days)
+                        self._run_step(report, "vacuum", self._vacuum, cur)
+
+                        now = datetime.now(timezone.utc)
+                        cur.execute(
+                            """
+                            INSERT INTO system_settings (key, value, description)
+                            VALUES ('maintenance_last_run', %s, 'Last automatic maintenance run')
+                            ON CONFLICT (key) DO UPDATE SET value = EXCLUDED.value
+                            """,
+                            (now.isoformat(),),
+                        )
+                        self.next_run_at = now + timedelta(hours=_int_setting(settings, "cleanup_interval_hours"))
+                    finally:
+                        cur.execute("SELECT pg_advisory_unlock(%s)", (_ADVISORY_LOCK_KEY,))
+            finally:
+                if not conn.closed:
+                    conn.autocommit = False
+        report["duration_ms"] = round((time.perf_counter() - started) * 1000, 3)
+        return report
+
+    def _run_step(self, report: dict, name: str, step, cur, *args):
+        """Runs one task; a failure is reported and does not stop the others."""
+        try:
+            step(report, cur, *args)
+        except Exception as e:
+            logger.error(f"Maintenance step '{name}' failed: {e}")
+            report["errors"].append(f"{name}: {e}")
+
+    def _delete_old_logs(self, report: dict, cur, retention_days: int):
+        """Deletes expired logs oldest first, one short transaction per batch."""
+        cutoff = datetime.now(timezone.utc) - timedelta(days=retention_days)
+        while not self._stop.is_set():
+            cur.execute(
+                """
+                DELETE FROM system_logs
+                WHERE id IN (
+                    SELECT id FROM system_logs
+                    WHERE "timestamp" < %s
+                    ORDER BY "timestamp"
+                    LIMIT %s
+                )
+                """,
+                (cutoff, self._delete_batch_size),
+            )
+            report["logs_deleted"] += cur.rowcount
+            if cur.rowcount < self._delete_batch_size:
+                return
+            time.sleep(0.05)  # Leave room for the ingestion writer
+
+    def _delete_old_event_uids(self, report: dict, cur, retention_days: int):
+        """Deletes expired dedupe entries in batches, like the logs."""
+        cutoff = datetime.now(timezone.utc) - timedelta(days=retention_days)
+        while not self._stop.is_set():
+            cur.execute(
+                """
+                DELETE FROM pizza_count_events
+                WHERE event_uid IN (
+                    SELECT event_uid FROM pizza_count_events
+                    WHERE saved_at < %s
+                    LIMIT %s
+                )
+                """,
+                (cutoff, self._delete_batch_size),
+            )
+            report["event_uids_deleted"] += cur.rowcount
+            if cur.rowcount < self._delete_batch_size:
+                return
+            time.sleep(0.05)  # Leave room for the ingestion writer
+
+    def _prune_raw_counts(self, report: dict, cur, retention_days: int):
+        """Drops the oldest monthly partitions that are entirely past retention."""
+        cutoff = datetime.now(timezone.utc) - timedelta(days=retention_days)
+        cur.execute(
+            """
+            SELECT c.relname
+            FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+            WHERE i.inhparent = 'pizza_counts'::regclass
+            """
+        )
+        months = []
+        for (name,) in cur.fetchall():
+            match = _PARTITION_NAME.match(name)
+            if match:
+                start = datetime(int(match[1]), int(match[2]), 1, tzinfo=timezone.utc)
+                end = datetime(start.year + start.month // 12, start.month % 12 + 1, 1, tzinfo=timezone.utc)
+                months.append((start, end, name))
+
+        # Oldest first, stopping at the first partition that must stay, so
+        # everything before the pruning horizon is gone
+        for start, end, name in sorted(months):
+            if end > cutoff:
+                return
+            cur.execute(f'SELECT COUNT(*) FROM "{name}"')
+            raw = cur.fetchone()[0]
+            cur.execute(
+                "SELECT COALESCE(SUM(total_counts), 0) FROM pizza_counts_hourly WHERE bucket >= %s AND bucket < %s",
+                (start, end),
+            )
+            rolled_up = cur.fetchone()[0]
+            if raw != rolled_up:
+                logger.warning(
+                    f"Keeping {name}: {raw} raw count(s) but {rolled_up} in the hourly rollup. "
+                    f"Rebuild its rollups (rebuild_count_rollups) before it can be pruned."
+                )
+                report["partitions_kept"].append(name)
+                return
+
+            cur.execute("BEGIN")
+            try:
+                cur.execute("SET LOCAL lock_timeout = '5s'")
+                cur.execute(f'ALTER TABLE pizza_counts DETACH PARTITION "{name}"')
+                cur.execute(f'DROP TABLE "{name}"')
+                # Rollup rebuilds must not touch the buckets whose raw counts are gone
+                cur.execute(
+                    """
+                    INSERT INTO system_settings (key, value, description)
+                    VALUES ('raw_counts_pruned_before', %s, 'Raw counts before this time were pruned')
+                    ON CONFLICT (key) DO UPDATE SET value = EXCLUDED.value
+                    """,
+                    (end.isoformat(),),
+                )
+                cur.execute("COMMIT")
+            except Exception:
+                cur.execute("ROLLBACK")
+                raise
+            report["partitions_dropped"].append(name)
+            report["counts_pruned"] += raw
+
+    def _vacuum(self, report: dict, cur):
+        tables = list(_VACUUM_TABLES)
+        if report["logs_deleted"]:
+            tables.append("system_logs")
+        if report["event_uids_deleted"]:
+            tables.append("pizza_count_events")
+        for table in tables:
+            cur.execute(f"VACUUM (ANALYZE) {table}")
+            report["vacuumed"].append(table)
+        # Autovacuum analyzes partitions but never the partitioned parent
+        cur.execute("ANALYZE pizza_counts")
+        report["vacuumed"].append("pizza_counts (analyze)")
+
+
+def _read_settings(cur) -> dict:
+    cur.execute("SELECT key, value FROM system_settings")
+    return dict(cur.fetchall())
+
+
+def _int_setting(settings: dict, key: str) -> int:
+    try:
+        return int(settings.get(key) or _DEFAULTS[key])
+    except ValueError:
+        logger.warning(f"Invalid system setting {key}={settings.get(key)!r}, using {_DEFAULTS[key]}.")
+        return _DEFAULTS[key]
+
+
+def _summarize(report: dict) -> str:
+    summary = (
+        f"{report['logs_deleted']} log(s) and {report['event_uids_deleted']} expired event_uid(s) deleted, "
+        f"{len(report['partitions_dropped'])} partition(s) dropped ({report['counts_pruned']} raw counts), "
+        f"{len(report['vacuumed'])} table(s) vacuumed/analyzed in {report['duration_ms']:.0f} ms"
+    )
+    if report["partitions_kept"]:
+        summary += f"; kept {', '.join(report['partitions_kept'])} (rollup mismatch)"
+    if report["errors"]:
+        summary += f"; errors: {'; '.join(report['errors'])}"
+    return summary
@@ -1,71 +1,217 @@
 # back-end/app/services/mqtt_client.py
 
 import paho.mqtt.client as mqtt
-import json
+import asyncio
 import logging
 import time
 import os
-from psycopg2 import Error
+import uuid
+from datetime import datetime, timezone
+from typing import NamedTuple
 
 from app.core.config import settings
-from app.db.session import get_db_connection
+from app.core.metrics import counter_family, gauge_family, MetricFamily, registry
+from app.services.change_feed import ChangeListener, ChangeNotifier
+from app.services.count_batches import CountBatchTracker
+from app.services.event_bus import EventBroadcaster
+from app.services.event_capture import EventCapture
+from app.services.event_log import SystemEventLog
+from app.services.ingestion import IngestionPipeline
+from app.services.live_stats import LiveCounterCache
+from app.services.maintenance import MaintenanceScheduler
+from app.services.mqtt_transport import AsyncioMqttTransport
+from app.services.payloads import parse_count_batch, parse_state_payload
+from app.services.query_cache import grafana_cache, analytics_cache
+from app.services.recent_index import RecentCountIndex
+from app.services.sensor_registry import SensorRegistry
+from app.services.spool import CountSpool
 
 logger = logging.getLogger(__name__)
 
-# Module-level state for the MQTT client
+# Module-level state for the MQTT consumer (all touched only on the event loop)
 _client = None
-_last_state = "unknown"
-_last_transition_ms = 0
-_initialized = False
-_DEBOUNCE_MS = 100  # Ignore state transitions faster than this (in ms)
+_transport: AsyncioMqttTransport | None = None
+_inbox: asyncio.Queue | None = None
+_consumer: asyncio.Task | None = None
+
+# Live fan-out of counts and state changes to WebSocket/SSE clients
+event_bus = EventBroadcaster(
+    max_subscribers=settings.STREAM_MAX_SUBSCRIBERS,
+    queue_size=settings.STREAM_QUEUE_SIZE,
+)
+
+def _publish_state_change(sensor_id: str, state: str, now_ms: int):
+    event = {
+        "type": "state",
+        "sensor_id": sensor_id,
+        "state": state,
+        "timestamp": datetime.fromtimestamp(now_ms / 1000, tz=timezone.utc).isoformat(),
+    }
+    event_bus.publish(event)
+    change_notifier.publish(event)
+
+# One independent edge detector per sensor (keyed by payload 'id' or topic)
+_sensors = SensorRegistry(
+    debounce_ms=settings.SENSOR_DEBOUNCE_MS,
+    idle_ttl_s=settings.SENSOR_IDLE_TTL_S,
+    on_state_change=_publish_state_change,
+    reorder_window=settings.SENSOR_REORDER_WINDOW,
+)
+
+# Optional record of every normalized state message, for offline recounts (app.recount)
+event_capture = EventCapture(
+    settings.EVENT_CAPTURE_DIR,
+    segment_max_bytes=settings.EVENT_CAPTURE_SEGMENT_MAX_BYTES,
+    max_total_bytes=settings.EVENT_CAPTURE_MAX_BYTES,
+    flush_interval_s=settings.EVENT_CAPTURE_FLUSH_INTERVAL_S,
+) if settings.EVENT_CAPTURE_ENABLED else None
+
+# Devices in edge-count mode send batched deltas with a cumulative total.
+# With a shared subscription other replicas see the batches in between, so
+# a jump in the total is not a lost batch.
+_edge_sensors = CountBatchTracker(
+    idle_ttl_s=settings.SENSOR_IDLE_TTL_S,
+    recover_gaps=not settings.MQTT_SHARE_GROUP,
+    max_batch_counts=settings.EDGE_BATCH_MAX_COUNTS,
+)
+
+# Namespace for deterministic event_uids of sequenced device events
+_EVENT_NAMESPACE = uuid.UUID("6b1d3c1e-5f7a-4c1e-9a57-3f2e8d0c7b41")
+
+_MESSAGES = registry.counter(
+    "terelina_mqtt_messages_total",
+    "MQTT messages taken off the inbox, by kind (state or counts).",
+    ("kind",),
+)
+_MESSAGES_IGNORED = registry.counter(
+    "terelina_mqtt_messages_ignored_total",
+    "MQTT messages dropped because their payload could not be parsed.",
+    ("topic",),
+)
+_COUNTS_SAVED = registry.counter(
+    "terelina_counts_saved_total",
+    "Counts committed to the database, by sensor.",
+    ("sensor_id",),
+)
 
 # =====================================================================
 # Database Interaction
 # =====================================================================
 
+# Buffered writer that takes counts and events off the MQTT network thread
+_pipeline = IngestionPipeline(
+    max_queue_size=settings.INGEST_QUEUE_SIZE,
+    batch_size=settings.INGEST_BATCH_SIZE,
+    flush_interval_ms=settings.INGEST_FLUSH_INTERVAL_MS,
+    enqueue_timeout_ms=settings.INGEST_ENQUEUE_TIMEOUT_MS,
+    spool=CountSpool(
+        settings.SPOOL_DIR,
+        segment_max_bytes=settings.SPOOL_SEGMENT_MAX_BYTES,
+        fsync=settings.SPOOL_FSYNC,
+    ) if settings.SPOOL_ENABLED else None,
+    replay_interval_s=settings.SPOOL_REPLAY_INTERVAL_S,
+)
+
+# Live totals for /v1/counts/statistics, advanced after every committed batch
+live_counters = LiveCounterCache(
+    reconcile_interval_s=settings.LIVE_STATS_RECONCILE_S,
+    consistency_lock=_pipeline.commit_lock,
+)
+_pipeline.add_listener(live_counters.record_batch)
+
+# Recent count timestamps for the dashboards, advanced after every committed batch
+recent_counts = RecentCountIndex(
+    horizon_s=settings.RECENT_INDEX_HOURS * 3600,
+    consistency_lock=_pipeline.commit_lock,
+)
+_pipeline.add_listener(recent_counts.record_batch)
+
+def _publish_counts(counts: list):
+    """Publishes one count event per sensor for a committed batch."""
+    per_sensor: dict[str, list] = {}
+    for sensor_id, ts in counts:
+        per_sensor.setdefault(sensor_id, []).append(ts)
+    for sensor_id, timestamps in per_sensor.items():
+        live = live_counters.get(sensor_id) or {}
+        event_bus.publish({
+            "type": "count",
+            "sensor_id": sensor_id,
+            "count": len(timestamps),
+            "timestamp": max(timestamps).isoformat(),
+            "counts_today": live.get("counts_today"),
+        })
+
+_pipeline.add_listener(_publish_counts)
+
+def _invalidate_cached_queries(counts: list):
+    """Drops cached Grafana and analytics results whose window covers any newly saved count."""
+    timestamps = [ts.timestamp() for _, ts in counts]
+    grafana_cache.invalidate_range(min(timestamps), max(timestamps))
+    analytics_cache.invalidate_range(min(timestamps), max(timestamps))
+
+_pipeline.add_listener(_invalidate_cached_queries)
+
+def _record_saved_counts(counts: list):
+    per_sensor: dict[str, int] = {}
+    for sensor_id, _ in counts:
+        per_sensor[sensor_id] = per_sensor.get(sensor_id, 0) + 1
+    for sensor_id, n in per_sensor.items():
+        _COUNTS_SAVED.inc(sensor_id, amount=n)
+
+_pipeline.add_listener(_record_saved_counts)
+
+# Coalesced, rate-limited feed of the system_logs table (through the batch writer)
+system_events = SystemEventLog(
+    _pipeline.submit_event,
+    flush_interval_s=settings.SYSTEM_LOG_FLUSH_INTERVAL_S,
+    per_minute={
+        "INFO": settings.SYSTEM_LOG_INFO_PER_MIN,
+        "WARNING": settings.SYSTEM_LOG_WARNING_PER_MIN,
+        "ERROR": settings.SYSTEM_LOG_ERROR_PER_MIN,
+    },
+    info_sample_rate=settings.SYSTEM_LOG_INFO_SAMPLE_RATE,
+)
+
 def _log_system_event(level: str, message: str, source: str = "mqtt"):
-    """Logs an event into the system_logs table."""
-    try:
-        with get_db_connection() as conn:
-            with conn.cursor() as cur:
-                cur.execute(
-                    "INSERT INTO system_logs (level, message, source) VALUES (%s, %s, %s)",
-                    (level.upper(), message, source)
-                )
-                conn.commit()
-    except Exception as e:
-        logger.error(f"Failed to log system event to DB: {e}")
-
-def _handle_pizza_count(sensor_id: str):
-    """Inserts a new pizza count record into the database."""
-    try:
-        # get_db_connection() uses the connection pool
-        with get_db_connection() as conn:
-            with conn.cursor() as cur:
-                # The timestamp is handled by the database's NOW() function
-                cur.execute("INSERT INTO pizza_counts (timestamp) VALUES (NOW())")
-                conn.commit()
-
-        logger.info(f"Pizza count saved! Sensor ID: {sensor_id}")
-        _log_system_event("INFO", f"Pizza counted from sensor: {sensor_id}")
-
-    except Error as e:
-        logger.error(f"PostgreSQL error while saving count: {e}")
-        _log_system_event("ERROR", f"PostgreSQL error on save: {e}")
-    except Exception as e:
-        logger.error(f"Unexpected error while saving count: {e}")
-        _log_system_event("ERROR", f"Unexpected error on save: {e}")
+    """Records an event for the system_logs table."""
+    system_events.log(level, message, source)
+
+def _log_maintenance_report(report: dict):
+    level = "WARNING" if report["errors"] or report["partitions_kept"] else "INFO"
+    system_events.log(level, f"Maintenance: {report['summary']}", "system")
+
+# Retention, partition pruning and VACUUM/ANALYZE, as set in system_settings
+maintenance = MaintenanceScheduler(
+    delete_batch_size=settings.MAINTENANCE_DELETE_BATCH,
+    startup_delay_s=settings.MAINTENANCE_STARTUP_DELAY_S,
+    on_report=_log_maintenance_report,
+)
+
+async def _save_count(sensor_id: str, detected_at: float | None = None, event_uid: str | None = None):
+    """Hands a count to the batch writer, waiting (without blocking the loop) while it is backed up."""
+    # Counts are tracked by terelina_counts_saved_total, not by a system_logs row each
+    if await _pipeline.submit_count_async(sensor_id, detected_at or time.time(), event_uid):
+        logger.info("Pizza count queued! Sensor ID: %s", sensor_id)
 
 # =====================================================================
-# MQTT Callbacks
+# MQTT Callbacks (run on the event loop)
 # =====================================================================
 
+def _subscription(topic: str) -> str:
+    """Returns the topic filter to subscribe to, shared across replicas if configured."""
+    if settings.MQTT_SHARE_GROUP:
+        return f"$share/{settings.MQTT_SHARE_GROUP}/{topic}"
+    return topic
+
 def _on_connect(client, userdata, flags, rc, properties=None):
     """Callback for when the client connects to the broker."""
     if rc == 0:
         logger.info(f"Successfully connected to MQTT broker at {settings.MQTT_BROKER_HOST}")
         _log_system_event("INFO", "MQTT client connected")
-        client.subscribe(settings.MQTT_TOPIC_STATE, qos=1)
+        client.subscribe([
+            (_subscription(settings.MQTT_TOPIC_STATE), 1),
+            (_subscription(settings.MQTT_TOPIC_COUNTS), 1),
+        ])
     else:
         logger.error(f"Failed to connect to MQTT broker, return code: {rc}")
         _log_system_event("ERROR", f"MQTT connection failed (code: {rc})")
@@ -76,124 +222,357 @@ def _on_disconnect(client, userdata, rc, properties=None):
         logger.warning(f"Unexpected MQTT disconnection. Code: {rc}. Will attempt to reconnect.")
         _log_system_event("WARNING", f"Unexpected MQTT disconnection (code: {rc})")
 
-def _normalize_state(raw_state: str) -> str | None:
-    """Normalizes the received state to 'interrupted' or 'clear'."""
-    if raw_state is None:
-        return None
-    s = str(raw_state).strip().lower()
-    if s.startswith("interrompid") or s.startswith("interrupted"):
-        return "interrupted"
-    if s == "livre" or s == "clear":
-        return "clear"
-    return None
+class _Inbound(NamedTuple):
+    topic: str
+    payload: bytes
+    received_ms: int
 
 def _on_message(client, userdata, msg):
-    """Callback for when a message is received from the broker."""
-    global _last_state, _initialized, _last_transition_ms
-
-    try:
-        payload_str = msg.payload.decode(errors="ignore")
-        logger.debug(f"Message received on topic {msg.topic}: {payload_str}")
+    """
+    Callback for when a message is received from the broker. Only queues it
+    for the consumer stage; once the inbox is full, the transport stops
+    reading so that the broker holds further messages.
+    """
+    _inbox.put_nowait(_Inbound(msg.topic, msg.payload, time.time_ns() // 1_000_000))
+    if _inbox.qsize() >= settings.MQTT_INBOX_SIZE:
+        _transport.pause_reading()
 
-        if not payload_str:
-            logger.debug("Empty payload received, ignoring.")
-            return
-
-        data = json.loads(payload_str)
-
-        # --- Hardening: JSON must be an object/dict ---
-        if not isinstance(data, dict):
-            logger.warning(f"Message ignored: JSON is not an object/dict: {data!r}")
-            return
-
-        state = _normalize_state(data.get("state"))
-        if not state:
-            logger.warning(f"Message ignored: missing or invalid 'state' field in JSON: {data}")
-            return
+# =====================================================================
+# Consumer Stage (parse + per-sensor state machines)
+# =====================================================================
 
-        sensor_id = data.get("id", "ESP32_Barrier_001")
-        now_ms = int(time.time() * 1000)
+_warned_unsequenced_shared = False
+
+async def _process_state_message(message: _Inbound):
+    """Runs a beam state message through its sensor's state machine."""
+    global _warned_unsequenced_shared
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Message received on topic %s: %r", message.topic, message.payload)
+
+    parsed = parse_state_payload(message.topic, message.payload)
+    if parsed is None:
+        _MESSAGES_IGNORED.inc(message.topic)
+        return
+    sensor_id, state, seq, boot, device_ms, device_ts_ms = parsed
+
+    if seq is None and settings.MQTT_SHARE_GROUP and not _warned_unsequenced_shared:
+        _warned_unsequenced_shared = True
+        logger.warning(
+            "Unsequenced state messages with a shared subscription: a replica only sees part "
+            "of each sensor's edges, so counts will be wrong. Update the firmware or unset MQTT_SHARE_GROUP."
+        )
 
-        # Debounce to prevent false positives from sensor flickering
-        if _last_transition_ms and (now_ms - _last_transition_ms) < _DEBOUNCE_MS:
-            logger.debug(f"State transition ignored due to debounce. New state: {state}")
-            # NOTE: do NOT update _last_state here; keep the previous stable state.
+    # --- Core Logic: Detect product on state transition ---
+    # A product is counted when the beam goes from 'interrupted' to 'clear'.
+    event_ms = _sensors.process(
+        sensor_id, state, message.received_ms,
+        seq=seq,
+        boot=boot,
+        device_ms=device_ms,
+        device_ts_ms=device_ts_ms,
+    )
+
+    # Optional capture comes after counting and can never drop a count
+    if event_capture is not None:
+        event_capture.record(sensor_id, state, message.received_ms, seq, boot, device_ms, device_ts_ms)
+    if event_ms is not None:
+        logger.info("Product detected on %s (interrupted -> clear). Saving count.", sensor_id)
+        # Redelivered sequenced events map to the same event_uid
+        event_uid = str(uuid.uuid5(_EVENT_NAMESPACE, f"{sensor_id}/{boot}/{seq}")) if seq is not None else None
+        await _save_count(sensor_id, event_ms / 1000, event_uid)
+
+async def _process_count_batch(message: _Inbound):
+    """Expands a batched count delta from an edge-counting device."""
+    batch = parse_count_batch(message.topic, message.payload)
+    if batch is None:
+        _MESSAGES_IGNORED.inc(message.topic)
+        return
+
+    sensor_id = batch.sensor_id
+    counts = _edge_sensors.process(
+        sensor_id,
+        message.received_ms,
+        batch.count,
+        batch.total,
+        seq=batch.seq,
+        boot=batch.boot,
+        first_t_ms=batch.first_t_ms,
+        last_t_ms=batch.last_t_ms,
+        first_ts_ms=batch.first_ts_ms,
+        last_ts_ms=batch.last_ts_ms,
+    )
+    if len(counts) > batch.count:
+        logger.warning("Recovered %d count(s) from missed batches of %s.", len(counts) - batch.count, sensor_id)
+    for key, event_ms in counts:
+        # The cumulative index (and reset epoch) identifies a count across redeliveries
+        event_uid = str(uuid.uuid5(_EVENT_NAMESPACE, f"{sensor_id}/total/{key}"))
+        await _pipeline.submit_count_async(sensor_id, event_ms / 1000, event_uid)
+    if counts:
+        logger.info("Count batch from %s: %d count(s) queued (total %d).", sensor_id, len(counts), batch.total)
+
+# Topic -> "is a count batch topic", so wildcard matching runs once per topic
+_count_topics: dict[str, bool] = {}
+
+def _is_count_topic(topic: str) -> bool:
+    is_counts = _count_topics.get(topic)
+    if is_counts is None:
+        is_counts = mqtt.topic_matches_sub(settings.MQTT_TOPIC_COUNTS, topic)
+        if len(_count_topics) < 4096:
+            _count_topics[topic] = is_counts
+    return is_counts
+
+async def _consume():
+    """
+    Drains the inbox in arrival order (which keeps each sensor's messages in
+    order) until it receives the None sentinel.
+    """
+    while True:
+        message = await _inbox.get()
+        if message is None:
             return
-
-        # --- Core Logic: Detect product on state transition ---
-        # A product is counted when the beam goes from 'interrupted' to 'clear'.
-        if _last_state == "interrupted" and state == "clear":
-            logger.info("Product detected (interrupted -> clear). Saving count.")
-            _handle_pizza_count(sensor_id)
-
-        _last_state = state
-        _last_transition_ms = now_ms
-        _initialized = True
-
-    except json.JSONDecodeError:
-        logger.warning(f"Could not decode JSON from payload: {payload_str!r}")
-    except Exception as e:
-        logger.error(f"Error processing MQTT message: {e}")
+        if _transport.paused and _inbox.qsize() <= settings.MQTT_INBOX_SIZE // 2:
+            _transport.resume_reading()
+        try:
+            if _is_count_topic(message.topic):
+                _MESSAGES.inc("counts")
+                await _process_count_batch(message)
+            else:
+                _MESSAGES.inc("state")
+                await _process_state_message(message)
+        except Exception as e:
+            logger.error(f"Error processing MQTT message: {e}")
 
 # =====================================================================
 # Client Initialization
 # =====================================================================
 
-def start_mqtt_client():
-    """Initializes and starts the MQTT client."""
-    global _client
+async def start_mqtt_client():
+    """Starts the batch writer, the consumer stage and the MQTT connection on the running loop."""
+    global _client, _transport, _inbox, _consumer
     if _client:
         logger.warning("MQTT client already started.")
         return _client
 
-    try:
-        client_id = settings.MQTT_CLIENT_ID or f"terelina_backend_{os.getpid()}"
-
-        _client = mqtt.Client(client_id=client_id, protocol=mqtt.MQTTv311)
-
-        # --- Reconnect hardening (prevents reconnect storms) ---
-        _client.reconnect_delay_set(min_delay=1, max_delay=30)
-
-        if settings.MQTT_USERNAME and settings.MQTT_PASSWORD:
-            _client.username_pw_set(settings.MQTT_USERNAME, settings.MQTT_PASSWORD)
+    client_id = settings.MQTT_CLIENT_ID or f"terelina_backend_{os.getpid()}"
+    client = mqtt.Client(client_id=client_id, protocol=mqtt.MQTTv311)
+
+    if settings.MQTT_USERNAME and settings.MQTT_PASSWORD:
+        client.username_pw_set(settings.MQTT_USERNAME, settings.MQTT_PASSWORD)
+
+    client.on_connect = _on_connect
+    client.on_disconnect = _on_disconnect
+    client.on_message = _on_message
+
+    _pipeline.start()
+    system_events.start()
+    if event_capture is not None:
+        event_capture.start()
+    _inbox = asyncio.Queue()
+    _consumer = asyncio.create_task(_consume(), name="mqtt-consumer")
+
+    # --- Reconnect hardening (prevents reconnect storms) ---
+    _transport = AsyncioMqttTransport(
+        client,
+        settings.MQTT_BROKER_HOST,
+        settings.MQTT_BROKER_PORT,
+        keepalive=60,
+        min_reconnect_s=1,
+        max_reconnect_s=30,
+    )
+    logger.info(f"Connecting to MQTT broker: {settings.MQTT_BROKER_HOST}:{settings.MQTT_BROKER_PORT}")
+    await _transport.start()
+    _client = client
+    logger.info("MQTT consumer started.")
+    return _client
+
+async def stop_mqtt_client():
+    """Disconnects, processes every message already received and flushes the batch writer."""
+    global _client, _transport, _consumer
+    if _transport is not None:
+        logger.info("Stopping MQTT client...")
+        await _transport.stop()
+        _transport = None
+        logger.info("MQTT client stopped.")
 
-        _client.on_connect = _on_connect
-        _client.on_disconnect = _on_disconnect
-        _client.on_message = _on_message
+    if _consumer is not None:
+        await _inbox.put(None)
+        await _consumer
+        _consumer = None
+    _client = None
 
-        logger.info(f"Connecting to MQTT broker: {settings.MQTT_BROKER_HOST}:{settings.MQTT_BROKER_PORT}")
-        _client.connect(
-            settings.MQTT_BROKER_HOST,
-            settings.MQTT_BROKER_PORT,
-            keepalive=60
-        )
-        _client.loop_start()  # Starts a background thread for the client
-        logger.info("MQTT client started successfully.")
-        return _client
+    # Always flush buffered counts and events, even if the broker connection was lost
+    await asyncio.to_thread(system_events.stop)
+    await asyncio.to_thread(_pipeline.stop)
+    if event_capture is not None:
+        await asyncio.to_thread(event_capture.stop)
 
-    except Exception as e:
-        logger.error(f"Failed to start MQTT client: {e}")
-        _log_system_event("ERROR", f"Failed to start MQTT client: {e}")
-        raise
-
-def stop_mqtt_client():
-    """Stops the MQTT client gracefully."""
-    global _client
-    if _client and _client.is_connected():
-        logger.info("Stopping MQTT client...")
-        _client.loop_stop()
-        _client.disconnect()
-        logger.info("MQTT client stopped.")
+def fence_writes(fence):
+    """Makes every count batch call `fence(cur)` before it commits (see IngestionPipeline.set_fence)."""
+    _pipeline.set_fence(fence)
 
 def get_mqtt_status():
-    """Returns the current status of the MQTT client."""
+    """
+    Returns the current status of the MQTT client, or in INGEST_MODE=external
+    the last status heartbeat of the ingest process.
+    """
     if not _client:
-        return {"status": "not_initialized", "connected": False}
+        status = change_listener.ingester_status
+        if status is None:
+            return {"status": "not_initialized", "connected": False}
+        age_s = change_listener.ingester_age_s()
+        # No heartbeat time recorded yet counts as stale
+        fresh = age_s is not None and age_s < 3 * settings.INGEST_HEARTBEAT_S
+        return {**status, "status": "external" if fresh else "ingester_unavailable"}
 
     return {
         "status": "running",
         "connected": _client.is_connected(),
         "broker": f"{settings.MQTT_BROKER_HOST}:{settings.MQTT_BROKER_PORT}",
-        "subscribed_topic": settings.MQTT_TOPIC_STATE,
-        "last_sensor_state": _last_state
+        "subscribed_topic": _subscription(settings.MQTT_TOPIC_STATE),
+        "counts_topic": _subscription(settings.MQTT_TOPIC_COUNTS),
+        "inbox_depth": _inbox.qsize(),
+        "reading_paused": _transport.paused,
+        "last_sensor_state": _sensors.last_state(),
+        "sensors": _sensors.snapshot(),
+        "edge_sensors": _edge_sensors.snapshot(),
+        "ingestion": _pipeline.get_stats()
     }
+
+# =====================================================================
+# Change Feed (INGEST_MODE=external)
+# =====================================================================
+
+def _ingester_status() -> dict:
+    """The status heartbeat of the ingest process; per-sensor lists don't fit a NOTIFY."""
+    return {**get_mqtt_status(), "sensors": [], "edge_sensors": []}
+
+# Ingest process side, only started by app.ingest: committed counts are
+# notified in their own transaction, live events and status in the background
+change_notifier = ChangeNotifier(
+    settings.INGEST_NOTIFY_CHANNEL,
+    status_provider=_ingester_status,
+    heartbeat_s=settings.INGEST_HEARTBEAT_S,
+)
+_pipeline.add_commit_hook(change_notifier.notify_counts)
+
+def _resync_from_database():
+    """Catches up on changes that may have been missed while not listening."""
+    live_counters.reconcile()
+    if recent_counts.is_loaded():
+        recent_counts.load()
+    grafana_cache.clear()
+    analytics_cache.clear()
+
+# API side: applies the ingester's changes as if they were committed here
+change_listener = ChangeListener(
+    settings.INGEST_NOTIFY_CHANNEL,
+    on_event=event_bus.publish,
+    on_resync=_resync_from_database,
+)
+change_listener.add_listener(live_counters.record_batch)
+change_listener.add_listener(recent_counts.record_batch)
+change_listener.add_listener(_publish_counts)
+change_listener.add_listener(_invalidate_cached_queries)
+
+def _collect_metrics():
+    """Reads the consumer, sensor and ingestion figures at scrape time."""
+    families = []
+    sensors = _sensors.snapshot()
+    for key, name, documentation in (
+        ("messages", "terelina_sensor_messages_total", "State messages received, by sensor."),
+        ("debounced", "terelina_sensor_debounced_total", "State changes ignored as flicker, by sensor."),
+        ("duplicates", "terelina_sensor_duplicates_total", "Redelivered state messages dropped, by sensor."),
+        ("out_of_order", "terelina_sensor_out_of_order_total", "State messages that arrived late, by sensor."),
+        ("counts", "terelina_sensor_counts_total", "Products detected, by sensor."),
+    ):
+        families.append(counter_family(name, documentation, [({"sensor_id": s["sensor_id"]}, s[key]) for s in sensors]))
+    families.append(MetricFamily(
+        "terelina_sensor_gaps", "gauge", "Sequence numbers still missing, by sensor.",
+        [("", {"sensor_id": s["sensor_id"]}, s["gaps"]) for s in sensors],
+    ))
+    edge_sensors = _edge_sensors.snapshot()
+    families.append(counter_family(
+        "terelina_edge_sensor_counts_total", "Counts from edge-counting devices, by sensor and origin.",
+        [({"sensor_id": s["sensor_id"], "origin": "batch"}, s["counts"] - s["recovered"]) for s in edge_sensors]
+        + [({"sensor_id": s["sensor_id"], "origin": "recovered"}, s["recovered"]) for s in edge_sensors],
+    ))
+
+    stats = _pipeline.get_stats()
+    families += [
+        counter_family("terelina_ingest_counts_total", "Counts handled by the ingestion pipeline, by outcome.", [
+            ({"outcome": outcome}, stats[f"counts_{outcome}"])
+            for outcome in ("enqueued", "written", "rejected", "lost", "spooled", "replayed")
+        ]),
+        counter_family("terelina_ingest_events_total", "System events handled by the ingestion pipeline, by outcome.", [
+            ({"outcome": outcome}, stats[f"events_{outcome}"])
+            for outcome in ("enqueued", "written", "rejected", "lost")
+        ]),
+        counter_family("terelina_ingest_batches_total", "Ingestion batches, by result.", [
+            ({"result": "flushed"}, stats["batches_flushed"]),
+            ({"result": "failed"}, stats["batches_failed"]),
+        ]),
+        gauge_family("terelina_ingest_queue_depth", "Items waiting in the ingestion queue.", stats["queue_depth"]),
+        gauge_family("terelina_ingest_queue_capacity", "Capacity of the ingestion queue.", stats["queue_capacity"]),
+    ]
+    if stats["spool"] is not None:
+        families.append(gauge_family(
+            "terelina_spool_pending_counts", "Spooled counts not yet loaded into the database.",
+            stats["spool"]["pending_counts"],
+        ))
+
+    events = system_events.get_stats()
+    families.append(counter_family("terelina_system_events_total", "System log events, by outcome.", [
+        ({"outcome": "logged"}, events["events_logged"]),
+        ({"outcome": "coalesced"}, events["events_coalesced"]),
+        ({"outcome": "sampled_out"}, events["events_sampled_out"]),
+        ({"outcome": "rate_limited"}, events["events_rate_limited"]),
+    ]))
+
+    if event_capture is not None:
+        capture = event_capture.get_stats()
+        families.append(counter_family("terelina_event_capture_events_total", "Raw state messages captured, by outcome.", [
+            ({"outcome": "captured"}, capture["events_captured"]),
+            ({"outcome": "dropped"}, capture["events_dropped"]),
+        ]))
+
+    index = recent_counts.get_stats()
+    if index["loaded"]:
+        families += [
+            gauge_family("terelina_recent_index_counts", "Count timestamps held in the recent count index.",
+                         index["counts"]),
+            counter_family("terelina_recent_index_queries_total",
+                           "Dashboard queries, by whether the recent count index served them.", [
+                               ({"result": "served"}, index["queries_served"]),
+                               ({"result": "fallback"}, index["queries_fallback"]),
+                           ]),
+        ]
+
+    bus = event_bus.get_stats()
+    families += [
+        gauge_family("terelina_stream_subscribers", "Connected live stream clients.", bus["subscribers"]),
+        counter_family("terelina_stream_events_published_total", "Live stream events published.",
+                       [({}, bus["events_published"])]),
+        # Kept per subscriber, so these go down when clients disconnect
+        MetricFamily("terelina_stream_events_not_delivered", "gauge",
+                     "Events connected clients missed, by reason.", [
+                         ("", {"reason": "dropped"}, bus["events_dropped"]),
+                         ("", {"reason": "coalesced"}, bus["events_coalesced"]),
+                     ]),
+    ]
+
+    if _client is not None and _transport is not None:
+        families += [
+            gauge_family("terelina_mqtt_connected", "1 while connected to the MQTT broker.", _client.is_connected()),
+            gauge_family("terelina_mqtt_inbox_depth", "Received MQTT messages waiting to be processed.", _inbox.qsize()),
+            gauge_family("terelina_mqtt_reading_paused", "1 while reading from the broker is paused.", _transport.paused),
+        ]
+    elif settings.INGEST_MODE == "external":
+        families += [
+            gauge_family("terelina_change_feed_connected", "1 while listening for ingester changes.",
+                         change_listener.connected),
+            gauge_family("terelina_ingester_heartbeat_age_seconds", "Seconds since the last ingester status.",
+                         change_listener.ingester_age_s()),
+        ]
+    return families
+
+registry.register_collector(_collect_metrics)
@@ -0,0 +1,183 @@
+# back-end/app/services/mqtt_transport.py
+
+import asyncio
+import logging
+import socket
+import threading
+import time
+
+import paho.mqtt.client as mqtt
+
+from app.core.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+_CONNECT_ATTEMPTS = registry.counter(
+    "terelina_mqtt_connect_attempts_total",
+    "Connections (and reconnections) to the MQTT broker, by result.",
+    ("result",),
+)
+_DISCONNECTS = registry.counter(
+    "terelina_mqtt_disconnects_total",
+    "Closed MQTT broker connections.",
+)
+
+
+class AsyncioMqttTransport:
+    """
+    Drives a paho MQTT client from the asyncio event loop instead of paho's
+    own network thread.
+
+    The client's socket is registered with the loop, so every paho callback
+    runs on the loop thread. Reading can be paused to push back on the
+    broker while downstream stages catch up, and a supervisor task
+    reconnects with exponential backoff.
+    """
+
+    def __init__(self, client: mqtt.Client, host: str, port: int, keepalive: int = 60,
+                 min_reconnect_s: float = 1.0, max_reconnect_s: float = 30.0):
+        self.client = client
+        self.host = host
+        self.port = port
+        self.keepalive = keepalive
+        self.min_reconnect_s = min_reconnect_s
+        self.max_reconnect_s = max_reconnect_s
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._loop_thread_id: int | None = None
+        self._sock = None
+        self._reading = False
+        self._paused = False
+        self._misc_task: asyncio.Task | None = None
+        self._supervisor: asyncio.Task | None = None
+        self._disconnected: asyncio.Event | None = None
+        self._stopping = False
+
+        client.on_socket_open = self._on_socket_open
+        client.on_socket_close = self._on_socket_close
+        client.on_socket_register_write = self._on_socket_register_write
+        client.on_socket_unregister_write = self._on_socket_unregister_write
+
+    @property
+    def paused(self) -> bool:
+        return self._paused
+
+    # -----------------------------------------------------------------
+    # Lifecycle
+    # -----------------------------------------------------------------
+
+    async def start(self):
+        """Starts connecting (and reconnecting) in the background."""
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        self._disconnected = asyncio.Event()
+        self._stopping = False
+        self._supervisor = asyncio.create_task(self._supervise(), name="mqtt-supervisor")
+
+    async def stop(self, timeout: float = 5.0):
+        """Disconnects cleanly and stops reconnecting."""
+        self._stopping = True
+        if self._sock is not None:
+            self.client.disconnect()
+            try:
+                await asyncio.wait_for(self._disconnected.wait(), timeout)
+            except asyncio.TimeoutError:
+                logger.warning("MQTT broker did not acknowledge the disconnect in time.")
+        if self._supervisor is not None:
+            self._supervisor.cancel()
+            try:
+                await self._supervisor
+            except asyncio.CancelledError:
+                pass
+            self._supervisor = None
+
+    async def _supervise(self):
+        delay = self.min_reconnect_s
+        while not self._stopping:
+            self._disconnected.clear()
+            connected_at = time.monotonic()
+            try:
+                await self._connect()
+            except (OSError, ValueError) as e:
+                _CONNECT_ATTEMPTS.inc("failed")
+                logger.error(f"MQTT connection to {self.host}:{self.port} failed: {e}")
+            else:
+                _CONNECT_ATTEMPTS.inc("ok")
+                await self._disconnected.wait()
+                if self._stopping:
+                    return
+                # Only a connection that held up resets the backoff
+                if time.monotonic() - connected_at > self.max_reconnect_s:
+                    delay = self.min_reconnect_s
+            logger.info(f"Reconnecting to MQTT broker in {delay:.0f}s.")
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, self.max_reconnect_s)
+
+    async def _connect(self):
+        # DNS and the TCP handshake can block, so they run off the loop;
+        # socket callbacks from that thread are marshalled back onto it
+        await self._loop.run_in_executor(
+            None, lambda: self.client.connect(self.host, self.port, keepalive=self.keepalive)
+        )
+
+    # -----------------------------------------------------------------
+    # Flow control
+    # -----------------------------------------------------------------
+
+    def pause_reading(self):
+        """Stops reading from the broker; unread messages wait in the socket."""
+        self._paused = True
+        if self._sock is not None and self._reading:
+            self._loop.remove_reader(self._sock)
+            self._reading = False
+
+    def resume_reading(self):
+        self._paused = False
+        if self._sock is not None and not self._reading:
+            self._loop.add_reader(self._sock, self.client.loop_read)
+            self._reading = True
+
+    # -----------------------------------------------------------------
+    # paho socket callbacks
+    # -----------------------------------------------------------------
+
+    def _on_loop(self, func, *args):
+        if threading.get_ident() == self._loop_thread_id:
+            func(*args)
+        else:
+            self._loop.call_soon_threadsafe(func, *args)
+
+    def _on_socket_open(self, client, userdata, sock):
+        self._on_loop(self._socket_opened, sock)
+
+    def _socket_opened(self, sock):
+        self._sock = sock
+        if not self._paused:
+            self._loop.add_reader(sock, self.client.loop_read)
+            self._reading = True
+        self._misc_task = self._loop.create_task(self._misc_loop(), name="mqtt-misc")
+
+    def _on_socket_close(self, client, userdata, sock):
+        self._on_loop(self._socket_closed, sock)
+
+    def _socket_closed(self, sock):
+        if self._reading:
+            self._loop.remove_reader(sock)
+            self._reading = False
+        self._loop.remove_writer(sock)
+        if self._misc_task is not None:
+            self._misc_task.cancel()
+            self._misc_task = None
+        self._sock = None
+        _DISCONNECTS.inc()
+        self._disconnected.set()
+
+    def _on_socket_register_write(self, client, userdata, sock):
+        self._on_loop(self._loop.add_writer, sock, self.client.loop_write)
+
+    def _on_socket_unregister_write(self, client, userdata, sock):
+        self._on_loop(self._loop.remove_writer, sock)
+
+    async def _misc_loop(self):
+        # Keepalive pings and retries of unacknowledged QoS > 0 messages
+        while self.client.loop_misc() == mqtt.MQTT_ERR_SUCCESS:
+            await asyncio.sleep(1)
@@ -0,0 +1,245 @@
+# back-end/app/services/payloads.py
+
+import json
+import logging
+from typing import NamedTuple
+
+logger = logging.getLogger(__name__)
+
+# NOTE: this module is on the per-message hot path. Log calls use lazy
+# %-style arguments so nothing is formatted unless the level is enabled.
+
+_INTERRUPTED = "interrupted"
+_CLEAR = "clear"
+
+# Raw 'state' values sent by known firmware versions, mapped straight to the
+# normalized state; anything else takes the slower normalize path
+_STATE_LOOKUP: dict[str, str] = {}
+for _raw, _state in (
+    ("interrupted", _INTERRUPTED),
+    ("interrompido", _INTERRUPTED),
+    ("interrompida", _INTERRUPTED),
+    ("clear", _CLEAR),
+    ("livre", _CLEAR),
+):
+    for _variant in (_raw, _raw.upper(), _raw.capitalize()):
+        _STATE_LOOKUP[_variant] = _state
+
+def _reject_constant(name: str):
+    raise ValueError(f"{name} is not valid JSON")
+
+# Decoder whose C scanner is called directly (see _load_json). NaN and
+# Infinity are not JSON; rejecting them keeps them out of as_int
+_JSON_DECODER = json.JSONDecoder(parse_constant=_reject_constant)
+_scan_json = _JSON_DECODER.scan_once
+
+# Longest sensor id the database stores (pizza_counts.sensor_id VARCHAR(64))
+MAX_SENSOR_ID_LENGTH = 64
+
+# Whole plain-text payloads (the sensor is identified by its topic)
+_RAW_PAYLOADS = {raw.encode(): state for raw, state in _STATE_LOOKUP.items()}
+
+# State codes of the compact firmware payload
+_COMPACT_STATES = {b"I": _INTERRUPTED, b"C": _CLEAR}
+
+
+class StateMessage(NamedTuple):
+    """A parsed beam state message."""
+    sensor_id: str
+    state: str
+    seq: int | None = None
+    boot: str | None = None
+    device_ms: int | None = None
+    device_ts_ms: int | None = None
+
+
+class CountBatch(NamedTuple):
+    """A parsed count delta from an edge-counting device."""
+    sensor_id: str
+    count: int
+    total: int
+    seq: int | None = None
+    boot: str | None = None
+    first_t_ms: int | None = None
+    last_t_ms: int | None = None
+    first_ts_ms: int | None = None
+    last_ts_ms: int | None = None
+
+
+def normalize_state(raw_state) -> str | None:
+    """Normalizes the received state to 'interrupted' or 'clear'."""
+    if isinstance(raw_state, str):
+        state = _STATE_LOOKUP.get(raw_state)
+        if state is not None:
+            return state
+    elif raw_state is None:
+        return None
+    s = str(raw_state).strip().lower()
+    if s.startswith("interrompid") or s.startswith("interrupted"):
+        return _INTERRUPTED
+    if s == "livre" or s == "clear":
+        return _CLEAR
+    return None
+
+
+def valid_sensor_id(sensor_id: str) -> bool:
+    """
+    True if `sensor_id` can be stored: at most MAX_SENSOR_ID_LENGTH
+    characters and no control characters (NUL cannot be stored at all).
+    One bad id would otherwise fail the whole batch it is written in.
+    """
+    return 0 < len(sensor_id) <= MAX_SENSOR_ID_LENGTH and sensor_id.isprintable()
+
+
+def as_int(value) -> int | None:
+    """Returns `value` as an int if it is an integral, finite JSON number, else None."""
+    if value.__class__ is int:
+        return value
+    # is_integer() is False for inf and nan; bools are not numbers here
+    if value.__class__ is float and value.is_integer():
+        return int(value)
+    return None
+
+
+def _load_json(payload: bytes):
+    """
+    json.loads(payload) without its per-call overhead (encoding detection,
+    whitespace regexes): runs the C scanner on the UTF-8 text directly.
+    Anything it does not fully accept takes json.loads' own path, so
+    results and errors are the same. Trailing text may only be JSON
+    whitespace (space, tab, CR, LF), as in json.loads; str.isspace() would
+    also let through e.g. NBSP or \x1c. Raises ValueError for invalid JSON.
+    """
+    try:
+        text = payload.decode()
+        data, end = _scan_json(text, 0)
+        if not text[end:].strip(" \t\n\r"):
+            return data
+    except (ValueError, StopIteration):
+        pass
+    return _JSON_DECODER.decode(payload.decode(json.detect_encoding(payload), "surrogatepass"))
+
+
+def parse_state_payload(topic: str, payload: bytes) -> StateMessage | None:
+    """
+    Parses a beam state message. Accepted formats, cheapest first:
+
+    - plain text state, e.g. ``clear`` (sensor id = topic);
+    - compact firmware format ``<I|C>,<id>,<seq>,<boot>,<t_ms>[,<ts>]``;
+    - JSON object with 'state' and optional 'id', 'seq', 'boot', 't_ms', 'ts'.
+
+    Returns None (after logging why) for anything else.
+    """
+    if not payload:
+        logger.debug("Empty payload received on %s, ignoring.", topic)
+        return None
+
+    state = _RAW_PAYLOADS.get(payload)
+    if state is not None:
+        if not valid_sensor_id(topic):
+            logger.warning("Message ignored: invalid sensor id (topic) %r", topic)
+            return None
+        return StateMessage(topic, state)
+
+    if payload[1:2] == b",":
+        return _parse_compact(topic, payload)
+
+    try:
+        data = _load_json(payload)
+    except ValueError:
+        logger.warning("Could not decode JSON from payload: %r", payload)
+        return None
+
+    # --- Hardening: JSON must be an object/dict ---
+    if not isinstance(data, dict):
+        logger.warning("Message ignored: JSON is not an object/dict: %r", data)
+        return None
+
+    state = normalize_state(data.get("state"))
+    if not state:
+        logger.warning("Message ignored: missing or invalid 'state' field in JSON: %s", data)
+        return None
+
+    # Each sensor gets its own state machine; fall back to the topic
+    # so devices without an 'id' on distinct topics stay separate.
+    sensor_id = data.get("id") or topic
+    if sensor_id.__class__ is not str:
+        sensor_id = str(sensor_id)
+    if not valid_sensor_id(sensor_id):
+        logger.warning("Message ignored: invalid sensor id %r", sensor_id)
+        return None
+
+    # Newer firmware stamps each change with a per-boot sequence number,
+    # its uptime ('t_ms') and, once NTP has synced, wall-clock time ('ts')
+    seq = data.get("seq")
+    if seq is None:
+        return StateMessage(sensor_id, state)
+    boot = data.get("boot")
+    return StateMessage(
+        sensor_id,
+        state,
+        as_int(seq),
+        str(boot) if boot is not None else None,
+        as_int(data.get("t_ms")),
+        as_int(data.get("ts")),
+    )
+
+
+def _parse_compact(topic: str, payload: bytes) -> StateMessage | None:
+    parts = payload.split(b",")
+    state = _COMPACT_STATES.get(parts[0])
+    if state is None or len(parts) < 5:
+        logger.warning("Message ignored: malformed compact payload: %r", payload)
+        return None
+    try:
+        message = StateMessage(
+            parts[1].decode() or topic,
+            state,
+            int(parts[2]),
+            parts[3].decode(),
+            int(parts[4]),
+            int(parts[5]) if len(parts) > 5 and parts[5] else None,
+        )
+    except (ValueError, UnicodeDecodeError):
+        logger.warning("Message ignored: malformed compact payload: %r", payload)
+        return None
+    if not valid_sensor_id(message.sensor_id):
+        logger.warning("Message ignored: invalid sensor id %r", message.sensor_id)
+        return None
+    return message
+
+
+def parse_count_batch(topic: str, payload: bytes) -> CountBatch | None:
+    """Parses a JSON count batch; returns None (after logging why) if invalid."""
+    try:
+        data = _load_json(payload or b"null")
+    except ValueError:
+        logger.warning("Could not decode JSON from count batch: %r", payload)
+        return None
+    if not isinstance(data, dict):
+        logger.warning("Count batch ignored: JSON is not an object/dict: %r", data)
+        return None
+
+    count = as_int(data.get("count"))
+    total = as_int(data.get("total"))
+    if count is None or total is None or count < 0:
+        logger.warning("Count batch ignored: missing or invalid 'count'/'total': %s", data)
+        return None
+
+    sensor_id = str(data.get("id") or topic)
+    if not valid_sensor_id(sensor_id):
+        logger.warning("Count batch ignored: invalid sensor id %r", sensor_id)
+        return None
+
+    boot = data.get("boot")
+    return CountBatch(
+        sensor_id,
+        count,
+        total,
+        as_int(data.get("seq")),
+        str(boot) if boot is not None else None,
+        as_int(data.get("first_t_ms")),
+        as_int(data.get("last_t_ms")),
+        as_int(data.get("first_ts")),
+        as_int(data.get("last_ts")),
+    )
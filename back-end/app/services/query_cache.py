@@ -0,0 +1,152 @@
+# back-end/app/services/query_cache.py
+
+import threading
+import time
+from collections import OrderedDict
+
+from app.core.config import settings
+from app.core.metrics import counter_family, gauge_family, registry
+
+
+class _Entry:
+    __slots__ = ("value", "expires_at", "size", "start", "end")
+
+    def __init__(self, value, expires_at: float, size: int, start: float, end: float):
+        self.value = value
+        self.expires_at = expires_at
+        self.size = size
+        self.start = start
+        self.end = end
+
+
+class QueryCache:
+    """
+    Thread-safe LRU cache for query results, bounded by entry count and
+    approximate size in bytes.
+
+    Every entry records the time range (epoch seconds) its data covers, so
+    newly ingested counts only invalidate the entries they could change.
+    A generation counter keeps a query that raced with an invalidation from
+    storing its (possibly stale) result.
+    """
+
+    def __init__(self, max_bytes: int, max_entries: int):
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[tuple, _Entry]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._bytes = 0
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @property
+    def generation(self) -> int:
+        return self._generation
+
+    def get(self, key: tuple):
+        """Returns the cached value, or None on a miss or expired entry."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry.expires_at <= now:
+                if entry is not None:
+                    self._remove(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry.value
+
+    def put(self, key: tuple, value, ttl_s: float, size: int, start: float, end: float,
+            generation: int | None = None):
+        """
+        Stores a value covering [start, end). Skipped if `generation` is given
+        and an invalidation happened since it was read.
+        """
+        if size > self.max_bytes or ttl_s <= 0:
+            return
+        with self._lock:
+            if generation is not None and generation != self._generation:
+                return
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = _Entry(value, time.monotonic() + ttl_s, size, start, end)
+            self._bytes += size
+            while self._entries and (self._bytes > self.max_bytes or len(self._entries) > self.max_entries):
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def invalidate_range(self, start: float, end: float):
+        """Drops every entry whose covered range overlaps [start, end]."""
+        with self._lock:
+            self._generation += 1
+            stale = [k for k, e in self._entries.items() if e.start <= end and e.end > start]
+            for key in stale:
+                self._remove(key)
+            self.invalidations += len(stale)
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+            self._bytes = 0
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+    def _remove(self, key: tuple):
+        entry = self._entries.pop(key)
+        self._bytes -= entry.size
+
+
+# Shared cache for Grafana query results
+grafana_cache = QueryCache(
+    max_bytes=settings.GRAFANA_CACHE_MAX_BYTES,
+    max_entries=settings.GRAFANA_CACHE_MAX_ENTRIES,
+)
+
+# Count timestamps of closed days and closed shift summaries for /v1/analytics
+analytics_cache = QueryCache(
+    max_bytes=settings.ANALYTICS_CACHE_MAX_BYTES,
+    max_entries=settings.ANALYTICS_CACHE_MAX_ENTRIES,
+)
+
+
+def _cache_families(cache: QueryCache, name: str, label: str) -> list:
+    stats = cache.get_stats()
+    return [
+        counter_family(f"terelina_{name}_cache_lookups_total", f"{label} cache lookups.", [
+            ({"result": "hit"}, stats["hits"]),
+            ({"result": "miss"}, stats["misses"]),
+        ]),
+        counter_family(f"terelina_{name}_cache_removals_total", f"Entries dropped from the {label} cache.", [
+            ({"reason": "evicted"}, stats["evictions"]),
+            ({"reason": "invalidated"}, stats["invalidations"]),
+        ]),
+        gauge_family(f"terelina_{name}_cache_entries", f"Entries in the {label} cache.", stats["entries"]),
+        gauge_family(f"terelina_{name}_cache_bytes", f"Estimated size of the {label} cache.", stats["bytes"]),
+    ]
+
+
+def _collect_cache_metrics():
+    return (
+        _cache_families(grafana_cache, "grafana", "Grafana result")
+        + _cache_families(analytics_cache, "analytics", "Analytics")
+    )
+
+registry.register_collector(_collect_cache_metrics)
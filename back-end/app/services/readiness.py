@@ -0,0 +1,64 @@
+# back-end/app/services/readiness.py
+
+import logging
+import threading
+import time
+from typing import Callable
+
+logger = logging.getLogger(__name__)
+
+
+class Readiness:
+    """
+    Whether this worker should receive traffic, for the /ready probe.
+
+    Ready once every registered check passes (database reached, caches
+    warmed) and until shutdown begins. Unlike /health, answering it never
+    touches the database: the checks only read in-memory state.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._checks: dict[str, Callable[[], bool]] = {}
+        self._started = time.monotonic()
+        self._draining = False
+        self.warm_up_s: float | None = None
+
+    def add_check(self, name: str, check: Callable[[], bool]):
+        with self._lock:
+            self._checks[name] = check
+
+    def begin(self):
+        """Starts timing the warm-up (called when the application starts)."""
+        with self._lock:
+            self._started = time.monotonic()
+            self._draining = False
+            self.warm_up_s = None
+
+    def set_draining(self):
+        """Reports not ready from now on, so no new traffic arrives during shutdown."""
+        with self._lock:
+            self._draining = True
+
+    def status(self) -> dict:
+        """Returns {"ready", "status", "checks", "warm_up_s"}."""
+        with self._lock:
+            checks = dict(self._checks)
+            draining = self._draining
+        results = {name: bool(check()) for name, check in checks.items()}
+        ready = not draining and all(results.values())
+        if ready and self.warm_up_s is None:
+            self.warm_up_s = round(time.monotonic() - self._started, 3)
+            logger.info(f"Ready to serve traffic, {self.warm_up_s:.1f}s after startup.")
+        return {
+            "ready": ready,
+            "status": "draining" if draining else "ready" if ready else "warming_up",
+            "checks": results,
+            "warm_up_s": self.warm_up_s,
+        }
+
+    def is_ready(self) -> bool:
+        return self.status()["ready"]
+
+
+readiness = Readiness()
@@ -0,0 +1,282 @@
+# back-end/app/services/recent_index.py
+
+import bisect
+import logging
+import threading
+import time
+from array import array
+from contextlib import nullcontext
+from datetime import datetime, timedelta, timezone
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from app.db.session import get_db_connection
+
+logger = logging.getLogger(__name__)
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+_MS = timedelta(milliseconds=1)
+
+# Counts older than the horizon by this much are trimmed (not on every batch)
+_TRIM_SLACK_MS = 60_000
+
+
+def to_ms(ts: datetime) -> int:
+    """Exact epoch milliseconds of an aware datetime (floored)."""
+    return (ts - _EPOCH) // _MS
+
+
+class RecentCountIndex:
+    """
+    In-memory index of the count timestamps of the last `horizon_s`
+    seconds: one sorted `array('q')` of epoch milliseconds per sensor.
+
+    Range counts and bucketed histograms are answered with bisect (binary
+    searches per bucket edge, or binning only the counts in range when
+    those are fewer), so the dashboards' recent windows don't touch Postgres. Loaded from the
+    database on start, advanced by the ingestion writer after every
+    committed batch and trimmed as the horizon slides. Queries starting
+    before `covered_from_ms` must go to the database instead.
+
+    `consistency_lock` should be the lock the writer holds around
+    commit + notify. Loading holds it only while taking its database
+    snapshot; batches committed after that are buffered during the load
+    and replayed onto the new index, so none is missed or repeated.
+    """
+
+    def __init__(self, horizon_s: float = 72 * 3600, trim_interval_s: float = 60.0, consistency_lock=None):
+        self._horizon_ms = int(horizon_s * 1000)
+        self._trim_interval_s = trim_interval_s
+        self._consistency_lock = consistency_lock or nullcontext()
+        self._lock = threading.Lock()
+        self._sensors: dict[str, array] = {}
+        self._covered_from_ms: int | None = None  # None until loaded
+        self._load_lock = threading.Lock()
+        self._deltas: list | None = None  # Batches committed during a load
+        self._tz = ZoneInfo("UTC")
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._queries = {"served": 0, "fallback": 0}
+
+    # -----------------------------------------------------------------
+    # Lifecycle
+    # -----------------------------------------------------------------
+
+    def start(self):
+        """Starts the thread that loads the index (retrying) and then trims it."""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="recent-index", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def is_loaded(self) -> bool:
+        return self._covered_from_ms is not None
+
+    def _run(self):
+        while not self._stop.is_set():
+            if not self.is_loaded():
+                try:
+                    self.load()
+                except Exception as e:
+                    logger.error(f"Failed to load the recent count index, will retry: {e}")
+                    self._stop.wait(5.0)
+                    continue
+            self.trim()
+            self._stop.wait(self._trim_interval_s)
+
+    def load(self):
+        """Replaces the index with the counts inside the horizon, read from the database."""
+        started = time.perf_counter()
+        with self._load_lock:
+            cutoff_ms = int(time.time() * 1000) - self._horizon_ms
+            sensors: dict[str, array] = {}
+            try:
+                with get_db_connection() as conn:
+                    with conn.cursor() as cur:
+                        cur.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ")
+                        # The first query takes the snapshot every later one reads
+                        with self._consistency_lock:
+                            cur.execute("SELECT system_timezone()")
+                            with self._lock:
+                                self._deltas = []
+                        tz = self._load_timezone(cur.fetchone()[0])
+                    with conn.cursor(name="recent_index_load") as cur:
+                        cur.itersize = 50_000
+                        cur.execute(
+                            """
+                            SELECT sensor_id, FLOOR(EXTRACT(EPOCH FROM "timestamp") * 1000)::BIGINT
+                            FROM pizza_counts
+                            WHERE "timestamp" >= %s
+                            ORDER BY "timestamp"
+                            """,
+                            (datetime.fromtimestamp(cutoff_ms / 1000, tz=timezone.utc),),
+                        )
+                        for sensor_id, ts_ms in cur:
+                            timestamps = sensors.get(sensor_id)
+                            if timestamps is None:
+                                timestamps = sensors[sensor_id] = array("q")
+                            timestamps.append(ts_ms)
+                    conn.rollback()
+            except Exception:
+                with self._lock:
+                    self._deltas = None
+                raise
+            with self._lock:
+                deltas, self._deltas = self._deltas, None
+                self._sensors = sensors
+                self._tz = tz
+                self._covered_from_ms = cutoff_ms
+                # Committed after the snapshot
+                for counts in deltas:
+                    self._apply(counts)
+        total = sum(len(timestamps) for timestamps in sensors.values())
+        logger.info(
+            f"Recent count index loaded: {total} count(s) of {len(sensors)} sensor(s) "
+            f"in {(time.perf_counter() - started) * 1000:.0f} ms."
+        )
+
+    # -----------------------------------------------------------------
+    # Updates
+    # -----------------------------------------------------------------
+
+    def record_batch(self, counts: list[tuple[str, datetime]]):
+        """Adds a committed batch of (sensor_id, timestamp) counts."""
+        with self._lock:
+            if self._deltas is not None:
+                self._deltas.append(counts)  # Replayed onto the index being loaded
+            if self._covered_from_ms is not None:
+                self._apply(counts)
+
+    def _apply(self, counts: list[tuple[str, datetime]]):
+        """Caller holds the lock."""
+        for sensor_id, ts in counts:
+            ts_ms = to_ms(ts)
+            if ts_ms < self._covered_from_ms:
+                continue
+            timestamps = self._sensors.get(sensor_id)
+            if timestamps is None:
+                timestamps = self._sensors[sensor_id] = array("q")
+            if not timestamps or ts_ms >= timestamps[-1]:
+                timestamps.append(ts_ms)
+            else:
+                # Late (edge batches, spool replay): keep the array sorted
+                timestamps.insert(bisect.bisect_right(timestamps, ts_ms), ts_ms)
+
+    def trim(self):
+        """Drops counts that slid out of the horizon."""
+        if not self.is_loaded():
+            return
+        cutoff_ms = int(time.time() * 1000) - self._horizon_ms
+        with self._lock:
+            if cutoff_ms - self._covered_from_ms < _TRIM_SLACK_MS:
+                return
+            for sensor_id in list(self._sensors):
+                timestamps = self._sensors[sensor_id]
+                del timestamps[:bisect.bisect_left(timestamps, cutoff_ms)]
+                if not timestamps:
+                    del self._sensors[sensor_id]
+            self._covered_from_ms = cutoff_ms
+
+    # -----------------------------------------------------------------
+    # Queries
+    # -----------------------------------------------------------------
+
+    def covers(self, start: datetime) -> bool:
+        """True if every count from `start` on is in the index."""
+        covered = self._covered_from_ms is not None and to_ms(start) >= self._covered_from_ms
+        self._queries["served" if covered else "fallback"] += 1
+        return covered
+
+    @property
+    def tz(self) -> ZoneInfo:
+        """The `timezone` system setting, as read on load."""
+        return self._tz
+
+    def count_range(self, start: datetime, end: datetime, sensor_id: str | None = None) -> int:
+        """Number of counts in [start, end)."""
+        start_ms, end_ms = to_ms(start), to_ms(end)
+        with self._lock:
+            return sum(
+                bisect.bisect_left(timestamps, end_ms) - bisect.bisect_left(timestamps, start_ms)
+                for timestamps in self._select(sensor_id)
+            )
+
+    def histogram(self, start: datetime, end: datetime, step_s: int, sensor_id: str | None = None) -> list[tuple[int, int]]:
+        """
+        Counts per `step_s` bucket in [start, end), as (bucket start ms,
+        count) pairs; buckets are aligned to the epoch and empty ones are
+        left out, like the SQL time series.
+        """
+        step_ms = step_s * 1000
+        start_ms, end_ms = to_ms(start), to_ms(end)
+        first = start_ms // step_ms * step_ms
+        n_buckets = -(-(end_ms - first) // step_ms)
+        totals: dict[int, int] = {}
+        with self._lock:
+            for timestamps in self._select(sensor_id):
+                lo = bisect.bisect_left(timestamps, start_ms)
+                hi = bisect.bisect_left(timestamps, end_ms)
+                if lo == hi:
+                    continue
+                if hi - lo <= n_buckets:
+                    # Fewer counts than buckets (e.g. 1 s buckets): bin the counts
+                    for ts_ms in timestamps[lo:hi]:
+                        bucket = ts_ms // step_ms * step_ms
+                        totals[bucket] = totals.get(bucket, 0) + 1
+                    continue
+                # Otherwise one binary search per bucket edge
+                prev, bucket = lo, first
+                for edge in range(first + step_ms, end_ms, step_ms):
+                    pos = bisect.bisect_left(timestamps, edge, prev, hi)
+                    if pos > prev:
+                        totals[bucket] = totals.get(bucket, 0) + pos - prev
+                    prev, bucket = pos, edge
+                if hi > prev:
+                    totals[bucket] = totals.get(bucket, 0) + hi - prev
+        return sorted(totals.items())
+
+    def first_last(self, start: datetime, end: datetime, sensor_id: str | None = None) -> tuple[int, int] | None:
+        """Epoch ms of the first and last count in [start, end), or None if there is none."""
+        start_ms, end_ms = to_ms(start), to_ms(end)
+        first = last = None
+        with self._lock:
+            for timestamps in self._select(sensor_id):
+                lo = bisect.bisect_left(timestamps, start_ms)
+                hi = bisect.bisect_left(timestamps, end_ms)
+                if lo < hi:
+                    first = timestamps[lo] if first is None else min(first, timestamps[lo])
+                    last = timestamps[hi - 1] if last is None else max(last, timestamps[hi - 1])
+        return None if first is None else (first, last)
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            return {
+                "loaded": self._covered_from_ms is not None,
+                "sensors": len(self._sensors),
+                "counts": sum(len(timestamps) for timestamps in self._sensors.values()),
+                "covered_from_ms": self._covered_from_ms,
+                "queries_served": self._queries["served"],
+                "queries_fallback": self._queries["fallback"],
+            }
+
+    def _select(self, sensor_id: str | None) -> list[array]:
+        """The arrays a query reads. Caller holds the lock."""
+        if sensor_id is None:
+            return list(self._sensors.values())
+        timestamps = self._sensors.get(sensor_id)
+        return [timestamps] if timestamps is not None else []
+
+    @staticmethod
+    def _load_timezone(name: str | None) -> ZoneInfo:
+        try:
+            return ZoneInfo(name or "UTC")
+        except (ZoneInfoNotFoundError, ValueError):
+            logger.warning(f"Unknown timezone '{name}' in system_settings, using UTC.")
+            return ZoneInfo("UTC")
+
@@ -0,0 +1,184 @@
+# back-end/app/services/recount.py
+
+import numpy as np
+
+from app.services.event_capture import NONE, STATE_CLEAR, STATE_INTERRUPTED
+
+_HOUR_MS = 3_600_000
+
+# Same limit as the sensor registry: device clocks further ahead are not trusted
+_MAX_FUTURE_SKEW_MS = 60_000
+
+
+def recount(events: np.ndarray, debounce_values: list[int], idle_ttl_ms: int = 3_600_000) -> dict:
+    """
+    Replays captured state messages through the SensorRegistry edge
+    detector once per debounce value, vectorised. Returns, per value, the
+    (sensor id, event ms) of every count plus the debounced message total:
+
+        {debounce_ms: {"sensor": ndarray, "event_ms": ndarray, "debounced": int}}
+
+    Like the live consumer, messages carrying a `seq` are deduplicated and
+    judged against their predecessor in device order, others in arrival
+    order, and a sensor forgotten after `idle_ttl_ms` starts over. Sequence
+    duplicates are dropped however old (live: within the reorder window).
+    """
+    results = {d: {"sensor": [], "event_ms": [], "debounced": 0} for d in debounce_values}
+    if len(events):
+        epoch, restart = _sensor_epochs(events, idle_ttl_ms)
+        order = np.arange(len(events))
+        sequenced = events["seq"] != NONE
+        if (~sequenced).any():
+            _recount_arrival(events[~sequenced], epoch[~sequenced], restart[~sequenced], debounce_values, results)
+        if sequenced.any():
+            _recount_sequenced(events[sequenced], epoch[sequenced], order[sequenced], debounce_values, results)
+    for result in results.values():
+        sensors = np.concatenate(result["sensor"]) if result["sensor"] else np.empty(0, dtype=np.uint32)
+        event_ms = np.concatenate(result["event_ms"]) if result["event_ms"] else np.empty(0, dtype=np.int64)
+        by_time = np.argsort(event_ms, kind="stable")
+        result["sensor"], result["event_ms"] = sensors[by_time], event_ms[by_time]
+    return results
+
+
+def _sensor_epochs(events: np.ndarray, idle_ttl_ms: int) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Numbers each life of a sensor's state machine. The registry forgets a
+    sensor when any message arrives `idle_ttl_ms` after the sensor's last
+    one, so a message starts a new epoch if the message before it (of any
+    sensor) came that long after the sensor's previous message.
+    """
+    arrival = events["arrival_ms"]
+    seen = np.maximum.accumulate(arrival)
+    by_sensor = np.argsort(events["sensor"], kind="stable")
+    sensor = events["sensor"][by_sensor]
+    restart = np.ones(len(events), dtype=bool)
+    previous_any = seen[by_sensor[1:] - 1]  # Message processed just before, any sensor
+    restart[1:] = (sensor[1:] != sensor[:-1]) | (previous_any - arrival[by_sensor[:-1]] >= idle_ttl_ms)
+    epoch = np.empty(len(events), dtype=np.int64)
+    epoch[by_sensor] = np.cumsum(restart)
+    restarted = np.empty(len(events), dtype=bool)
+    restarted[by_sensor] = restart
+    return epoch, restarted
+
+
+def _recount_arrival(events: np.ndarray, epoch: np.ndarray, restart: np.ndarray,
+                     debounce_values: list[int], results: dict):
+    """Legacy payloads: accepted when at least `debounce` ms after the last accepted message."""
+    by_epoch = np.argsort(epoch, kind="stable")  # Keeps arrival order per sensor
+    sensor = events["sensor"][by_epoch]
+    t = events["arrival_ms"][by_epoch]
+    state = events["state"][by_epoch]
+    restart = restart[by_epoch]
+    n = len(t)
+
+    gap = np.zeros(n, dtype=np.int64)
+    gap[1:] = t[1:] - t[:-1]
+
+    for debounce in debounce_values:
+        # A message at least `debounce` after its predecessor is always
+        # accepted; only the bursts in between need a sequential walk
+        accepted = restart | (gap >= debounce)
+        burst = np.flatnonzero(~accepted)
+        last_accepted, prev = 0, -2
+        for i in burst.tolist():
+            if i != prev + 1:
+                last_accepted = t[i - 1]  # Just before the burst, accepted
+            if t[i] - last_accepted >= debounce:
+                accepted[i] = True
+                last_accepted = t[i]
+            prev = i
+
+        kept = np.flatnonzero(accepted)
+        counted = np.zeros(len(kept), dtype=bool)
+        counted[1:] = (
+            (state[kept[1:]] == STATE_CLEAR)
+            & (state[kept[:-1]] == STATE_INTERRUPTED)
+            & ~restart[kept[1:]]
+        )
+        hits = kept[counted]
+        results[debounce]["sensor"].append(sensor[hits])
+        results[debounce]["event_ms"].append(t[hits])
+        results[debounce]["debounced"] += int(n - len(kept))
+
+
+def _running_min_per_group(values: np.ndarray, group_start: np.ndarray) -> np.ndarray:
+    """Running minimum restarting at every `group_start` (rows sorted by group)."""
+    group = np.cumsum(group_start)
+    # Later groups are shifted far below earlier ones, so their minimum never leaks back
+    shift = (group * (1 << 43)).astype(np.int64)
+    return np.minimum.accumulate(values - shift) + shift
+
+
+def _recount_sequenced(events: np.ndarray, epoch: np.ndarray, arrival_order: np.ndarray,
+                       debounce_values: list[int], results: dict):
+    """Sequenced payloads: a clear counts if its predecessor was an interrupted `debounce` ms earlier."""
+    arrival = events["arrival_ms"]
+    device_ms = np.where(
+        events["device_ms"] != NONE, events["device_ms"],
+        np.where(events["device_ts_ms"] != NONE, events["device_ts_ms"], arrival),
+    )
+
+    # A new boot or epoch forgets the sequence history and clock offset
+    by_boot = np.lexsort((arrival_order, events["boot"], epoch))
+    new_boot = np.ones(len(events), dtype=bool)
+    new_boot[1:] = (epoch[by_boot][1:] != epoch[by_boot][:-1]) | \
+                   (events["boot"][by_boot][1:] != events["boot"][by_boot][:-1])
+
+    # Event time: the device wall clock if plausible, otherwise uptime plus
+    # the smallest clock offset seen so far
+    offset = np.empty(len(events), dtype=np.int64)
+    offset[by_boot] = _running_min_per_group((arrival - device_ms)[by_boot], new_boot)
+    device_ts = events["device_ts_ms"]
+    trusted = (device_ts != NONE) & (device_ts <= arrival + _MAX_FUTURE_SKEW_MS)
+    event_ms = np.where(trusted, device_ts, device_ms + offset)
+
+    # Device order; the first delivery of each (epoch, boot, seq) wins
+    by_seq = np.lexsort((arrival_order, events["seq"], events["boot"], epoch))
+    life, boot, seq = epoch[by_seq], events["boot"][by_seq], events["seq"][by_seq]
+    unique = np.ones(len(by_seq), dtype=bool)
+    unique[1:] = (life[1:] != life[:-1]) | (boot[1:] != boot[:-1]) | (seq[1:] != seq[:-1])
+    rows = by_seq[unique]
+    life, boot, seq = life[unique], boot[unique], seq[unique]
+    state = events["state"][rows]
+    ms = device_ms[rows]
+    received = arrival_order[rows]
+
+    # The predecessor counts only if it had arrived before this message
+    has_pred = np.zeros(len(rows), dtype=bool)
+    has_pred[1:] = (life[1:] == life[:-1]) & (boot[1:] == boot[:-1]) & (seq[1:] == seq[:-1] + 1) \
+        & (received[:-1] < received[1:])
+    pred_state = np.full(len(rows), STATE_CLEAR, dtype=np.uint8)
+    pred_state[1:] = state[:-1]
+    pred_gap = np.zeros(len(rows), dtype=np.int64)
+    pred_gap[1:] = ms[1:] - ms[:-1]
+
+    is_clear = state == STATE_CLEAR
+    # Predecessor lost or late: the device already debounced the edge
+    always = is_clear & ~has_pred & (seq > 1)
+    candidate = is_clear & has_pred & (pred_state == STATE_INTERRUPTED)
+    # All debounce values at once: one row per value
+    debounce = np.asarray(debounce_values, dtype=np.int64)[:, None]
+    counted = always | (candidate & (pred_gap >= debounce))
+    for k, value in enumerate(debounce_values):
+        hits = rows[counted[k]]
+        results[value]["sensor"].append(events["sensor"][hits])
+        results[value]["event_ms"].append(event_ms[hits])
+        results[value]["debounced"] += int((candidate & ~counted[k]).sum())
+
+
+def counts_per_hour(results: dict) -> tuple[np.ndarray, dict[int, np.ndarray]]:
+    """
+    Counts per hour for every debounce value, on a common axis: returns the
+    hour starts (epoch ms) and {debounce_ms: counts}.
+    """
+    all_ms = [r["event_ms"] for r in results.values() if len(r["event_ms"])]
+    if not all_ms:
+        return np.empty(0, dtype=np.int64), {d: np.empty(0, dtype=np.int64) for d in results}
+    first = min(int(ms[0]) for ms in all_ms) // _HOUR_MS
+    last = max(int(ms[-1]) for ms in all_ms) // _HOUR_MS
+    hours = np.arange(first, last + 1, dtype=np.int64) * _HOUR_MS
+    per_value = {
+        d: np.bincount(r["event_ms"] // _HOUR_MS - first, minlength=len(hours)).astype(np.int64)
+        for d, r in results.items()
+    }
+    return hours, per_value
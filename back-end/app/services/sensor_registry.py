@@ -0,0 +1,232 @@
+# back-end/app/services/sensor_registry.py
+
+import threading
+from collections import OrderedDict
+
+# Device wall-clock timestamps further ahead of the server than this are
+# ignored in favour of the uptime-based estimate
+_MAX_FUTURE_SKEW_MS = 60_000
+
+
+class SensorState:
+    """Compact per-sensor state for the interrupted -> clear edge detector."""
+
+    __slots__ = (
+        "sensor_id",
+        "last_state",
+        "last_transition_ms",
+        "last_seen_ms",
+        "initialized",
+        "messages",
+        "debounced",
+        "counts",
+        "boot",
+        "last_seq",
+        "recent",
+        "clock_offset_ms",
+        "duplicates",
+        "out_of_order",
+        "gaps",
+    )
+
+    def __init__(self, sensor_id: str, now_ms: int):
+        self.sensor_id = sensor_id
+        self.last_state = "unknown"
+        self.last_transition_ms = 0
+        self.last_seen_ms = now_ms
+        self.initialized = False
+        self.messages = 0
+        self.debounced = 0
+        self.counts = 0
+        # Sequenced (device-stamped) messages only
+        self.boot = None
+        self.last_seq = 0
+        self.recent: "OrderedDict[int, tuple[str, int]]" = OrderedDict()  # seq -> (state, device_ms)
+        self.clock_offset_ms = None  # Server time minus device uptime
+        self.duplicates = 0
+        self.out_of_order = 0
+        self.gaps = 0
+
+    def to_dict(self) -> dict:
+        return {
+            "sensor_id": self.sensor_id,
+            "last_state": self.last_state,
+            "last_transition_ms": self.last_transition_ms,
+            "last_seen_ms": self.last_seen_ms,
+            "initialized": self.initialized,
+            "messages": self.messages,
+            "debounced": self.debounced,
+            "counts": self.counts,
+            "boot": self.boot,
+            "last_seq": self.last_seq,
+            "duplicates": self.duplicates,
+            "out_of_order": self.out_of_order,
+            "gaps": self.gaps,
+        }
+
+
+class SensorRegistry:
+    """
+    Registry of independent state machines, one per sensor.
+
+    Entries are kept in least-recently-seen order so that both lookups and
+    idle eviction are O(1) per message, regardless of how many sensors
+    publish on a wildcard topic.
+    """
+
+    def __init__(self, debounce_ms: int = 100, idle_ttl_s: int = 3600, on_state_change=None,
+                 reorder_window: int = 256):
+        self.debounce_ms = debounce_ms
+        # Sequence numbers remembered per sensor for dedup and reordering
+        self.reorder_window = reorder_window
+        # Optional callback(sensor_id, state, now_ms) for accepted state changes
+        self.on_state_change = on_state_change
+        self._idle_ttl_ms = idle_ttl_s * 1000
+        self._sensors: "OrderedDict[str, SensorState]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.evicted = 0
+
+    def process(self, sensor_id: str, state: str, now_ms: int, seq: int | None = None,
+                boot: str | None = None, device_ms: int | None = None,
+                device_ts_ms: int | None = None) -> int | None:
+        """
+        Feeds a normalized state into the sensor's state machine.
+        Returns the event time (epoch ms) when the message completes an
+        interrupted -> clear edge, otherwise None.
+
+        Messages carrying a device `seq` are deduplicated per (sensor, boot,
+        seq) and judged against their predecessor in device order, so QoS 1
+        redeliveries and bunched or reordered messages count exactly once.
+        They are debounced on `device_ms` (device uptime) and stamped with
+        `device_ts_ms` (device wall clock) when the device has one.
+        """
+        with self._lock:
+            sensor = self._sensors.get(sensor_id)
+            if sensor is None:
+                sensor = SensorState(sensor_id, now_ms)
+                self._sensors[sensor_id] = sensor
+            else:
+                self._sensors.move_to_end(sensor_id)
+
+            sensor.last_seen_ms = now_ms
+            sensor.messages += 1
+            self._evict_idle(now_ms)
+
+            if seq is None:
+                counted_ms, changed_ms = self._process_arrival(sensor, state, now_ms)
+            else:
+                counted_ms, changed_ms = self._process_sequenced(
+                    sensor, state, now_ms, seq, boot, device_ms, device_ts_ms
+                )
+
+        if changed_ms is not None and self.on_state_change is not None:
+            self.on_state_change(sensor_id, state, changed_ms)
+        return counted_ms
+
+    def _process_arrival(self, sensor: SensorState, state: str, now_ms: int):
+        """Legacy payloads: edges are judged in arrival order and time."""
+        # Debounce to prevent false positives from sensor flickering.
+        # NOTE: do NOT update last_state here; keep the previous stable state.
+        if sensor.last_transition_ms and (now_ms - sensor.last_transition_ms) < self.debounce_ms:
+            sensor.debounced += 1
+            return None, None
+
+        counted = sensor.last_state == "interrupted" and state == "clear"
+        if counted:
+            sensor.counts += 1
+
+        changed = sensor.last_state != state
+        sensor.last_state = state
+        sensor.last_transition_ms = now_ms
+        sensor.initialized = True
+        return (now_ms if counted else None), (now_ms if changed else None)
+
+    def _process_sequenced(self, sensor: SensorState, state: str, now_ms: int, seq: int,
+                           boot: str | None, device_ms: int | None, device_ts_ms: int | None):
+        """Sequenced payloads: edges are judged in device order and time."""
+        if boot != sensor.boot:
+            # The device restarted: its sequence and uptime clock start over
+            sensor.boot = boot
+            sensor.last_seq = 0
+            sensor.recent.clear()
+            sensor.clock_offset_ms = None
+
+        if device_ms is None:
+            device_ms = device_ts_ms if device_ts_ms is not None else now_ms
+        # The smallest offset seen comes from the least delayed message
+        offset = now_ms - device_ms
+        if sensor.clock_offset_ms is None or offset < sensor.clock_offset_ms:
+            sensor.clock_offset_ms = offset
+        if device_ts_ms is not None and device_ts_ms <= now_ms + _MAX_FUTURE_SKEW_MS:
+            event_ms = device_ts_ms
+        else:
+            event_ms = device_ms + sensor.clock_offset_ms
+
+        recent = sensor.recent
+        if seq in recent or seq <= sensor.last_seq - self.reorder_window:
+            sensor.duplicates += 1
+            return None, None
+        recent[seq] = (state, device_ms)
+        while len(recent) > self.reorder_window:
+            recent.popitem(last=False)
+
+        latest = seq > sensor.last_seq
+        if latest:
+            if sensor.last_seq and seq > sensor.last_seq + 1:
+                sensor.gaps += seq - sensor.last_seq - 1
+        else:
+            # A late message fills one of the gaps seen so far
+            sensor.out_of_order += 1
+            sensor.gaps = max(0, sensor.gaps - 1)
+
+        # The firmware only publishes changes, so states alternate and every
+        # clear after an interrupted is one product
+        counted_ms = None
+        if state == "clear":
+            previous = recent.get(seq - 1)
+            if previous is None:
+                # Predecessor lost or still in flight; the device already debounced the edge
+                if seq > 1:
+                    counted_ms = event_ms
+            elif previous[0] == "interrupted":
+                if device_ms - previous[1] >= self.debounce_ms:
+                    counted_ms = event_ms
+                else:
+                    sensor.debounced += 1
+        if counted_ms is not None:
+            sensor.counts += 1
+
+        changed_ms = None
+        if latest:
+            if sensor.last_state != state:
+                changed_ms = event_ms
+            sensor.last_state = state
+            sensor.last_seq = seq
+            sensor.last_transition_ms = event_ms
+            sensor.initialized = True
+        return counted_ms, changed_ms
+
+    def _evict_idle(self, now_ms: int):
+        """Drops sensors that have not published within the idle TTL."""
+        sensors = self._sensors
+        while sensors:
+            oldest = next(iter(sensors.values()))
+            if now_ms - oldest.last_seen_ms < self._idle_ttl_ms:
+                return
+            sensors.popitem(last=False)
+            self.evicted += 1
+
+    def last_state(self) -> str:
+        """Returns the state of the most recently seen sensor."""
+        with self._lock:
+            if not self._sensors:
+                return "unknown"
+            return next(reversed(self._sensors.values())).last_state
+
+    def snapshot(self) -> list[dict]:
+        """Returns the per-sensor state, most recently seen first."""
+        with self._lock:
+            return [s.to_dict() for s in reversed(self._sensors.values())]
+
+    def __len__(self) -> int:
+        return len(self._sensors)
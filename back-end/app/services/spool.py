@@ -0,0 +1,182 @@
+# back-end/app/services/spool.py
+
+import json
+import logging
+import os
+import threading
+from datetime import datetime, timedelta, timezone
+
+logger = logging.getLogger(__name__)
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+_ONE_US = timedelta(microseconds=1)
+_SEGMENT_PREFIX = "counts-"
+_SEGMENT_SUFFIX = ".log"
+# Segments the database keeps rejecting are renamed to this prefix
+_DEAD_LETTER_PREFIX = "deadletter-"
+
+
+def _encode(record: tuple[str, str, datetime]) -> str:
+    event_uid, sensor_id, ts = record
+    # Whole microseconds keep the timestamp exact, which the
+    # (event_uid, timestamp) uniqueness check on replay relies on
+    return json.dumps([event_uid, sensor_id, (ts - _EPOCH) // _ONE_US]) + "\n"
+
+
+def _decode(line: str) -> tuple[str, str, datetime]:
+    event_uid, sensor_id, micros = json.loads(line)
+    return event_uid, sensor_id, _EPOCH + timedelta(microseconds=micros)
+
+
+class CountSpool:
+    """
+    Append-only on-disk spool for counts that could not be written to the
+    database.
+
+    Records are JSON lines of (event_uid, sensor_id, epoch microseconds)
+    appended to numbered segment files. Each append is a single buffered
+    write followed by one fsync, so a whole batch costs one disk flush.
+    A segment is deleted only after all of its records were committed;
+    a torn last line left behind by a crash is skipped on read.
+    """
+
+    def __init__(self, directory: str, segment_max_bytes: int = 4 * 1024 * 1024, fsync: bool = True):
+        self.directory = directory
+        self.segment_max_bytes = segment_max_bytes
+        self.fsync = fsync
+        self._lock = threading.Lock()
+        self._active = None
+        self._next_seq = 1
+        self._opened = False
+        self.pending = 0
+        self.spilled = 0
+        self.replayed = 0
+        self.dead_lettered = 0
+
+    def open(self):
+        """Creates the spool directory and counts what a previous run left behind."""
+        with self._lock:
+            if self._opened:
+                return
+            os.makedirs(self.directory, exist_ok=True)
+            segments = self._segment_paths()
+            self.pending = sum(len(self._read(path)) for path in segments)
+            if segments:
+                self._next_seq = self._seq(segments[-1]) + 1
+                logger.warning(f"Spool holds {self.pending} count(s) from a previous run; they will be replayed.")
+            self._opened = True
+
+    def close(self):
+        with self._lock:
+            self._close_active()
+
+    def append(self, records: list[tuple[str, str, datetime]]):
+        """Durably appends (event_uid, sensor_id, timestamp) records."""
+        if not records:
+            return
+        data = "".join(_encode(r) for r in records).encode()
+        with self._lock:
+            if self._active is None:
+                self._open_segment()
+            self._active.write(data)
+            self._active.flush()
+            if self.fsync:
+                os.fsync(self._active.fileno())
+            self.pending += len(records)
+            self.spilled += len(records)
+            if self._active.tell() >= self.segment_max_bytes:
+                self._close_active()
+
+    def sealed_segments(self) -> list[str]:
+        """
+        Closes the segment being written and returns every segment, oldest
+        first. New appends go to a fresh segment, so the returned files are
+        complete and safe to replay.
+        """
+        with self._lock:
+            self._close_active()
+            return self._segment_paths()
+
+    def read(self, path: str) -> list[tuple[str, str, datetime]]:
+        return self._read(path)
+
+    def discard(self, path: str, records: int):
+        """Deletes a fully replayed segment."""
+        os.remove(path)
+        with self._lock:
+            self.pending = max(0, self.pending - records)
+            self.replayed += records
+
+    def dead_letter(self, path: str, records: int) -> str:
+        """
+        Moves a segment the database keeps rejecting out of the replay
+        queue, keeping it on disk for inspection. Returns its new path.
+        """
+        target = os.path.join(self.directory, _DEAD_LETTER_PREFIX + os.path.basename(path))
+        os.replace(path, target)
+        with self._lock:
+            self.pending = max(0, self.pending - records)
+            self.dead_lettered += records
+        return target
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            segments = self._segment_paths() if self._opened else []
+            size = 0
+            for path in segments:
+                try:
+                    size += os.path.getsize(path)
+                except OSError:
+                    pass
+            return {
+                "directory": self.directory,
+                "pending_counts": self.pending,
+                "segments": len(segments),
+                "bytes": size,
+                "counts_spilled": self.spilled,
+                "counts_replayed": self.replayed,
+                "counts_dead_lettered": self.dead_lettered,
+            }
+
+    # -----------------------------------------------------------------
+    # Internals (called with the lock held)
+    # -----------------------------------------------------------------
+
+    def _segment_paths(self) -> list[str]:
+        names = sorted(
+            n for n in os.listdir(self.directory)
+            if n.startswith(_SEGMENT_PREFIX) and n.endswith(_SEGMENT_SUFFIX)
+        )
+        return [os.path.join(self.directory, n) for n in names]
+
+    @staticmethod
+    def _seq(path: str) -> int:
+        return int(os.path.basename(path)[len(_SEGMENT_PREFIX):-len(_SEGMENT_SUFFIX)])
+
+    def _open_segment(self):
+        path = os.path.join(self.directory, f"{_SEGMENT_PREFIX}{self._next_seq:012d}{_SEGMENT_SUFFIX}")
+        self._next_seq += 1
+        self._active = open(path, "ab")
+        if self.fsync:
+            # Make the new directory entry itself durable
+            dir_fd = os.open(self.directory, os.O_RDONLY)
+            try:
+                os.fsync(dir_fd)
+            finally:
+                os.close(dir_fd)
+
+    def _close_active(self):
+        if self._active is not None:
+            self._active.close()
+            self._active = None
+
+    @staticmethod
+    def _read(path: str) -> list[tuple[str, str, datetime]]:
+        records = []
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    records.append(_decode(line))
+                except (ValueError, TypeError):
+                    logger.warning(f"Skipping corrupt spool record in {path}: {line!r}")
+        return records
@@ -0,0 +1,141 @@
+# back-end/benchmarks/bench_parse.py
+"""
+Microbenchmark of the MQTT state message parse path.
+
+Compares the parser the consumer used before the fast path (kept below as
+`legacy_parse`) with `app.services.payloads.parse_state_payload`, on the
+JSON payload the firmware sends and on its compact format. Needs no
+database, broker or .env. Run from back-end/:
+
+    python -m benchmarks.bench_parse [--messages N] [--repeat R] [--save]
+"""
+
+import argparse
+import json
+import logging
+import time
+
+from app.services.payloads import parse_state_payload
+from benchmarks.common import new_report, save_report
+
+TOPIC = "sensors/barrier/state"
+
+# Production runs at INFO, so debug calls must cost (almost) nothing
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger("benchmarks.legacy")
+
+
+# =====================================================================
+# Parser before the fast path
+# =====================================================================
+
+def _legacy_normalize_state(raw_state):
+    if raw_state is None:
+        return None
+    s = str(raw_state).strip().lower()
+    if s.startswith("interrompid") or s.startswith("interrupted"):
+        return "interrupted"
+    if s == "livre" or s == "clear":
+        return "clear"
+    return None
+
+def _legacy_as_int(value):
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or value != int(value):
+        return None
+    return int(value)
+
+def legacy_parse(topic: str, payload: bytes):
+    try:
+        payload_str = payload.decode(errors="ignore")
+        logger.debug(f"Message received on topic {topic}: {payload_str}")
+        if not payload_str:
+            return None
+        data = json.loads(payload_str)
+        if not isinstance(data, dict):
+            return None
+        state = _legacy_normalize_state(data.get("state"))
+        if not state:
+            return None
+        sensor_id = str(data.get("id") or topic)
+        seq = _legacy_as_int(data.get("seq"))
+        boot = str(data["boot"]) if data.get("boot") is not None else None
+        return (sensor_id, state, seq, boot, _legacy_as_int(data.get("t_ms")), _legacy_as_int(data.get("ts")))
+    except json.JSONDecodeError:
+        return None
+
+
+# =====================================================================
+# Payload corpora (what the firmware publishes)
+# =====================================================================
+
+def json_payloads(n: int) -> list[bytes]:
+    payloads = []
+    for i in range(n):
+        t_ms = 3_600_000 + i * 250
+        payloads.append(json.dumps({
+            "id": f"ESP32_Barrier_{i % 4:03d}",
+            "state": "interrupted" if i % 2 == 0 else "clear",
+            "seq": i + 1,
+            "boot": "1a2b3c4d",
+            "t_ms": t_ms,
+            "ts": 1_760_000_000_000 + t_ms,
+            "rssi": -61,
+            "uptime_s": t_ms // 1000,
+        }, separators=(",", ":")).encode())
+    return payloads
+
+def compact_payloads(n: int) -> list[bytes]:
+    payloads = []
+    for i in range(n):
+        t_ms = 3_600_000 + i * 250
+        state = "I" if i % 2 == 0 else "C"
+        payloads.append(f"{state},ESP32_Barrier_{i % 4:03d},{i + 1},1a2b3c4d,{t_ms},{1_760_000_000_000 + t_ms}".encode())
+    return payloads
+
+
+# =====================================================================
+# Runner
+# =====================================================================
+
+def measure(parse, payloads: list[bytes], repeat: int) -> float:
+    """Returns the best throughput of `repeat` runs, in messages per second."""
+    best = 0.0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for payload in payloads:
+            parse(TOPIC, payload)
+        elapsed = time.perf_counter() - start
+        best = max(best, len(payloads) / elapsed)
+    return best
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("--messages", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--save", action="store_true", help="Also save a JSON report")
+    parser.add_argument("--output", default=None, help="Directory for the JSON report")
+    args = parser.parse_args()
+
+    as_json = json_payloads(args.messages)
+    as_compact = compact_payloads(args.messages)
+
+    # Both parsers must agree before their speed means anything
+    for payload in as_json[:1000]:
+        assert tuple(parse_state_payload(TOPIC, payload)) == legacy_parse(TOPIC, payload), payload
+
+    before = measure(legacy_parse, as_json, args.repeat)
+    after_json = measure(parse_state_payload, as_json, args.repeat)
+    after_compact = measure(parse_state_payload, as_compact, args.repeat)
+
+    rates = {"before_json": before, "after_json": after_json, "after_compact": after_compact}
+    print(f"{'parser':<32}{'msgs/sec':>14}{'vs before':>12}")
+    for name, rate in rates.items():
+        print(f"{name:<32}{rate:>14,.0f}{rate / before:>11.2f}x")
+
+    if args.save or args.output:
+        report = new_report("parse", {"messages": args.messages, "repeat": args.repeat})
+        report["results"] = {name: {"messages_per_sec": round(rate)} for name, rate in rates.items()}
+        print(f"Report saved to {save_report(report, args.output)}")
+
+if __name__ == "__main__":
+    main()
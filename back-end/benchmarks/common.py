@@ -0,0 +1,74 @@
+# back-end/benchmarks/common.py
+"""Helpers shared by the benchmarks: percentiles, HTTP calls and JSON reports."""
+
+import json
+import os
+import platform
+import subprocess
+import time
+import urllib.request
+from datetime import datetime, timezone
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+
+
+def percentiles(samples: list[float]) -> dict:
+    """Returns count, p50, p90, p99, max and mean of `samples` (nearest rank)."""
+    if not samples:
+        return {"count": 0, "p50": None, "p90": None, "p99": None, "max": None, "mean": None}
+    ordered = sorted(samples)
+    n = len(ordered)
+
+    def rank(p: float) -> float:
+        return round(ordered[min(n - 1, max(0, int(p * n + 0.5) - 1))], 3)
+
+    return {
+        "count": n,
+        "p50": rank(0.50),
+        "p90": rank(0.90),
+        "p99": rank(0.99),
+        "max": round(ordered[-1], 3),
+        "mean": round(sum(ordered) / n, 3),
+    }
+
+
+def http_json(url: str, body: dict | None = None, timeout: float = 10.0):
+    """GETs (or POSTs `body` to) `url` and returns the decoded JSON response."""
+    data = json.dumps(body).encode() if body is not None else None
+    request = urllib.request.Request(url, data=data, headers={"Content-Type": "application/json"})
+    with urllib.request.urlopen(request, timeout=timeout) as response:
+        return json.loads(response.read())
+
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=os.path.dirname(__file__), capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def new_report(name: str, config: dict) -> dict:
+    """Starts a report; fill in `results` and pass it to save_report()."""
+    return {
+        "benchmark": name,
+        "started_at": datetime.now(timezone.utc).isoformat(),
+        "git_commit": git_commit(),
+        "host": {"python": platform.python_version(), "machine": platform.machine(), "cpus": os.cpu_count()},
+        "config": config,
+        "results": {},
+    }
+
+
+def save_report(report: dict, output_dir: str | None = None) -> str:
+    """Writes the report as JSON and returns its path."""
+    output_dir = output_dir or RESULTS_DIR
+    os.makedirs(output_dir, exist_ok=True)
+    stamp = time.strftime("%Y%m%d-%H%M%S")
+    commit = report.get("git_commit") or "nogit"
+    path = os.path.join(output_dir, f"{report['benchmark']}-{stamp}-{commit}.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    return path
@@ -0,0 +1,86 @@
+# back-end/benchmarks/compare.py
+"""
+Compares two benchmark reports of the same benchmark, metric by metric.
+
+Throughput metrics are better when higher; latencies, losses, errors and
+round-trips when lower. Other numbers (sample sizes, totals) are shown but
+never flagged. Exits with status 1 if any metric regressed by more than
+--threshold percent.
+Run from back-end/:
+
+    python -m benchmarks.compare benchmarks/results/old.json benchmarks/results/new.json
+"""
+
+import argparse
+import json
+import sys
+
+
+def _flatten(value, prefix: str = "") -> dict[str, float]:
+    if isinstance(value, dict):
+        flat = {}
+        for key, item in value.items():
+            flat.update(_flatten(item, f"{prefix}.{key}" if prefix else key))
+        return flat
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return {prefix: float(value)}
+    return {}
+
+
+_HIGHER_IS_BETTER = ("per_sec",)
+_LOWER_IS_BETTER = (
+    ".p50", ".p90", ".p99", ".max", ".mean",
+    ".lost", ".duplicates", ".errors", "_per_count", ".counts_spooled", ".messages_unacked",
+)
+
+
+def _direction(metric: str) -> int:
+    """+1 if higher is better, -1 if lower is better, 0 if informational."""
+    if metric.endswith(_HIGHER_IS_BETTER):
+        return 1
+    if metric.endswith(_LOWER_IS_BETTER):
+        return -1
+    return 0
+
+
+def compare(old: dict, new: dict, threshold_pct: float) -> tuple[list[tuple], list[str]]:
+    """Returns ([(metric, old, new, change %)], [regressed metrics])."""
+    before = _flatten(old.get("results", {}))
+    after = _flatten(new.get("results", {}))
+    rows, regressions = [], []
+    for metric in sorted(before.keys() & after.keys()):
+        a, b = before[metric], after[metric]
+        change = ((b - a) / abs(a) * 100) if a else (0.0 if b == a else float("inf"))
+        if -_direction(metric) * change > threshold_pct:
+            regressions.append(metric)
+        rows.append((metric, a, b, change))
+    return rows, regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("old")
+    parser.add_argument("new")
+    parser.add_argument("--threshold", type=float, default=10.0, help="Regression threshold in percent")
+    args = parser.parse_args()
+
+    with open(args.old, encoding="utf-8") as f:
+        old = json.load(f)
+    with open(args.new, encoding="utf-8") as f:
+        new = json.load(f)
+    if old.get("benchmark") != new.get("benchmark"):
+        sys.exit(f"Cannot compare a '{old.get('benchmark')}' report with a '{new.get('benchmark')}' report.")
+
+    rows, regressions = compare(old, new, args.threshold)
+    print(f"{old.get('git_commit')} -> {new.get('git_commit')}")
+    print(f"{'metric':<56}{'old':>14}{'new':>14}{'change':>10}")
+    for metric, a, b, change in rows:
+        flag = "  <-- regression" if metric in regressions else ""
+        print(f"{metric:<56}{a:>14,.3f}{b:>14,.3f}{change:>9.1f}%{flag}")
+    if regressions:
+        print(f"\n{len(regressions)} metric(s) regressed by more than {args.threshold:.0f}%.")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
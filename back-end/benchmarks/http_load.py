@@ -0,0 +1,129 @@
+# back-end/benchmarks/http_load.py
+"""
+Closed-loop HTTP load driver for the read API.
+
+Each worker keeps one keep-alive connection and sends requests back to back,
+cycling through the endpoints below. Reports per-endpoint latency
+percentiles, throughput and errors. Run from back-end/:
+
+    python -m benchmarks.http_load --concurrency 8 --duration 30
+"""
+
+import argparse
+import http.client
+import json
+import threading
+import time
+import urllib.parse
+
+from benchmarks.common import new_report, percentiles, save_report
+
+
+def _grafana_body() -> dict:
+    now_ms = int(time.time() * 1000)
+    return {
+        "range": {
+            "from": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(now_ms / 1000 - 6 * 3600)),
+            "to": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(now_ms / 1000)),
+        },
+        "intervalMs": 60_000,
+        "maxDataPoints": 360,
+        "targets": [{"target": "hourly_counts"}, {"target": "production_speed"}],
+    }
+
+
+# name -> (method, path, JSON body factory)
+ENDPOINTS = {
+    "counts": ("GET", "/v1/counts?limit=100", None),
+    "statistics": ("GET", "/v1/counts/statistics", None),
+    "grafana_query": ("POST", "/v1/grafana/query", _grafana_body),
+}
+
+
+def run_http_load(base_url: str = "http://localhost:8000", concurrency: int = 4, duration_s: float | None = 30.0,
+                  endpoints: list[str] | None = None, stop: threading.Event | None = None) -> dict:
+    """
+    Drives the endpoints for `duration_s` (None: until `stop` is set) and
+    returns per-endpoint latency percentiles in ms, requests/sec and errors.
+    """
+    names = endpoints or list(ENDPOINTS)
+    url = urllib.parse.urlsplit(base_url)
+    stop = stop or threading.Event()
+    latencies = {name: [] for name in names}
+    errors = {name: 0 for name in names}
+    lock = threading.Lock()
+
+    def worker(offset: int):
+        conn = http.client.HTTPConnection(url.hostname, url.port or 80, timeout=30)
+        i = offset
+        local = {name: [] for name in names}
+        local_errors = {name: 0 for name in names}
+        while not stop.is_set():
+            name = names[i % len(names)]
+            i += 1
+            method, path, body = ENDPOINTS[name]
+            payload = json.dumps(body()).encode() if body else None
+            started = time.perf_counter()
+            try:
+                conn.request(method, url.path.rstrip("/") + path, body=payload,
+                             headers={"Content-Type": "application/json"})
+                response = conn.getresponse()
+                response.read()
+                ok = response.status < 400
+            except (OSError, http.client.HTTPException):
+                ok = False
+                conn.close()
+                conn = http.client.HTTPConnection(url.hostname, url.port or 80, timeout=30)
+            if ok:
+                local[name].append((time.perf_counter() - started) * 1000)
+            else:
+                local_errors[name] += 1
+        conn.close()
+        with lock:
+            for name in names:
+                latencies[name].extend(local[name])
+                errors[name] += local_errors[name]
+
+    threads = [threading.Thread(target=worker, args=(n,), daemon=True) for n in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    stop.wait(duration_s)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    return {
+        name: {
+            "latency_ms": percentiles(latencies[name]),
+            "requests_per_sec": round(len(latencies[name]) / elapsed, 1),
+            "errors": errors[name],
+        }
+        for name in names
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("--api-url", default="http://localhost:8000")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--duration", type=float, default=30.0)
+    parser.add_argument("--endpoint", action="append", choices=list(ENDPOINTS),
+                        help="Repeat to drive only some endpoints (default: all)")
+    parser.add_argument("--output", default=None, help="Directory for the JSON report")
+    args = parser.parse_args()
+
+    report = new_report("http", {
+        "api_url": args.api_url,
+        "concurrency": args.concurrency,
+        "duration_s": args.duration,
+        "endpoints": args.endpoint or list(ENDPOINTS),
+    })
+    report["results"] = run_http_load(args.api_url, args.concurrency, args.duration, args.endpoint)
+    print(json.dumps(report["results"], indent=2))
+    print(f"Report saved to {save_report(report, args.output)}")
+
+
+if __name__ == "__main__":
+    main()
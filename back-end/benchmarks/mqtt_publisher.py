@@ -0,0 +1,167 @@
+# back-end/benchmarks/mqtt_publisher.py
+"""
+Synthetic multi-sensor MQTT publisher.
+
+Simulates a line of barrier sensors that publish beam changes the way the
+firmware does. Each product is an 'interrupted' followed by a 'clear'
+`--beam-ms` later; with probability `--flicker` a product is preceded by a
+glitch (a beam break shorter than the backend's debounce) that must not be
+counted. Run from back-end/:
+
+    python -m benchmarks.mqtt_publisher --sensors 8 --rate 5 --duration 30
+"""
+
+import argparse
+import heapq
+import json
+import random
+import time
+import uuid
+
+import paho.mqtt.client as mqtt
+
+FORMATS = ("json", "compact", "legacy")
+
+
+class SyntheticSensor:
+    """One simulated device: its identity, boot and event sequence."""
+
+    def __init__(self, sensor_id: str, payload_format: str):
+        self.sensor_id = sensor_id
+        self.payload_format = payload_format
+        self.boot = uuid.uuid4().hex[:8]
+        self.seq = 0
+        self.boot_ms = time.time_ns() // 1_000_000 - random.randint(60_000, 3_600_000)
+        self.products = 0
+        self.glitches = 0
+
+    def payload(self, state: str, event_ms: int) -> bytes:
+        self.seq += 1
+        t_ms = event_ms - self.boot_ms
+        if self.payload_format == "compact":
+            code = "I" if state == "interrupted" else "C"
+            return f"{code},{self.sensor_id},{self.seq},{self.boot},{t_ms},{event_ms}".encode()
+        data = {"id": self.sensor_id, "state": state}
+        if self.payload_format == "json":
+            data.update(seq=self.seq, boot=self.boot, t_ms=t_ms, ts=event_ms)
+        data.update(rssi=-60, uptime_s=t_ms // 1000)
+        return json.dumps(data, separators=(",", ":")).encode()
+
+
+def _schedule(sensors: list[SyntheticSensor], rate: float, duration_s: float, beam_ms: int,
+              flicker: float, flicker_ms: int, start_ms: int) -> list[tuple[int, int, int, str]]:
+    """Returns every (due_ms, tiebreak, sensor index, state) of the run, oldest first."""
+    events = []
+    tiebreak = 0
+    for index, sensor in enumerate(sensors):
+        # Poisson arrivals, but never closer than a full product apart
+        min_gap_ms = beam_ms + flicker_ms * 3 + 50
+        t = start_ms + random.expovariate(rate) * 1000
+        while t < start_ms + duration_s * 1000:
+            due = int(t)
+            if random.random() < flicker:
+                glitch = due - flicker_ms * 2
+                events.append((glitch, tiebreak, index, "interrupted"))
+                events.append((glitch + flicker_ms, tiebreak + 1, index, "clear"))
+                sensor.glitches += 1
+            events.append((due, tiebreak + 2, index, "interrupted"))
+            events.append((due + beam_ms, tiebreak + 3, index, "clear"))
+            sensor.products += 1
+            tiebreak += 4
+            t += max(min_gap_ms / 1000, random.expovariate(rate)) * 1000
+    heapq.heapify(events)
+    return [heapq.heappop(events) for _ in range(len(events))]
+
+
+def run_publisher(host: str = "localhost", port: int = 1883, topic: str = "sensors/barrier/state",
+                  sensors: int = 4, rate: float = 2.0, duration_s: float = 30.0, beam_ms: int = 150,
+                  flicker: float = 0.0, flicker_ms: int = 20, payload_format: str = "json",
+                  qos: int = 1, sensor_prefix: str | None = None) -> dict:
+    """
+    Publishes a synthetic run in real time and returns what was sent: the
+    sensor ids, the products (expected counts) per sensor, glitches and
+    message totals.
+    """
+    prefix = sensor_prefix or f"bench-{uuid.uuid4().hex[:6]}"
+    devices = [SyntheticSensor(f"{prefix}-{i:03d}", payload_format) for i in range(sensors)]
+
+    client = mqtt.Client(client_id=f"{prefix}-publisher", protocol=mqtt.MQTTv311)
+    client.max_inflight_messages_set(1000)
+    client.connect(host, port, keepalive=30)
+    client.loop_start()
+
+    start_ms = time.time_ns() // 1_000_000 + 500
+    events = _schedule(devices, rate, duration_s, beam_ms, flicker, flicker_ms, start_ms)
+    late_ms = []
+    pending = []
+    try:
+        for due_ms, _, index, state in events:
+            delay = due_ms / 1000 - time.time()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                late_ms.append(-delay * 1000)
+            pending.append(client.publish(topic, devices[index].payload(state, due_ms), qos=qos))
+        for info in pending:
+            info.wait_for_publish(timeout=10)
+    finally:
+        client.loop_stop()
+        client.disconnect()
+
+    elapsed_s = max(0.001, time.time() - start_ms / 1000)
+    return {
+        "sensor_prefix": prefix,
+        "sensor_ids": [d.sensor_id for d in devices],
+        "expected_counts": {d.sensor_id: d.products for d in devices},
+        "products": sum(d.products for d in devices),
+        "glitches": sum(d.glitches for d in devices),
+        "messages": len(events),
+        "messages_unacked": sum(1 for info in pending if not info.is_published()),
+        "messages_per_sec": round(len(events) / elapsed_s, 1),
+        "publish_late_ms_max": round(max(late_ms), 3) if late_ms else 0.0,
+        "started_at_ms": start_ms,
+    }
+
+
+def add_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument("--broker-host", default="localhost")
+    parser.add_argument("--broker-port", type=int, default=1883)
+    parser.add_argument("--topic", default="sensors/barrier/state")
+    parser.add_argument("--sensors", type=int, default=4, help="Number of simulated sensors")
+    parser.add_argument("--rate", type=float, default=2.0, help="Products per second, per sensor")
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds to publish for")
+    parser.add_argument("--beam-ms", type=int, default=150, help="How long each product breaks the beam")
+    parser.add_argument("--flicker", type=float, default=0.0, help="Probability of a glitch before a product")
+    parser.add_argument("--flicker-ms", type=int, default=20, help="Glitch width; keep below SENSOR_DEBOUNCE_MS")
+    parser.add_argument("--format", choices=FORMATS, default="json",
+                        help="json (sequenced), compact, or legacy (unsequenced JSON)")
+    parser.add_argument("--qos", type=int, choices=(0, 1), default=1)
+
+
+def publisher_kwargs(args: argparse.Namespace) -> dict:
+    return {
+        "host": args.broker_host,
+        "port": args.broker_port,
+        "topic": args.topic,
+        "sensors": args.sensors,
+        "rate": args.rate,
+        "duration_s": args.duration,
+        "beam_ms": args.beam_ms,
+        "flicker": args.flicker,
+        "flicker_ms": args.flicker_ms,
+        "payload_format": args.format,
+        "qos": args.qos,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    add_arguments(parser)
+    args = parser.parse_args()
+    result = run_publisher(**publisher_kwargs(args))
+    result.pop("expected_counts")
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
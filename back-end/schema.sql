@@ -1,13 +1,72 @@
 -- Terelina Database Schema (UTC-aware)
 
+-- ======================================================================
+-- Migration Prep (pre-partitioning databases)
+-- ======================================================================
+
+-- Databases created before monthly partitioning have a plain pizza_counts
+-- table. Move it aside so the partitioned table can be created below; its
+-- rows are copied back in the "Partition Bootstrap" section at the end.
+DO $$
+BEGIN
+    IF EXISTS (
+        SELECT 1 FROM pg_class
+        WHERE relname = 'pizza_counts' AND relkind = 'r'
+          AND relnamespace = 'public'::regnamespace
+    ) THEN
+        DROP VIEW IF EXISTS pizza_counts_utc, hourly_counts, daily_counts,
+            today_stats, recent_counts_24h, production_speed;
+        ALTER TABLE pizza_counts RENAME TO pizza_counts_legacy;
+        ALTER TABLE pizza_counts_legacy RENAME CONSTRAINT pizza_counts_pkey TO pizza_counts_legacy_pkey;
+        ALTER SEQUENCE IF EXISTS pizza_counts_id_seq RENAME TO pizza_counts_legacy_id_seq;
+        ALTER INDEX IF EXISTS idx_pizza_counts_timestamp RENAME TO idx_pizza_counts_legacy_timestamp;
+    END IF;
+END $$;
+
 -- ======================================================================
 -- Tables
 -- ======================================================================
 
--- Main table for product counts
+-- Main table for product counts, range-partitioned by month.
+-- Monthly partitions are created by ensure_pizza_counts_partitions();
+-- rows outside every partition land in pizza_counts_default.
 CREATE TABLE IF NOT EXISTS pizza_counts (
-    id SERIAL PRIMARY KEY,
-    "timestamp" TIMESTAMPTZ NOT NULL DEFAULT NOW()
+    id BIGSERIAL,
+    sensor_id VARCHAR(64) NOT NULL DEFAULT 'unknown',
+    "timestamp" TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    event_uid UUID, -- Set by the backend so retried/replayed writes are idempotent
+    PRIMARY KEY (id, "timestamp")
+) PARTITION BY RANGE ("timestamp");
+
+CREATE TABLE IF NOT EXISTS pizza_counts_default PARTITION OF pizza_counts DEFAULT;
+
+-- Databases created before event_uid existed
+ALTER TABLE pizza_counts ADD COLUMN IF NOT EXISTS event_uid UUID;
+
+-- Hourly count rollup, maintained incrementally by the ingestion writer
+CREATE TABLE IF NOT EXISTS pizza_counts_hourly (
+    bucket TIMESTAMPTZ NOT NULL,
+    sensor_id VARCHAR(64) NOT NULL,
+    total_counts INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (bucket, sensor_id)
+);
+
+-- Daily count rollup, bucketed by local date in the 'timezone' setting
+CREATE TABLE IF NOT EXISTS pizza_counts_daily (
+    day DATE NOT NULL,
+    sensor_id VARCHAR(64) NOT NULL,
+    total_counts INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (day, sensor_id)
+);
+
+-- Recently saved event_uids. A redelivered device event is not always
+-- stamped with the same timestamp (without a device wall clock, its time
+-- comes from a clock offset re-estimated after a backend restart), so the
+-- (event_uid, "timestamp") index of pizza_counts cannot catch it; this
+-- table dedupes on event_uid alone. Pruned after event_uid_retention_days.
+CREATE TABLE IF NOT EXISTS pizza_count_events (
+    event_uid UUID PRIMARY KEY,
+    saved_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
 );
 
 -- System logs for monitoring and debugging
@@ -16,10 +75,14 @@ CREATE TABLE IF NOT EXISTS system_logs (
     level VARCHAR(10) NOT NULL, -- INFO|WARNING|ERROR
     message TEXT NOT NULL,
     source VARCHAR(50) NOT NULL, -- backend|mqtt|sensor
-    "timestamp" TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    "timestamp" TIMESTAMPTZ NOT NULL DEFAULT NOW(), -- First occurrence
+    occurrences INTEGER NOT NULL DEFAULT 1, -- Identical events coalesced into this row
     CONSTRAINT system_logs_level_chk CHECK (level IN ('INFO','WARNING','ERROR'))
 );
 
+-- Databases created before events were coalesced
+ALTER TABLE system_logs ADD COLUMN IF NOT EXISTS occurrences INTEGER NOT NULL DEFAULT 1;
+
 -- Dynamic system settings
 CREATE TABLE IF NOT EXISTS system_settings (
     id SERIAL PRIMARY KEY,
@@ -34,8 +97,20 @@ CREATE TABLE IF NOT EXISTS system_settings (
 -- Indexes (Performance Improvements)
 -- ======================================================================
 
--- Speed up time-based queries and ordering
-CREATE INDEX IF NOT EXISTS idx_pizza_counts_timestamp ON pizza_counts ("timestamp" DESC);
+-- Speed up time-based queries, ordering and (timestamp, id) keyset
+-- pagination (created on every partition)
+CREATE INDEX IF NOT EXISTS idx_pizza_counts_timestamp_id ON pizza_counts ("timestamp" DESC, id DESC);
+DROP INDEX IF EXISTS idx_pizza_counts_timestamp; -- superseded by idx_pizza_counts_timestamp_id
+
+-- One row per event: lets the writer insert with ON CONFLICT DO NOTHING
+-- (unique indexes on a partitioned table must include the partition key)
+CREATE UNIQUE INDEX IF NOT EXISTS idx_pizza_counts_event_uid ON pizza_counts (event_uid, "timestamp");
+
+-- Retention of the event_uid dedupe table
+CREATE INDEX IF NOT EXISTS idx_pizza_count_events_saved_at ON pizza_count_events (saved_at);
+
+-- Per-sensor (production line) time-range queries
+CREATE INDEX IF NOT EXISTS idx_pizza_counts_sensor_timestamp ON pizza_counts (sensor_id, "timestamp" DESC);
 
 -- Speed up log filtering and ordering
 CREATE INDEX IF NOT EXISTS idx_system_logs_timestamp ON system_logs ("timestamp" DESC);
@@ -45,31 +120,41 @@ CREATE INDEX IF NOT EXISTS idx_system_logs_level ON system_logs (level);
 -- Views (Optimized for Grafana)
 -- ======================================================================
 
+-- Timezone used for day boundaries ('timezone' setting, UTC by default)
+CREATE OR REPLACE FUNCTION system_timezone()
+RETURNS TEXT AS $$
+    SELECT COALESCE(
+        (SELECT value FROM system_settings WHERE key = 'timezone'),
+        'UTC'
+    );
+$$ LANGUAGE sql STABLE;
+
 -- Compatibility view (maps 'timestamp' to 'timestampz')
 CREATE OR REPLACE VIEW pizza_counts_utc AS
 SELECT
   id,
-  "timestamp" AS timestampz
+  "timestamp" AS timestampz,
+  sensor_id
 FROM pizza_counts;
 
--- Counts aggregated by hour
+-- Counts aggregated by hour (read from the hourly rollup)
 CREATE OR REPLACE VIEW hourly_counts AS
 SELECT 
-    DATE_TRUNC('hour', "timestamp") AS hour,
-    COUNT(*) AS total_counts,
-    EXTRACT(EPOCH FROM DATE_TRUNC('hour', "timestamp")) AS timestamp_unix
-FROM pizza_counts
-GROUP BY DATE_TRUNC('hour', "timestamp")
+    bucket AS hour,
+    SUM(total_counts)::BIGINT AS total_counts,
+    EXTRACT(EPOCH FROM bucket) AS timestamp_unix
+FROM pizza_counts_hourly
+GROUP BY bucket
 ORDER BY hour;
 
--- Counts aggregated by day
+-- Counts aggregated by day (read from the daily rollup)
 CREATE OR REPLACE VIEW daily_counts AS
 SELECT 
-    DATE("timestamp") AS date,
-    COUNT(*) AS total_counts,
-    EXTRACT(EPOCH FROM DATE("timestamp")) AS timestamp_unix
-FROM pizza_counts
-GROUP BY DATE("timestamp")
+    day AS date,
+    SUM(total_counts)::BIGINT AS total_counts,
+    EXTRACT(EPOCH FROM (day::TIMESTAMP AT TIME ZONE system_timezone())) AS timestamp_unix
+FROM pizza_counts_daily
+GROUP BY day
 ORDER BY date;
 
 -- Statistics for the current day
@@ -81,7 +166,7 @@ SELECT
     DATE("timestamp") AS date,
     EXTRACT(EPOCH FROM CURRENT_TIMESTAMP) AS timestamp_unix
 FROM pizza_counts
-WHERE DATE("timestamp") = CURRENT_DATE
+WHERE "timestamp" >= CURRENT_DATE
 GROUP BY DATE("timestamp");
 
 -- Recent counts (last 24h)
@@ -95,16 +180,16 @@ FROM pizza_counts
 WHERE "timestamp" >= CURRENT_TIMESTAMP - INTERVAL '24 hours'
 ORDER BY "timestamp" DESC;
 
--- Production speed (pizzas per hour)
+-- Production speed (pizzas per hour, read from the hourly rollup)
 CREATE OR REPLACE VIEW production_speed AS
 SELECT 
-    DATE_TRUNC('hour', "timestamp") AS hour,
-    COUNT(*) AS pizzas_per_hour,
-    EXTRACT(EPOCH FROM DATE_TRUNC('hour', "timestamp")) AS timestamp_unix,
-    ROUND(COUNT(*)::NUMERIC / 1, 2) AS pizzas_per_hour_decimal
-FROM pizza_counts
-WHERE "timestamp" >= CURRENT_TIMESTAMP - INTERVAL '24 hours'
-GROUP BY DATE_TRUNC('hour', "timestamp")
+    bucket AS hour,
+    SUM(total_counts)::BIGINT AS pizzas_per_hour,
+    EXTRACT(EPOCH FROM bucket) AS timestamp_unix,
+    ROUND(SUM(total_counts)::NUMERIC / 1, 2) AS pizzas_per_hour_decimal
+FROM pizza_counts_hourly
+WHERE bucket >= DATE_TRUNC('hour', CURRENT_TIMESTAMP - INTERVAL '24 hours')
+GROUP BY bucket
 ORDER BY hour;
 
 -- ======================================================================
@@ -116,7 +201,9 @@ INSERT INTO system_settings (key, value, description) VALUES
 ('version', '1.0.0', 'Current System Version'),
 ('timezone', 'America/Sao_Paulo', 'System Timezone'),
 ('log_retention_days', '30', 'Days to keep logs'),
-('cleanup_interval_hours', '24', 'Interval for automatic cleanup')
+('cleanup_interval_hours', '24', 'Interval for automatic cleanup'),
+('raw_count_retention_days', '0', 'Days to keep raw counts before only rollups remain (0 = forever)'),
+('event_uid_retention_days', '7', 'Days a saved event_uid blocks redeliveries of the same event')
 ON CONFLICT (key) DO NOTHING;
 
 -- ======================================================================
@@ -163,4 +250,167 @@ BEGIN
 
     RETURN deleted_count;
 END;
-$$ LANGUAGE plpgsql;
\ No newline at end of file
+$$ LANGUAGE plpgsql;
+
+-- Create monthly pizza_counts partitions covering [p_start, p_end].
+-- Rows already sitting in the default partition for a new month are moved
+-- into it, so this is safe to call at any time. Returns partitions created.
+CREATE OR REPLACE FUNCTION ensure_pizza_counts_partitions(
+    p_start TIMESTAMPTZ DEFAULT CURRENT_TIMESTAMP - INTERVAL '1 month',
+    p_end TIMESTAMPTZ DEFAULT CURRENT_TIMESTAMP + INTERVAL '3 months'
+)
+RETURNS INTEGER AS $$
+DECLARE
+    month_start TIMESTAMPTZ;
+    month_end TIMESTAMPTZ;
+    partition_name TEXT;
+    created_count INTEGER := 0;
+BEGIN
+    month_start := DATE_TRUNC('month', p_start AT TIME ZONE 'UTC') AT TIME ZONE 'UTC';
+
+    WHILE month_start <= p_end LOOP
+        month_end := ((month_start AT TIME ZONE 'UTC') + INTERVAL '1 month') AT TIME ZONE 'UTC';
+        partition_name := 'pizza_counts_' || TO_CHAR(month_start AT TIME ZONE 'UTC', 'YYYY_MM');
+
+        IF to_regclass(partition_name) IS NULL THEN
+            EXECUTE format(
+                'CREATE TABLE %I (LIKE pizza_counts INCLUDING DEFAULTS INCLUDING CONSTRAINTS)',
+                partition_name
+            );
+            -- Move stray rows out of the default partition before attaching
+            EXECUTE format(
+                'WITH moved AS (
+                    DELETE FROM pizza_counts_default
+                    WHERE "timestamp" >= %L AND "timestamp" < %L
+                    RETURNING id, sensor_id, "timestamp", event_uid
+                 )
+                 INSERT INTO %I (id, sensor_id, "timestamp", event_uid)
+                 SELECT id, sensor_id, "timestamp", event_uid FROM moved',
+                month_start, month_end, partition_name
+            );
+            EXECUTE format(
+                'ALTER TABLE pizza_counts ATTACH PARTITION %I FOR VALUES FROM (%L) TO (%L)',
+                partition_name, month_start, month_end
+            );
+            created_count := created_count + 1;
+        END IF;
+
+        month_start := month_end;
+    END LOOP;
+
+    RETURN created_count;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Recompute the hourly and daily rollups from raw counts.
+-- With no arguments everything is rebuilt; otherwise the range is widened
+-- to whole local days so no bucket is left partially recomputed.
+-- Rollups of days whose raw counts were pruned by the maintenance job
+-- (before 'raw_counts_pruned_before') are never touched.
+-- Returns the number of raw counts aggregated.
+CREATE OR REPLACE FUNCTION rebuild_count_rollups(
+    p_start TIMESTAMPTZ DEFAULT NULL,
+    p_end TIMESTAMPTZ DEFAULT NULL
+)
+RETURNS BIGINT AS $$
+DECLARE
+    tz TEXT := system_timezone();
+    pruned_before TIMESTAMPTZ;
+    kept_from TIMESTAMPTZ;
+    range_start TIMESTAMPTZ;
+    range_end TIMESTAMPTZ;
+    aggregated BIGINT;
+BEGIN
+    SELECT value::TIMESTAMPTZ INTO pruned_before
+    FROM system_settings
+    WHERE key = 'raw_counts_pruned_before';
+
+    IF p_start IS NULL AND p_end IS NULL AND pruned_before IS NULL THEN
+        TRUNCATE pizza_counts_hourly, pizza_counts_daily;
+        range_start := '-infinity';
+        range_end := 'infinity';
+    ELSE
+        range_start := COALESCE(
+            DATE_TRUNC('day', p_start AT TIME ZONE tz) AT TIME ZONE tz, '-infinity');
+        range_end := COALESCE(
+            (DATE_TRUNC('day', p_end AT TIME ZONE tz) + INTERVAL '1 day') AT TIME ZONE tz, 'infinity');
+
+        -- First local day whose raw counts are all still there
+        IF pruned_before IS NOT NULL THEN
+            kept_from := DATE_TRUNC('day', pruned_before AT TIME ZONE tz) AT TIME ZONE tz;
+            IF kept_from < pruned_before THEN
+                kept_from := (DATE_TRUNC('day', pruned_before AT TIME ZONE tz) + INTERVAL '1 day') AT TIME ZONE tz;
+            END IF;
+            range_start := GREATEST(range_start, kept_from);
+            IF range_start >= range_end THEN
+                RETURN 0;
+            END IF;
+        END IF;
+
+        DELETE FROM pizza_counts_hourly WHERE bucket >= range_start AND bucket < range_end;
+        DELETE FROM pizza_counts_daily
+        WHERE day >= (range_start AT TIME ZONE tz)::DATE
+          AND day < (range_end AT TIME ZONE tz)::DATE;
+    END IF;
+
+    INSERT INTO pizza_counts_hourly (bucket, sensor_id, total_counts)
+    SELECT DATE_TRUNC('hour', "timestamp"), sensor_id, COUNT(*)
+    FROM pizza_counts
+    WHERE "timestamp" >= range_start AND "timestamp" < range_end
+    GROUP BY 1, 2;
+
+    INSERT INTO pizza_counts_daily (day, sensor_id, total_counts)
+    SELECT ("timestamp" AT TIME ZONE tz)::DATE, sensor_id, COUNT(*)
+    FROM pizza_counts
+    WHERE "timestamp" >= range_start AND "timestamp" < range_end
+    GROUP BY 1, 2;
+
+    SELECT COALESCE(SUM(total_counts), 0) INTO aggregated
+    FROM pizza_counts_daily
+    WHERE day >= (range_start AT TIME ZONE tz)::DATE
+      AND day < (range_end AT TIME ZONE tz)::DATE;
+
+    RETURN aggregated;
+END;
+$$ LANGUAGE plpgsql;
+
+-- ======================================================================
+-- Partition Bootstrap
+-- ======================================================================
+
+-- Partitions for the current window, plus the history of a migrated table,
+-- then a one-off rollup backfill
+DO $$
+DECLARE
+    legacy_min TIMESTAMPTZ;
+    legacy_max TIMESTAMPTZ;
+BEGIN
+    PERFORM ensure_pizza_counts_partitions();
+
+    IF to_regclass('pizza_counts_legacy') IS NOT NULL THEN
+        SELECT MIN("timestamp"), MAX("timestamp") INTO legacy_min, legacy_max
+        FROM pizza_counts_legacy;
+
+        IF legacy_min IS NOT NULL THEN
+            PERFORM ensure_pizza_counts_partitions(legacy_min, legacy_max);
+        END IF;
+
+        -- Pre-partitioning deployments only ever had the single default barrier
+        INSERT INTO pizza_counts (id, sensor_id, "timestamp")
+        SELECT id, 'ESP32_Barrier_001', "timestamp" FROM pizza_counts_legacy;
+
+        PERFORM setval(
+            pg_get_serial_sequence('pizza_counts', 'id'),
+            COALESCE((SELECT MAX(id) FROM pizza_counts), 0) + 1,
+            false
+        );
+
+        DROP TABLE pizza_counts_legacy;
+    END IF;
+
+    -- Backfill rollups for databases that predate them
+    IF NOT EXISTS (SELECT 1 FROM pizza_counts_daily)
+       AND EXISTS (SELECT 1 FROM pizza_counts) THEN
+        PERFORM rebuild_count_rollups();
+    END IF;
+END $$;
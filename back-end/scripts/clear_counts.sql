@@ -2,6 +2,7 @@
 -- ATENÇÃO: Este script apaga TODOS os registros de contagem.
 
 TRUNCATE TABLE pizza_counts RESTART IDENTITY;
+TRUNCATE TABLE pizza_counts_hourly, pizza_counts_daily, pizza_count_events;
 
 -- Opcional: Adicionar um log no banco para registrar a limpeza
 INSERT INTO system_logs (level, message, source) VALUES ('INFO', 'All count records were manually deleted.', 'maintenance_script');
@@ -5,6 +5,8 @@
 BEGIN;
 -- Clear the table to ensure idempotency on repeated runs.
 TRUNCATE TABLE pizza_counts RESTART IDENTITY;
+-- Make sure monthly partitions exist for the whole simulated year.
+SELECT ensure_pizza_counts_partitions(CURRENT_DATE - INTERVAL '366 days', CURRENT_DATE + INTERVAL '1 month');
 -- Use Common Table Expressions (CTEs) to build the data in a readable, step-by-step pipeline.
 WITH
 -- 1. Generate a series of all days in the past year.
@@ -55,7 +57,9 @@ END
 FROM expanded_events
 )
 -- 5. Insert all generated timestamps into the final table.
-INSERT INTO pizza_counts (timestamp)
-SELECT ts FROM final_timestamps;
+INSERT INTO pizza_counts (sensor_id, timestamp)
+SELECT 'ESP32_Barrier_001', ts FROM final_timestamps;
+-- 6. Bulk inserts bypass the backend, so rebuild the hourly/daily rollups.
+SELECT rebuild_count_rollups();
 -- Commit the transaction to make the changes permanent.
 COMMIT;
\ No newline at end of file
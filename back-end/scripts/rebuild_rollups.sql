@@ -0,0 +1,15 @@
+-- back-end/scripts/rebuild_rollups.sql
+-- Recomputes the hourly and daily rollup tables from the raw pizza_counts rows.
+-- Run it after backfilling or bulk-loading counts outside of the backend.
+--
+-- Full rebuild (default):
+--   docker exec -i terelina_db psql -U postgres -d terelina_db < back-end/scripts/rebuild_rollups.sql
+--
+-- To rebuild only a range, call the function directly instead, e.g.:
+--   SELECT rebuild_count_rollups('2025-01-01', '2025-01-31');
+--
+-- Days whose raw counts were pruned (raw_count_retention_days) keep their
+-- existing rollups; only days with raw counts are recomputed.
+BEGIN;
+SELECT rebuild_count_rollups() AS counts_aggregated;
+COMMIT;
@@ -0,0 +1,18 @@
+# back-end/tests/conftest.py
+
+import os
+
+# Modules that build their singletons at import (e.g. the query caches) read
+# the settings; the tests never connect, so placeholders are enough
+for _name, _value in {
+    "DB_HOST": "localhost",
+    "DB_PORT": "5432",
+    "DB_USER": "test",
+    "DB_PASSWORD": "test",
+    "DB_NAME": "test",
+    "MQTT_BROKER_HOST": "localhost",
+    "MQTT_BROKER_PORT": "1883",
+    "MQTT_TOPIC_STATE": "test/state",
+    "MQTT_CLIENT_ID": "test",
+}.items():
+    os.environ.setdefault(_name, _value)
@@ -0,0 +1,58 @@
+# back-end/tests/test_count_batches.py
+
+from app.services.count_batches import CountBatchTracker
+
+
+def _keys(counts):
+    return [key for key, _ in counts]
+
+
+def test_batch_counts_are_keyed_by_cumulative_index():
+    tracker = CountBatchTracker()
+    assert _keys(tracker.process("s1", 1_000, count=2, total=2, seq=1, boot="b")) == ["1", "2"]
+    assert _keys(tracker.process("s1", 2_000, count=1, total=3, seq=2, boot="b")) == ["3"]
+
+
+def test_redelivered_batch_adds_nothing():
+    tracker = CountBatchTracker()
+    tracker.process("s1", 1_000, count=2, total=2, seq=1, boot="b")
+    assert tracker.process("s1", 1_500, count=2, total=2, seq=1, boot="b") == []
+    assert tracker.snapshot()[0]["duplicates"] == 1
+
+
+def test_missed_batch_is_recovered_from_the_total():
+    tracker = CountBatchTracker()
+    tracker.process("s1", 1_000, count=1, total=1, seq=1, boot="b", last_ts_ms=1_000)
+    counts = tracker.process("s1", 5_000, count=1, total=4, seq=3, boot="b", first_ts_ms=5_000, last_ts_ms=5_000)
+    assert _keys(counts) == ["2", "3", "4"]
+    # Recovered counts are spread over the gap, before the batch's own
+    assert [ts for _, ts in counts] == [2_333, 3_666, 5_000]
+    assert tracker.snapshot()[0]["recovered"] == 2
+
+
+def test_counter_reset_starts_a_new_key_epoch():
+    tracker = CountBatchTracker()
+    before = tracker.process("s1", 1_000, count=3, total=3, seq=1, boot="b")
+    # The device's total starts over: indices 1.. would repeat stored uids
+    after = tracker.process("s1", 2_000, count=2, total=2, seq=1, boot="b2")
+    assert _keys(before) == ["1", "2", "3"]
+    assert _keys(after) == ["2000/1", "2000/2"]
+    assert not set(_keys(before)) & set(_keys(after))
+    # The epoch sticks for later batches
+    assert _keys(tracker.process("s1", 3_000, count=1, total=3, seq=2, boot="b2")) == ["2000/3"]
+    assert tracker.snapshot()[0]["resets"] == 1
+
+
+def test_oversized_batch_is_dropped():
+    tracker = CountBatchTracker(max_batch_counts=100)
+    assert tracker.process("s1", 1_000, count=1_000_000_000, total=1_000_000_000, seq=1, boot="b") == []
+    assert tracker.snapshot()[0]["rejected"] == 1
+    # Later batches count from the new baseline
+    assert _keys(tracker.process("s1", 2_000, count=1, total=1_000_000_001, seq=2, boot="b")) == ["1000000001"]
+
+
+def test_oversized_jump_in_total_is_dropped():
+    tracker = CountBatchTracker(max_batch_counts=100)
+    tracker.process("s1", 1_000, count=1, total=1, seq=1, boot="b")
+    assert tracker.process("s1", 2_000, count=1, total=1_000_000, seq=2, boot="b") == []
+    assert tracker.snapshot()[0]["rejected"] == 1
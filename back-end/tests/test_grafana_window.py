@@ -0,0 +1,47 @@
+# back-end/tests/test_grafana_window.py
+
+from datetime import datetime, timezone
+from zoneinfo import ZoneInfo
+
+import pytest
+from fastapi import HTTPException
+
+from app.api.routes.counts import _GRAFANA_SERIES, _grafana_number, _resolve_window
+
+
+@pytest.mark.parametrize("value, expected", [(None, None), ("", None), (60000, 60000.0), ("500", 500.0)])
+def test_grafana_number(value, expected):
+    assert _grafana_number({"intervalMs": value}, "intervalMs") == expected
+
+
+@pytest.mark.parametrize("value", ["abc", [1], {"a": 1}, "Infinity", "NaN", -1])
+def test_grafana_number_rejects_invalid_values(value):
+    with pytest.raises(HTTPException) as raised:
+        _grafana_number({"maxDataPoints": value}, "maxDataPoints")
+    assert raised.value.status_code == 400
+
+
+def test_hourly_window_is_aligned_and_widened_to_max_points():
+    request = {
+        "range": {"from": "2026-03-01T10:30:00Z", "to": "2026-03-03T10:30:00Z"},
+        "intervalMs": 60_000.0,
+        "maxDataPoints": 12.0,
+    }
+    start, end, step_s = _resolve_window(_GRAFANA_SERIES["hourly_counts"], request, timezone.utc)
+    assert step_s == 4 * 3600
+    assert start == datetime(2026, 3, 1, 8, tzinfo=timezone.utc)
+    assert end == datetime(2026, 3, 3, 12, tzinfo=timezone.utc)
+
+
+def test_daily_window_is_whole_local_days():
+    tz = ZoneInfo("America/Sao_Paulo")
+    request = {"range": {"from": "2026-03-01T12:00:00Z", "to": "2026-03-03T12:00:00Z"}}
+    start, end, step_s = _resolve_window(_GRAFANA_SERIES["daily_counts"], request, tz)
+    assert step_s == 86400
+    assert start == datetime(2026, 3, 1, tzinfo=tz)
+    assert end == datetime(2026, 3, 4, tzinfo=tz)
+
+
+def test_invalid_range_falls_back_to_the_default_window():
+    start, end, _ = _resolve_window(_GRAFANA_SERIES["hourly_counts"], {"range": "x"}, timezone.utc)
+    assert (end - start).days >= 7
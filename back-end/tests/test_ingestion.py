@@ -0,0 +1,70 @@
+# back-end/tests/test_ingestion.py
+
+import os
+from datetime import datetime, timezone
+
+import psycopg2
+
+from app.services.ingestion import IngestionPipeline
+from app.services.spool import CountSpool
+
+TS = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+
+def _pipeline(tmp_path, write):
+    spool = CountSpool(str(tmp_path), fsync=False)
+    spool.open()
+    pipeline = IngestionPipeline(spool=spool)
+    pipeline._write = write
+    return pipeline, spool
+
+
+def test_segment_rejected_on_its_data_is_dead_lettered(tmp_path):
+    replayed = []
+
+    def write(counts, events):
+        if any(len(sensor_id) > 64 for _, sensor_id, _ in counts):
+            raise psycopg2.DataError("value too long for type character varying(64)")
+        replayed.extend(counts)
+        return counts
+
+    pipeline, spool = _pipeline(tmp_path, write)
+    spool.append([("00000000-0000-0000-0000-000000000001", "x" * 65, TS)])
+    spool.sealed_segments()  # The next append starts a new segment
+    spool.append([("00000000-0000-0000-0000-000000000002", "line1", TS)])
+
+    # Later segments are replayed even while an earlier one is rejected
+    pipeline._replay()
+    assert [sensor_id for _, sensor_id, _ in replayed] == ["line1"]
+    assert spool.pending == 1
+
+    pipeline._replay()
+    pipeline._replay()
+    assert spool.pending == 0
+    assert spool.get_stats()["counts_dead_lettered"] == 1
+    assert pipeline.get_stats()["replay_dead_letters"] == 1
+    assert [n for n in os.listdir(tmp_path) if n.startswith("deadletter-")]
+    assert pipeline._db_retry_at == 0.0
+
+
+def test_unreachable_database_keeps_the_segment(tmp_path):
+    def write(counts, events):
+        raise psycopg2.OperationalError("connection refused")
+
+    pipeline, spool = _pipeline(tmp_path, write)
+    spool.append([("00000000-0000-0000-0000-000000000001", "line1", TS)])
+    for _ in range(5):
+        pipeline._replay()
+    assert spool.pending == 1
+    assert spool.get_stats()["counts_dead_lettered"] == 0
+    assert pipeline._db_retry_at > 0
+
+
+def test_data_error_does_not_divert_later_batches_to_the_spool(tmp_path):
+    def write(counts, events):
+        raise psycopg2.DataError("value too long for type character varying(64)")
+
+    pipeline, spool = _pipeline(tmp_path, write)
+    pipeline._flush([("00000000-0000-0000-0000-000000000001", "x" * 65, TS)], [])
+    assert spool.pending == 1
+    assert pipeline._db_retry_at == 0.0
@@ -0,0 +1,155 @@
+# back-end/tests/test_payloads.py
+
+import json
+
+import pytest
+
+from app.services.payloads import (
+    CountBatch, StateMessage, _load_json, as_int, normalize_state, parse_count_batch, parse_state_payload,
+    valid_sensor_id,
+)
+
+TOPIC = "terelina/sensor/line1"
+
+
+@pytest.mark.parametrize("payload, state", [
+    (b"clear", "clear"),
+    (b"LIVRE", "clear"),
+    (b"interrupted", "interrupted"),
+    (b"Interrompido", "interrupted"),
+])
+def test_plain_text_payload(payload, state):
+    assert parse_state_payload(TOPIC, payload) == StateMessage(TOPIC, state)
+
+
+def test_compact_payload():
+    assert parse_state_payload(TOPIC, b"C,line1,42,abc,123456,1700000000000") == StateMessage(
+        "line1", "clear", 42, "abc", 123456, 1700000000000
+    )
+
+
+def test_compact_payload_without_wall_clock_or_id():
+    assert parse_state_payload(TOPIC, b"I,,7,abc,900") == StateMessage(TOPIC, "interrupted", 7, "abc", 900, None)
+
+
+@pytest.mark.parametrize("payload", [
+    b"X,line1,1,abc,100",  # Unknown state code
+    b"C,line1,1,abc",  # Too few fields
+    b"C,line1,one,abc,100",  # Non-numeric seq
+    b"C,\xff,1,abc,100",  # Invalid UTF-8
+])
+def test_malformed_compact_payload(payload):
+    assert parse_state_payload(TOPIC, payload) is None
+
+
+def test_json_payload():
+    payload = b'{"id": "line1", "state": "interrompido", "seq": 5, "boot": 99, "t_ms": 1000, "ts": 1700000000000}'
+    assert parse_state_payload(TOPIC, payload) == StateMessage("line1", "interrupted", 5, "99", 1000, 1700000000000)
+
+
+def test_json_payload_without_seq_or_id():
+    assert parse_state_payload(TOPIC, b'{"state": "clear"}') == StateMessage(TOPIC, "clear")
+
+
+def test_json_payload_integral_floats_are_ints():
+    message = parse_state_payload(TOPIC, b'{"state": "clear", "seq": 5.0, "t_ms": 1.5}')
+    assert (message.seq, message.device_ms) == (5, None)
+
+
+@pytest.mark.parametrize("payload", [
+    b"",
+    b"{not json",
+    b"[1, 2]",
+    b'{"state": "open"}',
+    b'{"id": "line1"}',
+    b'{"state": "clear"} trailing',
+])
+def test_invalid_state_payload(payload):
+    assert parse_state_payload(TOPIC, payload) is None
+
+
+@pytest.mark.parametrize("constant", [b"NaN", b"Infinity", b"-Infinity"])
+def test_nan_and_infinity_are_rejected(constant):
+    assert parse_state_payload(TOPIC, b'{"state": "clear", "seq": %s}' % constant) is None
+    assert parse_count_batch(TOPIC, b'{"count": 1, "total": %s}' % constant) is None
+
+
+@pytest.mark.parametrize("payload", [
+    b'{"state": "clear", "id": "a"}',
+    b'  {"state": "clear"}\n',
+    b'{"state": "livre", "id": "\\u00e9"}',
+    '{"state": "clear", "id": "é"}'.encode("utf-16"),
+    b'"clear"',
+    b"123",
+])
+def test_load_json_matches_json_loads(payload):
+    assert _load_json(payload) == json.loads(payload)
+
+
+@pytest.mark.parametrize("payload", [
+    b"", b"{", b"{} {}", b"\xff",
+    b'{"state": "clear"}\x1c',  # str.isspace() but not JSON whitespace
+    '{"state": "clear"}\u00a0'.encode(),
+])
+def test_load_json_raises_value_error(payload):
+    with pytest.raises(ValueError):
+        _load_json(payload)
+
+
+def test_count_batch():
+    payload = (b'{"id": "line1", "count": 3, "total": 120, "seq": 9, "boot": "abc", '
+               b'"first_t_ms": 100, "last_t_ms": 900, "first_ts": 1700000000100, "last_ts": 1700000000900}')
+    assert parse_count_batch(TOPIC, payload) == CountBatch(
+        "line1", 3, 120, 9, "abc", 100, 900, 1700000000100, 1700000000900
+    )
+
+
+@pytest.mark.parametrize("payload", [
+    None,
+    b"[]",
+    b'{"count": -1, "total": 5}',
+    b'{"count": 1}',
+    b'{"count": "1", "total": 5}',
+    b'{"count": true, "total": 5}',
+])
+def test_invalid_count_batch(payload):
+    assert parse_count_batch(TOPIC, payload) is None
+
+
+@pytest.mark.parametrize("value, expected", [
+    (5, 5), (5.0, 5), (5.5, None), (True, None), ("5", None), (None, None),
+    (float("inf"), None), (float("nan"), None),
+])
+def test_as_int(value, expected):
+    assert as_int(value) == expected
+
+
+@pytest.mark.parametrize("raw, state", [
+    ("clear", "clear"), (" Livre ", "clear"), ("INTERROMPIDA", "interrupted"),
+    ("interrupted_by_pizza", "interrupted"), ("open", None), (None, None), (1, None),
+])
+def test_normalize_state(raw, state):
+    assert normalize_state(raw) == state
+
+
+@pytest.mark.parametrize("sensor_id, valid", [
+    ("line1", True), ("x" * 64, True), ("linha-é", True),
+    ("x" * 65, False), ("", False), ("line\x001", False), ("line\n1", False), ("line\x1b1", False),
+])
+def test_valid_sensor_id(sensor_id, valid):
+    assert valid_sensor_id(sensor_id) is valid
+
+
+@pytest.mark.parametrize("topic, payload", [
+    ("t/" + "x" * 70, b"clear"),
+    (TOPIC, b'{"state": "clear", "id": "%s"}' % (b"x" * 65)),
+    (TOPIC, b'{"state": "clear", "id": "a\\u0000b"}'),
+    (TOPIC, b"C," + b"x" * 65 + b",1,abc,100"),
+    (TOPIC, b"C,a\x00b,1,abc,100"),
+])
+def test_invalid_sensor_id_is_rejected(topic, payload):
+    assert parse_state_payload(topic, payload) is None
+
+
+def test_count_batch_with_invalid_sensor_id_is_rejected():
+    assert parse_count_batch(TOPIC, b'{"id": "%s", "count": 1, "total": 1}' % (b"x" * 65)) is None
@@ -0,0 +1,132 @@
+# back-end/tests/test_pool.py
+
+import threading
+import time
+
+import psycopg2
+import pytest
+from psycopg2 import extensions
+
+from app.db import pool as pool_module
+from app.db.pool import BoundedConnectionPool, PoolTimeout
+
+
+class FakeConnection:
+    """Just enough of a psycopg2 connection for the pool."""
+
+    def __init__(self):
+        self.closed = 0
+        self.status = extensions.TRANSACTION_STATUS_IDLE
+        self.rollbacks = 0
+
+    def get_transaction_status(self):
+        return self.status
+
+    def rollback(self):
+        self.rollbacks += 1
+        self.status = extensions.TRANSACTION_STATUS_IDLE
+
+    def close(self):
+        self.closed = 1
+
+
+@pytest.fixture
+def connections(monkeypatch):
+    """Every connection the pool opens, in order."""
+    opened = []
+
+    def connect(**kwargs):
+        conn = FakeConnection()
+        opened.append(conn)
+        return conn
+
+    monkeypatch.setattr(pool_module.psycopg2, "connect", connect)
+    return opened
+
+
+def test_opens_minconn_connections(connections):
+    pool = BoundedConnectionPool(minconn=2, maxconn=4)
+    assert len(connections) == 2
+    assert pool.get_stats()["idle"] == 2
+
+
+def test_rejects_invalid_bounds(connections):
+    with pytest.raises(ValueError):
+        BoundedConnectionPool(minconn=3, maxconn=2)
+
+
+def test_exhausted_pool_times_out(connections):
+    pool = BoundedConnectionPool(minconn=0, maxconn=2)
+    pool.getconn()
+    pool.getconn()
+    started = time.monotonic()
+    with pytest.raises(PoolTimeout):
+        pool.getconn(timeout=0.1)
+    assert time.monotonic() - started >= 0.1
+    stats = pool.get_stats()
+    assert stats["timeouts"] == 1
+    assert stats["in_use"] == 2
+    assert len(connections) == 2
+
+
+def test_waiter_gets_a_released_connection(connections):
+    pool = BoundedConnectionPool(minconn=0, maxconn=1)
+    conn = pool.getconn()
+    threading.Timer(0.05, pool.putconn, (conn,)).start()
+    assert pool.getconn(timeout=2) is conn
+    assert pool.get_stats()["wait_ms_max"] >= 40
+
+
+def test_returned_connection_is_reused(connections):
+    pool = BoundedConnectionPool(minconn=0, maxconn=2)
+    conn = pool.getconn()
+    pool.putconn(conn)
+    assert pool.getconn() is conn
+    assert len(connections) == 1
+
+
+def test_open_transaction_is_rolled_back_on_return(connections):
+    pool = BoundedConnectionPool(minconn=0, maxconn=1)
+    conn = pool.getconn()
+    conn.status = extensions.TRANSACTION_STATUS_INTRANS
+    pool.putconn(conn)
+    assert conn.rollbacks == 1
+    assert pool.get_stats()["idle"] == 1
+
+
+def test_broken_connection_frees_its_slot(connections):
+    pool = BoundedConnectionPool(minconn=0, maxconn=1)
+    conn = pool.getconn()
+    pool.putconn(conn, close=True)
+    assert conn.closed
+    replacement = pool.getconn(timeout=0.1)
+    assert replacement is not conn
+    assert pool.get_stats()["total"] == 1
+
+
+def test_expired_connection_is_recycled(connections):
+    pool = BoundedConnectionPool(minconn=0, maxconn=1, max_lifetime_s=0)
+    conn = pool.getconn()
+    pool.putconn(conn)
+    assert conn.closed
+    assert pool.get_stats()["recycled"] == 1
+
+
+def test_failed_connect_releases_the_slot(connections, monkeypatch):
+    pool = BoundedConnectionPool(minconn=0, maxconn=1)
+
+    def refuse(**kwargs):
+        raise psycopg2.OperationalError("connection refused")
+
+    monkeypatch.setattr(pool_module.psycopg2, "connect", refuse)
+    with pytest.raises(psycopg2.OperationalError):
+        pool.getconn()
+    assert pool.get_stats()["total"] == 0
+
+
+def test_closed_pool_refuses_checkouts(connections):
+    pool = BoundedConnectionPool(minconn=1, maxconn=1)
+    pool.closeall()
+    assert connections[0].closed
+    with pytest.raises(psycopg2.pool.PoolError):
+        pool.getconn()
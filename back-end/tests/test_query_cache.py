@@ -0,0 +1,94 @@
+# back-end/tests/test_query_cache.py
+
+import time
+
+from app.services.query_cache import QueryCache
+
+
+def _cache(**kwargs) -> QueryCache:
+    return QueryCache(max_bytes=kwargs.get("max_bytes", 1_000), max_entries=kwargs.get("max_entries", 10))
+
+
+def test_hit_and_miss():
+    cache = _cache()
+    assert cache.get(("a",)) is None
+    cache.put(("a",), 1, ttl_s=60, size=10, start=0, end=100)
+    assert cache.get(("a",)) == 1
+    stats = cache.get_stats()
+    assert (stats["hits"], stats["misses"]) == (1, 1)
+
+
+def test_expired_entry_is_a_miss():
+    cache = _cache()
+    cache.put(("a",), 1, ttl_s=0.01, size=10, start=0, end=100)
+    time.sleep(0.02)
+    assert cache.get(("a",)) is None
+    assert cache.get_stats()["entries"] == 0
+
+
+def test_put_after_invalidation_is_skipped():
+    cache = _cache()
+    generation = cache.generation
+    # A count lands while the query runs
+    cache.invalidate_range(50, 60)
+    cache.put(("a",), "stale", ttl_s=60, size=10, start=0, end=100, generation=generation)
+    assert cache.get(("a",)) is None
+
+
+def test_put_with_current_generation_is_stored():
+    cache = _cache()
+    cache.invalidate_range(50, 60)
+    cache.put(("a",), "fresh", ttl_s=60, size=10, start=0, end=100, generation=cache.generation)
+    assert cache.get(("a",)) == "fresh"
+
+
+def test_clear_bumps_the_generation():
+    cache = _cache()
+    generation = cache.generation
+    cache.clear()
+    cache.put(("a",), "stale", ttl_s=60, size=10, start=0, end=100, generation=generation)
+    assert cache.get(("a",)) is None
+
+
+def test_invalidate_range_drops_only_overlapping_entries():
+    cache = _cache()
+    cache.put(("before",), 1, ttl_s=60, size=10, start=0, end=100)
+    cache.put(("during",), 2, ttl_s=60, size=10, start=100, end=200)
+    cache.put(("after",), 3, ttl_s=60, size=10, start=200, end=300)
+    cache.invalidate_range(150, 160)
+    assert cache.get(("before",)) == 1
+    assert cache.get(("during",)) is None
+    assert cache.get(("after",)) == 3
+    assert cache.get_stats()["invalidations"] == 1
+
+
+def test_range_end_is_exclusive():
+    cache = _cache()
+    cache.put(("a",), 1, ttl_s=60, size=10, start=0, end=100)
+    cache.invalidate_range(100, 110)
+    assert cache.get(("a",)) == 1
+
+
+def test_evicts_least_recently_used_by_size():
+    cache = _cache(max_bytes=25)
+    cache.put(("a",), 1, ttl_s=60, size=10, start=0, end=1)
+    cache.put(("b",), 2, ttl_s=60, size=10, start=0, end=1)
+    cache.get(("a",))
+    cache.put(("c",), 3, ttl_s=60, size=10, start=0, end=1)
+    assert cache.get(("b",)) is None
+    assert cache.get(("a",)) == 1
+    assert cache.get_stats()["evictions"] == 1
+
+
+def test_evicts_by_entry_count():
+    cache = _cache(max_entries=2)
+    for key in "abc":
+        cache.put((key,), key, ttl_s=60, size=1, start=0, end=1)
+    assert cache.get(("a",)) is None
+    assert cache.get_stats()["entries"] == 2
+
+
+def test_oversized_value_is_not_cached():
+    cache = _cache(max_bytes=10)
+    cache.put(("a",), 1, ttl_s=60, size=11, start=0, end=1)
+    assert cache.get(("a",)) is None
@@ -0,0 +1,154 @@
+# back-end/tests/test_recent_index.py
+
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from app.services import recent_index as recent_index_module
+from app.services.recent_index import RecentCountIndex, to_ms
+
+# Whole minutes, so bucket boundaries in the tests are predictable
+NOW = datetime.now(timezone.utc).replace(second=0, microsecond=0)
+
+
+class FakeCursor:
+    def __init__(self, rows, on_select):
+        self._rows = rows
+        self._on_select = on_select
+        self._result = []
+        self.itersize = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, sql, params=None):
+        if "system_timezone" in sql:
+            self._result = [("UTC",)]
+        elif "FROM pizza_counts" in sql:
+            cutoff_ms = to_ms(params[0])
+            rows = sorted(self._rows, key=lambda row: row[1])  # ORDER BY "timestamp"
+            self._result = [(s, to_ms(ts)) for s, ts in rows if to_ms(ts) >= cutoff_ms]
+            self._on_select()
+
+    def fetchone(self):
+        return self._result[0]
+
+    def __iter__(self):
+        return iter(self._result)
+
+
+class FakeConnection:
+    def __init__(self, rows, on_select):
+        self._rows = rows
+        self._on_select = on_select
+
+    def cursor(self, name=None):
+        return FakeCursor(self._rows, self._on_select)
+
+    def rollback(self):
+        pass
+
+
+@pytest.fixture
+def database(monkeypatch):
+    """The committed (sensor_id, timestamp) rows load() reads, plus a hook run during its SELECT."""
+    state = {"rows": [], "on_select": lambda: None}
+
+    @contextmanager
+    def get_db_connection():
+        yield FakeConnection(state["rows"], lambda: state["on_select"]())
+
+    monkeypatch.setattr(recent_index_module, "get_db_connection", get_db_connection)
+    return state
+
+
+def _minutes_ago(minutes: float) -> datetime:
+    return NOW - timedelta(minutes=minutes)
+
+
+def test_not_loaded_until_load(database):
+    index = RecentCountIndex(horizon_s=3600)
+    index.record_batch([("s1", _minutes_ago(1))])
+    assert not index.is_loaded()
+    assert not index.covers(_minutes_ago(10))
+    assert index.count_range(_minutes_ago(10), NOW) == 0
+
+
+def test_load_keeps_only_the_horizon(database):
+    database["rows"] = [("s1", _minutes_ago(120)), ("s1", _minutes_ago(30)), ("s2", _minutes_ago(10))]
+    index = RecentCountIndex(horizon_s=3600)
+    index.load()
+    assert index.is_loaded()
+    assert index.get_stats()["counts"] == 2
+    assert index.covers(_minutes_ago(55))
+    assert not index.covers(_minutes_ago(65))
+
+
+def test_count_range_is_half_open(database):
+    database["rows"] = [("s1", _minutes_ago(m)) for m in (50, 40, 30, 20, 10)]
+    index = RecentCountIndex(horizon_s=3600)
+    index.load()
+    assert index.count_range(_minutes_ago(40), _minutes_ago(20)) == 2
+    assert index.count_range(_minutes_ago(60), NOW) == 5
+    assert index.count_range(_minutes_ago(5), NOW) == 0
+
+
+def test_count_range_by_sensor(database):
+    database["rows"] = [("s1", _minutes_ago(30)), ("s2", _minutes_ago(20)), ("s2", _minutes_ago(10))]
+    index = RecentCountIndex(horizon_s=3600)
+    index.load()
+    assert index.count_range(_minutes_ago(60), NOW, sensor_id="s1") == 1
+    assert index.count_range(_minutes_ago(60), NOW, sensor_id="s2") == 2
+    assert index.count_range(_minutes_ago(60), NOW, sensor_id="missing") == 0
+
+
+def test_record_batch_keeps_late_counts_sorted(database):
+    index = RecentCountIndex(horizon_s=3600)
+    index.load()
+    index.record_batch([("s1", _minutes_ago(10)), ("s1", _minutes_ago(5))])
+    index.record_batch([("s1", _minutes_ago(7))])  # Late (e.g. spool replay)
+    assert index.first_last(_minutes_ago(60), NOW) == (to_ms(_minutes_ago(10)), to_ms(_minutes_ago(5)))
+    assert index.count_range(_minutes_ago(8), _minutes_ago(6)) == 1
+
+
+def test_record_batch_ignores_counts_before_the_horizon(database):
+    index = RecentCountIndex(horizon_s=3600)
+    index.load()
+    index.record_batch([("s1", _minutes_ago(120))])
+    assert index.get_stats()["counts"] == 0
+
+
+# Both code paths: fewer counts than buckets (binned), and more (bisected per edge)
+@pytest.mark.parametrize("per_minute, step_s", [(1, 1), (1, 300), (20, 60)])
+def test_histogram_matches_per_bucket_counts(database, per_minute, step_s):
+    database["rows"] = [("s1", _minutes_ago(m / per_minute)) for m in range(1, 50 * per_minute)]
+    index = RecentCountIndex(horizon_s=3600)
+    index.load()
+    start, end = _minutes_ago(50), NOW
+    expected = []
+    bucket = to_ms(start) // (step_s * 1000) * step_s * 1000
+    while bucket < to_ms(end):
+        bucket_start = datetime.fromtimestamp(bucket / 1000, tz=timezone.utc)
+        count = index.count_range(max(bucket_start, start), bucket_start + timedelta(seconds=step_s))
+        if count:
+            expected.append((bucket, count))
+        bucket += step_s * 1000
+    assert index.histogram(start, end, step_s) == expected
+
+
+def test_batches_committed_during_load_are_replayed_once(database):
+    lock = threading.Lock()
+    index = RecentCountIndex(horizon_s=3600, consistency_lock=lock)
+    index.load()
+    # Committed before the new load's snapshot: in the database rows
+    database["rows"] = [("s1", _minutes_ago(30))]
+    # Committed while the load reads: only reaches the index as a batch
+    database["on_select"] = lambda: index.record_batch([("s1", _minutes_ago(5))])
+    index.load()
+    assert index.count_range(_minutes_ago(60), NOW) == 2
+    assert index.get_stats()["counts"] == 2
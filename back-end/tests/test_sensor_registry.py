@@ -0,0 +1,98 @@
+# back-end/tests/test_sensor_registry.py
+
+from app.services.sensor_registry import SensorRegistry
+
+
+def _feed(registry, messages, sensor_id="s1", boot="b1"):
+    """Feeds (seq, state, device_ms) messages; returns the event ms of each count."""
+    counted = []
+    for seq, state, device_ms in messages:
+        event_ms = registry.process(sensor_id, state, 1_000_000 + device_ms, seq=seq, boot=boot,
+                                    device_ms=device_ms)
+        if event_ms is not None:
+            counted.append(event_ms)
+    return counted
+
+
+def test_arrival_order_counts_interrupted_to_clear():
+    registry = SensorRegistry(debounce_ms=100)
+    assert registry.process("s1", "clear", 1_000) is None
+    assert registry.process("s1", "interrupted", 2_000) is None
+    assert registry.process("s1", "clear", 3_000) == 3_000
+
+
+def test_arrival_order_debounces_flicker():
+    registry = SensorRegistry(debounce_ms=100)
+    registry.process("s1", "interrupted", 1_000)
+    assert registry.process("s1", "clear", 1_050) is None
+    assert registry.snapshot()[0]["debounced"] == 1
+    assert registry.process("s1", "clear", 1_200) == 1_200
+
+
+def test_sensors_are_independent():
+    registry = SensorRegistry(debounce_ms=100)
+    registry.process("a", "interrupted", 1_000)
+    registry.process("b", "interrupted", 1_010)
+    assert registry.process("b", "clear", 2_000) == 2_000
+    assert registry.process("a", "clear", 2_010) == 2_010
+
+
+def test_redelivered_sequenced_messages_count_once():
+    registry = SensorRegistry(debounce_ms=50)
+    messages = [(1, "interrupted", 100), (2, "clear", 400)]
+    assert len(_feed(registry, messages)) == 1
+    # QoS 1 redelivery of both messages
+    assert _feed(registry, messages) == []
+    sensor = registry.snapshot()[0]
+    assert sensor["duplicates"] == 2
+    assert sensor["counts"] == 1
+
+
+def test_reordered_sequenced_messages_count_once():
+    registry = SensorRegistry(debounce_ms=50)
+    # The clear (seq 2) arrives before the interrupted (seq 1) it follows
+    counted = _feed(registry, [(2, "clear", 400), (1, "interrupted", 100), (3, "interrupted", 900),
+                               (4, "clear", 1_200)])
+    assert len(counted) == 2
+    sensor = registry.snapshot()[0]
+    assert sensor["out_of_order"] == 1
+    assert sensor["gaps"] == 0
+    assert sensor["last_seq"] == 4
+    assert sensor["last_state"] == "clear"
+
+
+def test_sequenced_messages_debounce_on_device_time():
+    registry = SensorRegistry(debounce_ms=100)
+    assert _feed(registry, [(1, "interrupted", 1_000), (2, "clear", 1_040)]) == []
+    assert registry.snapshot()[0]["debounced"] == 1
+
+
+def test_gap_is_reported_and_filled_by_late_message():
+    registry = SensorRegistry(debounce_ms=50)
+    _feed(registry, [(1, "interrupted", 100), (4, "interrupted", 900)])
+    assert registry.snapshot()[0]["gaps"] == 2
+    _feed(registry, [(2, "clear", 400)])
+    assert registry.snapshot()[0]["gaps"] == 1
+
+
+def test_new_boot_restarts_the_sequence():
+    registry = SensorRegistry(debounce_ms=50)
+    assert len(_feed(registry, [(1, "interrupted", 100), (2, "clear", 400)], boot="b1")) == 1
+    # Same seqs after a reboot are new messages, not duplicates
+    assert len(_feed(registry, [(1, "interrupted", 100), (2, "clear", 400)], boot="b2")) == 1
+    assert registry.snapshot()[0]["duplicates"] == 0
+
+
+def test_messages_older_than_the_reorder_window_are_dropped():
+    registry = SensorRegistry(debounce_ms=50, reorder_window=4)
+    _feed(registry, [(seq, "interrupted" if seq % 2 else "clear", seq * 1_000) for seq in range(1, 11)])
+    assert _feed(registry, [(2, "clear", 2_000)]) == []
+    assert registry.snapshot()[0]["duplicates"] == 1
+
+
+def test_idle_sensors_are_evicted():
+    registry = SensorRegistry(idle_ttl_s=60)
+    registry.process("old", "clear", 0)
+    registry.process("new", "clear", 61_000)
+    assert [s["sensor_id"] for s in registry.snapshot()] == ["new"]
+    assert registry.evicted == 1
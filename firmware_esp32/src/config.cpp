@@ -22,8 +22,22 @@ const char* MQTT_PASSWORD      = "";                  // MQTT password (leave bl
 // IMPORTANT: These topics MUST match what the backend is subscribed to.
 const char* MQTT_TOPIC_STATE     = "sensors/barrier/state";
 const char* MQTT_TOPIC_HEARTBEAT = "sensors/barrier/heartbeat";
+const char* MQTT_TOPIC_COUNTS    = "sensors/barrier/counts";
 const char* MQTT_CLIENT_ID       = "ESP32_Barrier_001"; // Unique device identifier
 
+// --- PAYLOAD FORMAT ---
+// The compact format is smaller and cheaper to parse on busy lines, but
+// drops the diagnostic fields (rssi, uptime_s). Requires a backend that
+// understands it.
+const bool MQTT_COMPACT_PAYLOAD = false;
+
+// =====================================================================
+// Time Synchronization
+// =====================================================================
+// Until the clock is synced, events only carry device uptime ("t_ms") and
+// the backend estimates their wall-clock time.
+const char* NTP_SERVER = "pool.ntp.org";
+
 // =====================================================================
 // Hardware Pinout & Behavior
 // =====================================================================
@@ -35,4 +49,13 @@ const bool SENSOR_ACTIVE_LOW = true; // Use true if the sensor outputs a LOW sig
 // Timing Configuration
 // =====================================================================
 const unsigned long HEARTBEAT_INTERVAL_MS    = 60000; // 60 seconds
-const unsigned long SENSOR_DEBOUNCE_DELAY_MS = 50;    // 50 milliseconds
\ No newline at end of file
+const unsigned long SENSOR_DEBOUNCE_DELAY_MS = 50;    // 50 milliseconds
+
+// =====================================================================
+// Edge-Count Mode
+// =====================================================================
+// Recommended for fast lines: one small message per batch instead of two
+// per product. The backend must subscribe to MQTT_TOPIC_COUNTS.
+const bool          COUNT_MODE_EDGE         = false;
+const unsigned long COUNT_BATCH_INTERVAL_MS = 5000; // 5 seconds
+const uint32_t      COUNT_BATCH_MAX_ITEMS   = 50;
\ No newline at end of file
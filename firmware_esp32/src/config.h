@@ -17,7 +17,14 @@ extern const char* MQTT_USER;
 extern const char* MQTT_PASSWORD;
 extern const char* MQTT_TOPIC_STATE;     // Topic to publish sensor state, e.g., "sensors/barrier/state"
 extern const char* MQTT_TOPIC_HEARTBEAT; // Topic for device status heartbeat, e.g., "sensors/barrier/heartbeat"
+extern const char* MQTT_TOPIC_COUNTS;    // Topic for batched counts in edge-count mode, e.g., "sensors/barrier/counts"
 extern const char* MQTT_CLIENT_ID;       // Unique client ID, also used as device_id in the payload
+extern const bool  MQTT_COMPACT_PAYLOAD; // If true, publish states as "I|C,<id>,<seq>,<boot>,<t_ms>[,<ts>]" instead of JSON
+
+// =====================================================================
+// Time Synchronization
+// =====================================================================
+extern const char* NTP_SERVER; // Used to stamp events with wall-clock time ("ts")
 
 // =====================================================================
 // Hardware Pinout & Behavior
@@ -32,4 +39,11 @@ extern const bool SENSOR_ACTIVE_LOW; // If true, a LOW signal means the beam is
 extern const unsigned long HEARTBEAT_INTERVAL_MS;   // Interval for sending MQTT heartbeat messages (in milliseconds)
 extern const unsigned long SENSOR_DEBOUNCE_DELAY_MS; // Debounce delay to prevent false readings (in milliseconds)
 
+// =====================================================================
+// Edge-Count Mode
+// =====================================================================
+extern const bool          COUNT_MODE_EDGE;         // If true, count on the device and publish batches instead of states
+extern const unsigned long COUNT_BATCH_INTERVAL_MS; // Publish a non-empty batch at least this often (in milliseconds)
+extern const uint32_t      COUNT_BATCH_MAX_ITEMS;   // Publish as soon as a batch holds this many counts
+
 #endif // CONFIG_H
\ No newline at end of file
@@ -0,0 +1,80 @@
+/**
+ * @file edge_counter.cpp
+ * @brief Edge-count mode: on-device counting with batched MQTT deltas.
+ *
+ * Each batch carries the number of products since the previous batch, the
+ * time of the first and last of them, and the cumulative total. The backend
+ * treats the total as the source of truth, so a lost batch is recovered
+ * from the next one and a repeated batch adds nothing.
+ */
+
+#include "edge_counter.h"
+#include "config.h"
+#include "mqtt.h"
+#include <Preferences.h>
+#include <esp_timer.h>
+
+// =====================================================================
+// Global and Static Variables
+// =====================================================================
+static Preferences prefs;
+static const char* PREFS_NAMESPACE = "terelina";
+static const char* PREFS_TOTAL_KEY = "total";
+
+static uint32_t cumulativeTotal = 0;  // All products ever counted by this device
+static uint32_t persistedTotal = 0;   // Last value written to flash
+
+// Pending (not yet published) batch
+static uint32_t batchCount = 0;
+static uint64_t batchFirstMs = 0;
+static uint64_t batchLastMs = 0;
+static unsigned long batchStartedMillis = 0;
+
+// =====================================================================
+// Public Functions
+// =====================================================================
+
+void setupEdgeCounter() {
+  prefs.begin(PREFS_NAMESPACE, false);
+  cumulativeTotal = prefs.getUInt(PREFS_TOTAL_KEY, 0);
+  persistedTotal = cumulativeTotal;
+  Serial.printf("[Edge] Edge-count mode enabled. Cumulative total: %lu\n", (unsigned long)cumulativeTotal);
+}
+
+void recordEdgeCount(uint64_t eventUptimeMs) {
+  if (batchCount == 0) {
+    batchFirstMs = eventUptimeMs;
+    batchStartedMillis = millis();
+  }
+  batchCount++;
+  batchLastMs = eventUptimeMs;
+  cumulativeTotal++;
+}
+
+void handleEdgeCounter() {
+  if (batchCount == 0) {
+    return;
+  }
+  if (batchCount < COUNT_BATCH_MAX_ITEMS && millis() - batchStartedMillis < COUNT_BATCH_INTERVAL_MS) {
+    return;
+  }
+
+  // Persist before publishing, so the backend never sees a total that a
+  // reboot could take back. Writes happen at most once per batch interval
+  // to spare the flash.
+  if (cumulativeTotal != persistedTotal) {
+    prefs.putUInt(PREFS_TOTAL_KEY, cumulativeTotal);
+    persistedTotal = cumulativeTotal;
+  }
+
+  if (publishCountBatch(batchCount, cumulativeTotal, batchFirstMs, batchLastMs)) {
+    batchCount = 0;
+  } else {
+    // Keep accumulating; the next attempt covers these counts too
+    batchStartedMillis = millis();
+  }
+}
+
+uint32_t getEdgeCountTotal() {
+  return cumulativeTotal;
+}
@@ -0,0 +1,35 @@
+#ifndef EDGE_COUNTER_H
+#define EDGE_COUNTER_H
+
+#include <Arduino.h>
+
+// =====================================================================
+// Edge-Count Mode
+// =====================================================================
+// Instead of publishing every beam change, the device detects the
+// interrupted -> clear edge itself and publishes batched count deltas
+// together with a cumulative total that survives reboots (NVS).
+
+/**
+ * @brief Loads the persisted cumulative total. Call once in setup().
+ */
+void setupEdgeCounter();
+
+/**
+ * @brief Records one detected product.
+ * @param eventUptimeMs Device uptime (ms, from esp_timer) when the beam cleared.
+ */
+void recordEdgeCount(uint64_t eventUptimeMs);
+
+/**
+ * @brief Publishes the pending batch when it is full or old enough.
+ * Call this in every main loop() iteration.
+ */
+void handleEdgeCounter();
+
+/**
+ * @brief Returns the cumulative number of products counted by this device.
+ */
+uint32_t getEdgeCountTotal();
+
+#endif // EDGE_COUNTER_H
@@ -10,6 +10,9 @@
 #include "config.h"
 #include <Arduino.h>
 #include <WiFiClient.h>
+#include <esp_timer.h>
+#include <esp_system.h>
+#include <sys/time.h>
 
 // =====================================================================
 // Global and Static Variables
@@ -20,13 +23,25 @@ PubSubClient mqttClient(wifiClient);
 static unsigned long lastMqttReconnectAttempt = 0;
 static const unsigned long RECONNECT_INTERVAL_MS = 5000; // Attempt to reconnect every 5 seconds
 
+// Identifies this boot; sequence numbers restart from 1 on every boot
+static char bootId[9] = "";
+static uint32_t eventSeq = 0;
+static uint32_t batchSeq = 0;
+
+// Any wall-clock time before this means NTP has not synced yet (2020-09-13)
+static const time_t MIN_VALID_EPOCH_S = 1600000000;
+
 // =====================================================================
 // Core MQTT Functions (Initialization and Loop)
 // =====================================================================
 
 void setupMqtt() {
+  // WiFi is up at this point, so esp_random() is seeded by RF noise
+  snprintf(bootId, sizeof(bootId), "%08lx", (unsigned long)esp_random());
+  configTime(0, 0, NTP_SERVER); // Syncs in the background; UTC
+
   mqttClient.setServer(MQTT_BROKER_HOST, MQTT_BROKER_PORT);
-  mqttClient.setBufferSize(256); // A buffer of 256 bytes is sufficient for our JSON payload
+  mqttClient.setBufferSize(384); // Topic + JSON payload with sequence and timestamps
   mqttClient.setKeepAlive(30);   // More resilient to network fluctuations
   mqttClient.setSocketTimeout(5); // Prevent long blocking calls
 }
@@ -85,24 +100,75 @@ void loopMqtt() {
 // Data Publishing Functions
 // =====================================================================
 
-void publishSensorState(bool isInterrupted) {
+/**
+ * @brief Converts a device uptime into epoch milliseconds.
+ * @return False while the clock has not been synced by NTP.
+ */
+static bool uptimeToEpochMs(uint64_t uptimeMs, uint64_t* epochMs) {
+  struct timeval tv;
+  gettimeofday(&tv, nullptr);
+  if (tv.tv_sec < MIN_VALID_EPOCH_S) {
+    return false;
+  }
+  uint64_t nowEpochMs = (uint64_t)tv.tv_sec * 1000ULL + tv.tv_usec / 1000;
+  uint64_t nowUptimeMs = esp_timer_get_time() / 1000;
+  *epochMs = nowEpochMs - (nowUptimeMs - uptimeMs);
+  return true;
+}
+
+void publishSensorState(bool isInterrupted, uint64_t eventUptimeMs) {
+  // Number every change, published or not: a missing number tells the
+  // backend an event was lost
+  uint32_t seq = ++eventSeq;
+
   if (!isMqttConnected()) {
-    Serial.println(F("[MQTT] Not connected. Cannot publish sensor state."));
+    Serial.printf("[MQTT] Not connected. Cannot publish sensor state (seq %lu).\n", (unsigned long)seq);
+    return;
+  }
+
+  uint64_t epochMs;
+  bool haveEpoch = uptimeToEpochMs(eventUptimeMs, &epochMs);
+
+  if (MQTT_COMPACT_PAYLOAD) {
+    // Same fields as the JSON payload below, in fixed order
+    char compactBuffer[96];
+    int len = snprintf(compactBuffer, sizeof(compactBuffer), "%c,%s,%lu,%s,%llu",
+                       isInterrupted ? 'I' : 'C', MQTT_CLIENT_ID, (unsigned long)seq, bootId,
+                       (unsigned long long)eventUptimeMs);
+    if (haveEpoch && len > 0 && len < (int)sizeof(compactBuffer)) {
+      snprintf(compactBuffer + len, sizeof(compactBuffer) - len, ",%llu", (unsigned long long)epochMs);
+    }
+    if (mqttClient.publish(MQTT_TOPIC_STATE, compactBuffer)) {
+      Serial.print(F("[MQTT] State published: "));
+      Serial.println(compactBuffer);
+    } else {
+      Serial.println(F("[MQTT] Failed to publish state."));
+    }
     return;
   }
 
-  StaticJsonDocument<128> doc;
+  StaticJsonDocument<256> doc;
   doc["id"] = MQTT_CLIENT_ID;
   
   // --- PAYLOAD ALIGNMENT ---
   // The backend expects "interrupted" or "clear".
   doc["state"] = isInterrupted ? "interrupted" : "clear";
+
+  // --- Event identity and timing ---
+  // (boot, seq) lets the backend drop QoS 1 redeliveries and restore order;
+  // t_ms (uptime) is used for debouncing, ts (epoch ms) as the event time.
+  doc["seq"] = seq;
+  doc["boot"] = bootId;
+  doc["t_ms"] = eventUptimeMs;
+  if (haveEpoch) {
+    doc["ts"] = epochMs;
+  }
   
   // Optional diagnostic data
   doc["rssi"] = WiFi.RSSI();
   doc["uptime_s"] = millis() / 1000;
 
-  char jsonBuffer[128];
+  char jsonBuffer[256];
   serializeJson(doc, jsonBuffer);
 
   if (mqttClient.publish(MQTT_TOPIC_STATE, jsonBuffer)) {
@@ -113,6 +179,41 @@ void publishSensorState(bool isInterrupted) {
   }
 }
 
+bool publishCountBatch(uint32_t count, uint32_t total, uint64_t firstUptimeMs, uint64_t lastUptimeMs) {
+  if (!isMqttConnected()) {
+    return false;
+  }
+
+  StaticJsonDocument<256> doc;
+  doc["id"] = MQTT_CLIENT_ID;
+  doc["seq"] = batchSeq + 1;
+  doc["boot"] = bootId;
+  doc["count"] = count;
+  doc["total"] = total;
+  doc["first_t_ms"] = firstUptimeMs;
+  doc["last_t_ms"] = lastUptimeMs;
+  uint64_t epochMs;
+  if (uptimeToEpochMs(firstUptimeMs, &epochMs)) {
+    doc["first_ts"] = epochMs;
+  }
+  if (uptimeToEpochMs(lastUptimeMs, &epochMs)) {
+    doc["last_ts"] = epochMs;
+  }
+
+  char jsonBuffer[256];
+  serializeJson(doc, jsonBuffer);
+
+  if (!mqttClient.publish(MQTT_TOPIC_COUNTS, jsonBuffer)) {
+    Serial.println(F("[MQTT] Failed to publish count batch."));
+    return false;
+  }
+  // Only published batches consume a sequence number
+  batchSeq++;
+  Serial.print(F("[MQTT] Count batch published: "));
+  Serial.println(jsonBuffer);
+  return true;
+}
+
 void publishHeartbeat() {
   if (!isMqttConnected()) {
     return;
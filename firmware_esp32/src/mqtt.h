@@ -1,6 +1,8 @@
 #ifndef MQTT_H
 #define MQTT_H
 
+#define ARDUINOJSON_USE_LONG_LONG 1 // 64-bit timestamps in the payload
+
 #include <PubSubClient.h>
 #include <WiFi.h>
 #include <ArduinoJson.h>
@@ -34,10 +36,23 @@ void loopMqtt();
 // =====================================================================
 
 /**
- * @brief Publishes the current state of the barrier sensor.
+ * @brief Publishes a change of the barrier sensor state.
+ * Each change gets the next per-boot sequence number, even if it cannot be
+ * published, so the backend can deduplicate, reorder and spot gaps.
  * @param isInterrupted True if the beam is broken, false otherwise.
+ * @param eventUptimeMs Device uptime (ms, from esp_timer) when the change happened.
+ */
+void publishSensorState(bool isInterrupted, uint64_t eventUptimeMs);
+
+/**
+ * @brief Publishes a batch of counts detected on the device (edge-count mode).
+ * @param count Products counted since the previous published batch.
+ * @param total Cumulative products counted by this device (persistent).
+ * @param firstUptimeMs Device uptime (ms) of the first product in the batch.
+ * @param lastUptimeMs Device uptime (ms) of the last product in the batch.
+ * @return True if the batch was handed to the broker.
  */
-void publishSensorState(bool isInterrupted);
+bool publishCountBatch(uint32_t count, uint32_t total, uint64_t firstUptimeMs, uint64_t lastUptimeMs);
 
 /**
  * @brief Publishes a heartbeat message to indicate the device is online.
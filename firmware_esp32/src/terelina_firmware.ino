@@ -7,9 +7,11 @@
  */
 
 #include <Arduino.h>
+#include <esp_timer.h>
 #include "config.h"
 #include "wifi_manager.h"
 #include "mqtt.h"
+#include "edge_counter.h"
 
 // =====================================================================
 // Global State
@@ -55,6 +57,10 @@ void setup() {
     Serial.println(F("[MQTT] Initializing MQTT client..."));
     setupMqtt(); // Sets the broker server, port, buffer, etc.
 
+    if (COUNT_MODE_EDGE) {
+        setupEdgeCounter(); // Restores the cumulative total from flash
+    }
+
     Serial.println(F("=========================================="));
     Serial.println(F("System initialized. Starting main loop..."));
     Serial.println();
@@ -71,8 +77,11 @@ void loop() {
     handleMqttConnection();
     loopMqtt();
 
-    // 2. Read the sensor and publish any state changes.
+    // 2. Read the sensor and publish any state changes (or count them).
     handleSensor();
+    if (COUNT_MODE_EDGE) {
+        handleEdgeCounter();
+    }
 
     // 3. Perform periodic tasks, like sending the heartbeat.
     handleTimedTasks();
@@ -93,12 +102,15 @@ void handleSensor() {
     static bool lastStableState = isBeamInterrupted;
     static bool lastReadState = isBeamInterrupted;
     static unsigned long lastChangeTime = 0;
+    // 64-bit uptime of the raw change (does not wrap like millis())
+    static uint64_t lastChangeUptimeMs = 0;
 
     bool currentRead = (digitalRead(SENSOR_PIN) == (SENSOR_ACTIVE_LOW ? LOW : HIGH));
 
     if (currentRead != lastReadState) {
         lastReadState = currentRead;
         lastChangeTime = millis();
+        lastChangeUptimeMs = esp_timer_get_time() / 1000;
         return;
     }
 
@@ -107,9 +119,19 @@ void handleSensor() {
                       lastStableState ? "INTERRUPTED" : "CLEAR",
                       currentRead ? "INTERRUPTED" : "CLEAR");
 
+        bool productPassed = lastStableState && !currentRead; // interrupted -> clear
         lastStableState = currentRead;
         isBeamInterrupted = currentRead;
-        publishSensorState(isBeamInterrupted);
+
+        // Stamp the event with when the beam actually changed, not when the
+        // debounce confirmed it
+        if (COUNT_MODE_EDGE) {
+            if (productPassed) {
+                recordEdgeCount(lastChangeUptimeMs);
+            }
+        } else {
+            publishSensorState(isBeamInterrupted, lastChangeUptimeMs);
+        }
     }
 }
 
@@ -140,6 +162,9 @@ void printSystemStatus() {
     Serial.printf("WiFi: %s\n", isWifiConnected() ? "Connected" : "Disconnected");
     Serial.printf("MQTT: %s\n", isMqttConnected() ? "Connected" : "Disconnected");
     Serial.printf("Sensor: %s\n", isBeamInterrupted ? "INTERRUPTED" : "CLEAR");
+    if (COUNT_MODE_EDGE) {
+        Serial.printf("Edge count total: %lu\n", (unsigned long)getEdgeCountTotal());
+    }
     Serial.printf("Free Heap: %u bytes\n", ESP.getFreeHeap());
     Serial.printf("Uptime: %lu s\n", millis() / 1000);
     Serial.println(F("---------------------\n"));